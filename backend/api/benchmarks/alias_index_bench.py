@@ -0,0 +1,96 @@
+"""
+HealthCanvas - Alias Index Benchmark
+Lookup cost and corpus precision of the alias index against the old substring scan
+
+Run from the api directory:
+    python benchmarks/alias_index_bench.py [--extra-biomarkers 400]
+"""
+
+import os
+import sys
+import time
+import random
+import string
+import argparse
+from typing import Callable, Dict, Iterable, Optional
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from services.alias_index import AliasIndex
+from services.gemini_service import BIOMARKER_ALIASES
+from tests.test_alias_index import load_corpus
+
+# ============================================
+# Matchers
+# ============================================
+
+def substring_scan(aliases: Dict[str, Iterable[str]]) -> Callable[[str], Optional[str]]:
+    """The matcher the index replaced: first alias contained in the name, or containing it"""
+    def match(test_name: str) -> Optional[str]:
+        name = test_name.lower().strip()
+        for biomarker_id, names in aliases.items():
+            for alias in names:
+                if alias in name or name in alias:
+                    return biomarker_id
+        return None
+    return match
+
+def with_synthetic_biomarkers(count: int, seed: int = 0) -> Dict[str, list]:
+    """Built-in aliases plus `count` made-up biomarkers with five random 1-3 word aliases each"""
+    rng = random.Random(seed)
+    aliases = {biomarker_id: list(names) for biomarker_id, names in BIOMARKER_ALIASES.items()}
+    for i in range(count):
+        aliases[f"synthetic{i}"] = [
+            " ".join("".join(rng.choices(string.ascii_lowercase, k=rng.randint(4, 9))) for _ in range(rng.randint(1, 3)))
+            for _ in range(5)
+        ]
+    return aliases
+
+# ============================================
+# Benchmark
+# ============================================
+
+def measure(label: str, match: Callable[[str], Optional[str]], corpus, rounds: int = 200):
+    true_positives = false_positives = missed = 0
+    for name, expected in corpus:
+        got = match(name)
+        if got is not None and got == expected:
+            true_positives += 1
+        elif got is not None:
+            false_positives += 1
+        elif expected is not None:
+            missed += 1
+
+    names = [name for name, _ in corpus] * rounds
+    started = time.perf_counter()
+    for name in names:
+        match(name)
+    per_name = (time.perf_counter() - started) / len(names) * 1e6
+
+    print(
+        f"{label:<22} precision {true_positives / (true_positives + false_positives):.3f}  "
+        f"recall {true_positives / (true_positives + missed):.3f}  "
+        f"({false_positives} wrong, {missed} missed)  {per_name:.1f} us/name"
+    )
+
+def main(args) -> int:
+    corpus = load_corpus()
+    print(f"corpus: {len(corpus)} names, {sum(1 for _, expected in corpus if expected is None)} not ours")
+
+    measure("substring scan", substring_scan(BIOMARKER_ALIASES), corpus)
+    measure("alias index", AliasIndex(BIOMARKER_ALIASES).biomarker_id, corpus)
+
+    large = with_synthetic_biomarkers(args.extra_biomarkers)
+    started = time.perf_counter()
+    large_index = AliasIndex(large)
+    build_ms = (time.perf_counter() - started) * 1000
+    extra = args.extra_biomarkers * 5
+    measure(f"substring scan +{extra}", substring_scan(large), corpus)
+    measure(f"alias index +{extra}", large_index.biomarker_id, corpus)
+    print(f"index build with +{extra} aliases: {build_ms:.0f} ms")
+    return 0
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Alias index benchmark")
+    parser.add_argument("--extra-biomarkers", type=int, default=400, help="Synthetic biomarkers to add (5 aliases each)")
+    sys.exit(main(parser.parse_args()))
@@ -0,0 +1,123 @@
+"""
+HealthCanvas - Bulk Observation Ingest Benchmark
+Rows/sec through POST /api/observations/bulk vs one POST /api/observations per row
+
+Starts the API against DATABASE_URL and saves `--rows` observations for one
+user each way: single-row requests (sequential and `--concurrency` at a time),
+then bulk requests of one panel and of as many panels as fit in one request.
+
+Run from the api directory:
+    DATABASE_URL=... python benchmarks/bulk_observations_bench.py [--rows 2000] [--panel-size 40] [--concurrency 8]
+"""
+
+import os
+import sys
+import time
+import random
+import asyncio
+import argparse
+from datetime import date, timedelta
+from typing import Dict, List
+
+import asyncpg
+import httpx
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.harness import DATABASE_URL, ApiServer, sign_in, user_id
+from main import MAX_BULK_OBSERVATIONS
+
+EMAIL = "bulk-ingest@bench.example.com"
+
+# ============================================
+# Synthetic Panels
+# ============================================
+
+def synthetic_panels(biomarkers: List[Dict], rows: int, panel_size: int, seed: int = 1) -> List[Dict]:
+    """Panels of `panel_size` values on consecutive days, values within ~1.4x each normal range"""
+    rng = random.Random(seed)
+    panels = []
+    for start in range(0, rows, panel_size):
+        day = date.today() - timedelta(days=len(panels))
+        values = []
+        for biomarker in rng.sample(biomarkers, min(panel_size, rows - start, len(biomarkers))):
+            low = float(biomarker.get('normal_range_low') or 1)
+            high = float(biomarker.get('normal_range_high') or 100)
+            values.append({"biomarker_id": biomarker['id'], "value": round(low + rng.random() * 1.4 * (high - low), 2)})
+        # Panels larger than the catalog repeat biomarkers, as a report with duplicates would
+        while len(values) < min(panel_size, rows - start):
+            values.append(dict(rng.choice(values)))
+        panels.append({"effective_date": day.isoformat(), "lab_name": "Bench Labs", "values": values})
+    return panels
+
+# ============================================
+# Ingest Paths
+# ============================================
+
+async def ingest_single(client, headers, panels: List[Dict], concurrency: int) -> int:
+    rows = [
+        {**value, "effective_date": panel["effective_date"], "lab_name": panel["lab_name"]}
+        for panel in panels for value in panel["values"]
+    ]
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def post(row):
+        async with semaphore:
+            response = await client.post("/api/observations", json=row, headers=headers)
+            response.raise_for_status()
+
+    await asyncio.gather(*(post(row) for row in rows))
+    return len(rows)
+
+
+async def ingest_bulk(client, headers, panels: List[Dict], panels_per_request: int) -> int:
+    created = 0
+    for start in range(0, len(panels), panels_per_request):
+        response = await client.post(
+            "/api/observations/bulk", json={"panels": panels[start:start + panels_per_request]}, headers=headers
+        )
+        response.raise_for_status()
+        body = response.json()
+        if body["failed"]:
+            raise RuntimeError(f"{body['failed']} rows failed: {body['results'][0]}")
+        created += body["created"]
+    return created
+
+# ============================================
+# Benchmark
+# ============================================
+
+async def main(args) -> int:
+    conn = await asyncpg.connect(DATABASE_URL)
+    try:
+        with ApiServer() as server:
+            async with httpx.AsyncClient(base_url=server.url, timeout=300) as client:
+                headers = await sign_in(client, EMAIL)
+                owner = await user_id(conn, EMAIL)
+                biomarkers = (await client.get("/api/biomarkers")).json()
+                panels = synthetic_panels(biomarkers, args.rows, args.panel_size)
+                per_request = max(1, MAX_BULK_OBSERVATIONS // args.panel_size)
+
+                runs = [
+                    ("single-row, sequential", lambda: ingest_single(client, headers, panels, 1)),
+                    (f"single-row, {args.concurrency} concurrent", lambda: ingest_single(client, headers, panels, args.concurrency)),
+                    ("bulk, 1 panel per request", lambda: ingest_bulk(client, headers, panels, 1)),
+                    (f"bulk, {per_request} panels per request", lambda: ingest_bulk(client, headers, panels, per_request)),
+                ]
+                for name, ingest in runs:
+                    await conn.execute("DELETE FROM observations WHERE user_id = $1", owner)
+                    started = time.perf_counter()
+                    rows = await ingest()
+                    elapsed = time.perf_counter() - started
+                    print(f"{name:32} {rows} rows in {elapsed:6.2f}s = {rows / elapsed:8.0f} rows/s")
+                await conn.execute("DELETE FROM observations WHERE user_id = $1", owner)
+    finally:
+        await conn.close()
+    return 0
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Bulk vs single-row observation ingest")
+    parser.add_argument("--rows", type=int, default=2000)
+    parser.add_argument("--panel-size", type=int, default=40, help="Values per lab panel")
+    parser.add_argument("--concurrency", type=int, default=8, help="Parallel single-row requests")
+    sys.exit(asyncio.run(main(parser.parse_args())))
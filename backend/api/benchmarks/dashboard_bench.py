@@ -0,0 +1,221 @@
+"""
+HealthCanvas - Dashboard Benchmark
+Old (five sequential queries, per-row models) vs new (one composite query) /api/dashboard assembly
+
+Both paths run against DATABASE_URL for synthetic users holding `--observations`
+observations each. `--rtt` adds a delay before every query to model a remote
+database (Neon is typically 1-10 ms away), where the number of round trips
+dominates.
+
+Run from the api directory:
+    DATABASE_URL=... python benchmarks/dashboard_bench.py [--users 5] [--observations 10000] [--rtt 0 5]
+"""
+
+import os
+import sys
+import time
+import asyncio
+import argparse
+from typing import List
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.harness import DATABASE_URL, latency_summary, seed_observations
+
+os.environ["DATABASE_URL"] = DATABASE_URL
+import main
+from main import (
+    DASHBOARD_QUERY, ConditionResponse, DashboardResponse, HealthScoreResponse, MedicationResponse,
+    ObservationResponse, _load_json,
+)
+
+# ============================================
+# Remote Database Model
+# ============================================
+
+class DelayedConnection:
+    """Forwards to a connection, sleeping `rtt` seconds before every query"""
+
+    def __init__(self, conn, rtt: float):
+        self._conn = conn
+        self._rtt = rtt
+
+    async def fetch(self, *args):
+        await asyncio.sleep(self._rtt)
+        return await self._conn.fetch(*args)
+
+    async def fetchrow(self, *args):
+        await asyncio.sleep(self._rtt)
+        return await self._conn.fetchrow(*args)
+
+# ============================================
+# Dashboard Paths
+# ============================================
+
+async def old_detect_patterns(conn, user_id):
+    """detect_patterns before latest_observations and the pattern sweep"""
+    rows = await conn.fetch(
+        """
+        SELECT DISTINCT ON (biomarker_id) biomarker_id, value, status
+        FROM observations
+        WHERE user_id = $1 AND deleted_at IS NULL
+        ORDER BY biomarker_id, effective_date DESC
+        """,
+        user_id
+    )
+    latest = {row['biomarker_id']: {'value': float(row['value']), 'status': row['status']} for row in rows}
+    patterns = []
+    metabolic_flags = sum([
+        latest.get('glucose', {}).get('value', 0) > 100,
+        latest.get('triglycerides', {}).get('value', 0) > 150,
+        latest.get('hdl', {}).get('value', 100) < 40,
+        latest.get('hba1c', {}).get('value', 0) > 5.6
+    ])
+    if metabolic_flags >= 3:
+        patterns.append({'type': 'warning', 'name': 'Metabolic Syndrome Risk', 'description': '',
+                         'markers': ['glucose', 'triglycerides', 'hdl', 'hba1c']})
+    if latest.get('hemoglobin', {}).get('value', 100) < 12 and latest.get('ferritin', {}).get('value', 100) < 30:
+        patterns.append({'type': 'attention', 'name': 'Possible Iron Deficiency', 'description': '',
+                         'markers': ['hemoglobin', 'ferritin']})
+    if latest.get('creatinine', {}).get('value', 0) > 1.3 and latest.get('egfr', {}).get('value', 100) < 60:
+        patterns.append({'type': 'warning', 'name': 'Reduced Kidney Function', 'description': '',
+                         'markers': ['creatinine', 'egfr']})
+    return patterns
+
+
+async def old_dashboard(conn, user_id) -> dict:
+    """get_dashboard as it was: five round trips and a model object per row"""
+    scores = await conn.fetch("SELECT category, score, marker_count FROM health_scores WHERE user_id = $1", user_id)
+    category_scores = [HealthScoreResponse(
+        category=row['category'], score=row['score'], marker_count=row['marker_count']
+    ) for row in scores]
+    overall_score = sum(s.score for s in category_scores) / len(category_scores) if category_scores else None
+
+    recent_obs = await conn.fetch(
+        """
+        SELECT o.*, bd.name as biomarker_name, bd.category, bd.unit
+        FROM observations o
+        JOIN biomarker_definitions bd ON o.biomarker_id = bd.id
+        WHERE o.user_id = $1 AND o.deleted_at IS NULL
+        ORDER BY o.effective_date DESC, o.created_at DESC
+        LIMIT 10
+        """,
+        user_id
+    )
+    recent_observations = [ObservationResponse(
+        id=str(row['id']), biomarker_id=row['biomarker_id'],
+        biomarker_name=row['biomarker_name'], category=row['category'],
+        value=row['value'], unit=row['unit'], effective_date=row['effective_date'],
+        status=row['status'], lab_name=row['lab_name'], notes=row['notes'],
+        created_at=row['created_at']
+    ) for row in recent_obs]
+
+    meds = await conn.fetch(
+        "SELECT * FROM medications WHERE user_id = $1 AND is_active = TRUE AND deleted_at IS NULL", user_id
+    )
+    active_medications = [MedicationResponse(
+        id=str(row['id']), name=row['name'], dosage=row['dosage'],
+        frequency=row['frequency'], category=row['category'],
+        start_date=row['start_date'], is_active=row['is_active'], notes=row['notes']
+    ) for row in meds]
+
+    conds = await conn.fetch(
+        "SELECT * FROM conditions WHERE user_id = $1 AND clinical_status = 'active' AND deleted_at IS NULL", user_id
+    )
+    active_conditions = [ConditionResponse(
+        id=str(row['id']), name=row['name'], clinical_status=row['clinical_status'],
+        onset_date=row['onset_date'], notes=row['notes']
+    ) for row in conds]
+
+    response = DashboardResponse(
+        overall_score=overall_score,
+        category_scores=category_scores,
+        recent_observations=recent_observations,
+        active_medications=active_medications,
+        active_conditions=active_conditions,
+        pattern_alerts=await old_detect_patterns(conn, user_id)
+    )
+    return response.model_dump()
+
+
+async def new_dashboard(conn, user_id) -> dict:
+    """get_dashboard now: DASHBOARD_QUERY, validated once like FastAPI's response_model"""
+    row = await conn.fetchrow(DASHBOARD_QUERY, user_id)
+    category_scores = _load_json(row['category_scores'])
+    overall_score = sum(s['score'] for s in category_scores) / len(category_scores) if category_scores else None
+    return DashboardResponse.model_validate({
+        'overall_score': overall_score,
+        'category_scores': category_scores,
+        'recent_observations': _load_json(row['recent_observations']),
+        'active_medications': _load_json(row['active_medications']),
+        'active_conditions': _load_json(row['active_conditions']),
+        'pattern_alerts': _load_json(row['pattern_alerts']),
+    }).model_dump()
+
+# ============================================
+# Benchmark
+# ============================================
+
+async def seed_users(pool, users: int, observations: int) -> List:
+    user_ids = []
+    async with pool.acquire() as conn:
+        for i in range(users):
+            user_id = await conn.fetchval(
+                """
+                INSERT INTO users (email, password_hash) VALUES ($1, 'x')
+                ON CONFLICT (email) DO UPDATE SET email = EXCLUDED.email
+                RETURNING id
+                """,
+                f"dashboard-{i}@bench.example.com"
+            )
+            await seed_observations(conn, user_id, observations)
+            await conn.execute("DELETE FROM medications WHERE user_id = $1", user_id)
+            await conn.execute("DELETE FROM conditions WHERE user_id = $1", user_id)
+            await conn.executemany(
+                "INSERT INTO medications (user_id, name, dosage, frequency, is_active) VALUES ($1, $2, '10 mg', 'daily', TRUE)",
+                [(user_id, f"Medication {m}") for m in range(5)]
+            )
+            await conn.executemany(
+                "INSERT INTO conditions (user_id, name, clinical_status) VALUES ($1, $2, 'active')",
+                [(user_id, f"Condition {c}") for c in range(3)]
+            )
+            user_ids.append(user_id)
+        # Plan against the seeded data, not the pre-seed statistics
+        await conn.execute("ANALYZE observations")
+        await conn.execute("ANALYZE latest_observations")
+    return user_ids
+
+
+async def run(pool, dashboard, user_ids: List, rtt: float, rounds: int) -> List[float]:
+    latencies = []
+    for _ in range(rounds):
+        for user_id in user_ids:
+            async with pool.acquire() as conn:
+                started = time.perf_counter()
+                await dashboard(DelayedConnection(conn, rtt), user_id)
+                latencies.append(time.perf_counter() - started)
+    return latencies
+
+
+async def main_async(args) -> int:
+    pool = await main.create_db_pool()
+    try:
+        print(f"Seeding {args.users} user(s) with {args.observations} observations each...")
+        user_ids = await seed_users(pool, args.users, args.observations)
+        for rtt_ms in args.rtt:
+            rtt = rtt_ms / 1000
+            for name, dashboard in (("old", old_dashboard), ("new", new_dashboard)):
+                await run(pool, dashboard, user_ids, rtt, 2)
+                latencies = await run(pool, dashboard, user_ids, rtt, args.rounds)
+                print(f"rtt {rtt_ms:g} ms, {name}: {latency_summary(latencies)}")
+    finally:
+        await pool.close()
+    return 0
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Dashboard assembly benchmark, old vs new")
+    parser.add_argument("--users", type=int, default=5)
+    parser.add_argument("--observations", type=int, default=10000, help="Observations per synthetic user")
+    parser.add_argument("--rounds", type=int, default=40, help="Dashboards per user per measurement")
+    parser.add_argument("--rtt", type=float, nargs="+", default=[0, 5], help="Simulated ms per database round trip")
+    sys.exit(asyncio.run(main_async(parser.parse_args())))
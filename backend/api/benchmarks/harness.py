@@ -0,0 +1,197 @@
+"""
+HealthCanvas - Benchmark Harness
+Runs the API in a subprocess against DATABASE_URL for the HTTP benchmarks
+"""
+
+import os
+import sys
+import time
+import socket
+import tempfile
+import subprocess
+from typing import Dict, List, Optional
+
+import asyncpg
+import httpx
+
+API_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DATABASE_URL = os.getenv("DATABASE_URL", "postgresql://localhost:5432/healthcanvas")
+PASSWORD = "bench-password-1"
+
+# Background work that would add noise to the measurements
+QUIET_ENV = {
+    "PATTERN_SWEEP_SECONDS": "0",
+    "LOCAL_OCR_ENABLED": "false",
+}
+
+# ============================================
+# API Server
+# ============================================
+
+def _free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def _status_mib(pid: int) -> Dict[str, float]:
+    """Current and peak resident set size of a process, from /proc (Linux only)"""
+    values = {}
+    with open(f"/proc/{pid}/status") as f:
+        for line in f:
+            key, _, rest = line.partition(":")
+            if key in ("VmRSS", "VmHWM"):
+                values[key] = int(rest.split()[0]) / 1024
+    return {"rss": values.get("VmRSS", 0.0), "peak": values.get("VmHWM", 0.0)}
+
+
+def reset_peak(pid: int) -> bool:
+    """Restart a process's VmHWM from its current RSS; False if the kernel does not allow it"""
+    try:
+        with open(f"/proc/{pid}/clear_refs", "w") as f:
+            f.write("5")
+        return True
+    except OSError:
+        return False
+
+
+class ApiServer:
+    """
+    `uvicorn main:app` on a free local port, one worker, stopped on exit.
+    `env` overrides the environment (on top of QUIET_ENV); the output goes to
+    a log file so a failed start can be diagnosed.
+    """
+
+    def __init__(self, env: Optional[Dict[str, str]] = None, startup_timeout: float = 60):
+        self.port = _free_port()
+        self.url = f"http://127.0.0.1:{self.port}"
+        self.env = {**os.environ, "DATABASE_URL": DATABASE_URL, **QUIET_ENV, **(env or {})}
+        self.startup_timeout = startup_timeout
+        self.log_path = os.path.join(tempfile.gettempdir(), f"healthcanvas-bench-api-{self.port}.log")
+        self.process: Optional[subprocess.Popen] = None
+
+    def __enter__(self) -> "ApiServer":
+        self._log = open(self.log_path, "w")
+        self.process = subprocess.Popen(
+            [sys.executable, "-m", "uvicorn", "main:app", "--port", str(self.port), "--log-level", "warning"],
+            cwd=API_DIR, env=self.env, stdout=self._log, stderr=subprocess.STDOUT,
+        )
+        deadline = time.monotonic() + self.startup_timeout
+        while time.monotonic() < deadline:
+            if self.process.poll() is not None:
+                break
+            try:
+                if httpx.get(self.url + "/health", timeout=1).status_code == 200:
+                    return self
+            except httpx.TransportError:
+                pass
+            time.sleep(0.2)
+        self.__exit__(None, None, None)
+        raise RuntimeError(f"API did not start, see {self.log_path}")
+
+    def __exit__(self, *exc):
+        if self.process and self.process.poll() is None:
+            self.process.terminate()
+            try:
+                self.process.wait(10)
+            except subprocess.TimeoutExpired:
+                self.process.kill()
+        self._log.close()
+        if exc[0] is None and os.path.exists(self.log_path):
+            os.unlink(self.log_path)
+
+    def memory(self) -> Dict[str, float]:
+        """
+        Resident memory in MiB of the API process and, summed, of its child
+        processes (render and OCR pools). Peaks are the kernel's high-water
+        marks since each process started.
+        """
+        api = _status_mib(self.process.pid)
+        children = {"rss": 0.0, "peak": 0.0}
+        for pid in self._children():
+            try:
+                child = _status_mib(pid)
+            except FileNotFoundError:
+                continue
+            children["rss"] += child["rss"]
+            children["peak"] += child["peak"]
+        return {"api_rss": api["rss"], "api_peak": api["peak"],
+                "workers_rss": children["rss"], "workers_peak": children["peak"]}
+
+    def reset_peaks(self) -> bool:
+        """Restart the peak counters of the API and its workers, so `memory()` peaks cover what follows"""
+        return all([reset_peak(pid) for pid in [self.process.pid, *self._children()]])
+
+    def _children(self) -> List[int]:
+        pids, pending = [], [self.process.pid]
+        while pending:
+            pid = pending.pop()
+            try:
+                for task in os.listdir(f"/proc/{pid}/task"):
+                    with open(f"/proc/{pid}/task/{task}/children") as f:
+                        found = [int(child) for child in f.read().split()]
+                    pids.extend(found)
+                    pending.extend(found)
+            except FileNotFoundError:
+                continue
+        return pids
+
+# ============================================
+# Users and Data
+# ============================================
+
+async def sign_in(client: httpx.AsyncClient, email: str) -> Dict[str, str]:
+    """Register the user (or log in if they exist) and return auth headers"""
+    body = {"email": email, "password": PASSWORD, "first_name": "Bench"}
+    response = await client.post("/api/auth/register", json=body)
+    if response.status_code == 400:
+        response = await client.post("/api/auth/login", json={"email": email, "password": PASSWORD})
+    response.raise_for_status()
+    return {"Authorization": f"Bearer {response.json()['access_token']}"}
+
+
+async def user_id(conn: asyncpg.Connection, email: str) -> str:
+    return str(await conn.fetchval("SELECT id FROM users WHERE email = $1", email))
+
+
+async def seed_observations(conn: asyncpg.Connection, user_id: str, count: int, days: int = 3650) -> int:
+    """
+    Give a user `count` observations spread evenly over every biomarker and
+    the last `days` days, with values scattered around each normal range
+    (status is computed by the observations trigger). Existing observations
+    are deleted first, so reruns start from the same history.
+    """
+    await conn.execute("DELETE FROM observations WHERE user_id = $1", user_id)
+    await conn.execute(
+        """
+        INSERT INTO observations (user_id, biomarker_id, value, unit, effective_date, source_type)
+        SELECT $1, b.id,
+               ROUND((COALESCE(b.normal_range_low, 1) + random() * 1.4
+                      * (COALESCE(b.normal_range_high, 100) - COALESCE(b.normal_range_low, 1)))::numeric, 2),
+               b.unit, CURRENT_DATE - (g % $3), 'api'
+        FROM generate_series(0, $2 - 1) g
+        JOIN (SELECT *, ROW_NUMBER() OVER (ORDER BY id) - 1 AS n, COUNT(*) OVER () AS total
+              FROM biomarker_definitions) b ON b.n = g % b.total
+        """,
+        user_id, count, days
+    )
+    return count
+
+# ============================================
+# Reporting
+# ============================================
+
+def percentile(samples: List[float], p: float) -> float:
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * p))]
+
+
+def latency_summary(samples: List[float]) -> str:
+    """'n=…, p50/p95/p99/max' in milliseconds"""
+    if not samples:
+        return "no samples"
+    return (
+        f"n={len(samples)}, p50 {percentile(samples, 0.5) * 1000:.1f} ms, "
+        f"p95 {percentile(samples, 0.95) * 1000:.1f} ms, p99 {percentile(samples, 0.99) * 1000:.1f} ms, "
+        f"max {max(samples) * 1000:.1f} ms"
+    )
@@ -0,0 +1,145 @@
+"""
+HealthCanvas - Lab Report Memory Benchmark
+Peak RSS while exporting a long (default 50-page) lab history PDF
+
+Through the API: seeds a user against DATABASE_URL with enough observations
+for `--pages` pages, exports /api/export/lab-report-pdf with the PDF cache off
+and reports the peak RSS of the API process and of the render workers during
+the export. With `--compare`, the same document is also rendered in fresh
+processes the old way (BytesIO, getvalue() copy, second BytesIO for the
+response) and the new way (written to a file, streamed in chunks).
+
+Run from the api directory:
+    DATABASE_URL=... python benchmarks/lab_report_memory_bench.py [--pages 50] [--compare]
+"""
+
+import io
+import os
+import re
+import sys
+import math
+import asyncio
+import argparse
+import subprocess
+import tempfile
+
+import asyncpg
+import httpx
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.harness import (
+    DATABASE_URL, ApiServer, _status_mib, reset_peak, seed_observations, sign_in, user_id,
+)
+
+EMAIL = "lab-report-memory@bench.example.com"
+SERVER_ENV = {"PDF_CACHE_MAX_AGE_SECONDS": "0"}
+CALIBRATION_ROWS = 1000
+_PAGE = re.compile(rb"/Type\s*/Page(?!s)")
+
+# ============================================
+# Export Through the API
+# ============================================
+
+async def export(client: httpx.AsyncClient, headers) -> tuple:
+    """Stream the lab report to nowhere; return (bytes, pages)"""
+    size, pages, tail = 0, 0, b""
+    async with client.stream("GET", "/api/export/lab-report-pdf", headers=headers) as response:
+        response.raise_for_status()
+        async for chunk in response.aiter_bytes():
+            size += len(chunk)
+            # Page objects may straddle chunk boundaries
+            window = tail + chunk
+            pages += len(_PAGE.findall(window)) - len(_PAGE.findall(tail))
+            tail = window[-32:]
+    return size, pages
+
+
+async def through_api(args) -> int:
+    conn = await asyncpg.connect(DATABASE_URL)
+    try:
+        owner = None
+        with ApiServer(env=SERVER_ENV) as server:
+            async with httpx.AsyncClient(base_url=server.url, timeout=300) as client:
+                headers = await sign_in(client, EMAIL)
+                owner = await user_id(conn, EMAIL)
+
+                await seed_observations(conn, owner, CALIBRATION_ROWS)
+                _, pages = await export(client, headers)
+                rows = math.ceil(args.pages * CALIBRATION_ROWS / pages)
+                await seed_observations(conn, owner, rows)
+                await export(client, headers)  # warm the workers at full size
+
+                if not server.reset_peaks():
+                    print("Cannot reset peak RSS counters here; peaks include everything since startup")
+                before = server.memory()
+                size, pages = await export(client, headers)
+                after = server.memory()
+        print(f"{rows} observations -> {pages} pages, {size / 1024:.0f} KiB")
+        print(
+            f"API process:    RSS {before['api_rss']:.1f} MiB before, peak during export {after['api_peak']:.1f} MiB "
+            f"(+{after['api_peak'] - before['api_rss']:.1f})"
+        )
+        print(
+            f"render workers: RSS {before['workers_rss']:.1f} MiB before, peak during export {after['workers_peak']:.1f} MiB "
+            f"(+{after['workers_peak'] - before['workers_rss']:.1f})"
+        )
+        if args.compare:
+            for mode in ("buffered", "streamed"):
+                result = subprocess.run(
+                    [sys.executable, os.path.abspath(__file__), "--in-process", mode, "--user", str(owner)],
+                    capture_output=True, text=True, check=True,
+                )
+                print(result.stdout.strip())
+    finally:
+        await conn.close()
+    return 0
+
+# ============================================
+# Old vs New Rendering, In Process
+# ============================================
+
+def in_process(mode: str, owner: str) -> int:
+    """Render and 'send' the report in this (fresh) process and print its peak RSS growth"""
+    from services.pdf_service import RenderedPDF, _write_pdf, get_pdf_service
+    from services.reports import load_lab_history
+
+    async def load():
+        conn = await asyncpg.connect(DATABASE_URL)
+        try:
+            return await load_lab_history(conn, owner, "Bench Patient")
+        finally:
+            await conn.close()
+
+    report = asyncio.run(load())
+    service = get_pdf_service()
+    service.generate_lab_report_summary(**{**report, "observations": report["observations"][:20]})
+
+    pid = os.getpid()
+    reset_peak(pid)
+    before = _status_mib(pid)["rss"]
+    if mode == "buffered":
+        # generate_* returned getvalue(), and the handler wrapped it in another BytesIO
+        stream = io.BytesIO(service.generate_lab_report_summary(**report))
+        for _ in iter(lambda: stream.read(64 * 1024), b""):
+            pass
+    else:
+        path = os.path.join(tempfile.gettempdir(), f"lab-report-memory-{pid}.pdf")
+        _write_pdf(lambda out: service.generate_lab_report_summary(output=out, **report), path)
+        for _ in RenderedPDF.claim(path).iter_chunks():
+            pass
+    peak = _status_mib(pid)["peak"]
+    print(f"{mode:9} render + send in one process: peak +{peak - before:.1f} MiB over {before:.1f} MiB")
+    return 0
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Peak RSS of a long lab history PDF export")
+    parser.add_argument("--pages", type=int, default=50)
+    parser.add_argument("--compare", action="store_true", help="Also compare buffered vs streamed rendering in-process")
+    parser.add_argument("--in-process", choices=["buffered", "streamed"], help=argparse.SUPPRESS)
+    parser.add_argument("--user", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    if args.in_process:
+        sys.exit(in_process(args.in_process, args.user))
+    sys.exit(asyncio.run(through_api(args)))
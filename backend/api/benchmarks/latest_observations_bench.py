@@ -0,0 +1,143 @@
+"""
+HealthCanvas - Latest Observations Benchmark
+"Latest value per biomarker" over a deep history: full-history scans vs latest_observations
+
+For each history depth a synthetic user is seeded against DATABASE_URL, then
+the queries the endpoints used to run (DISTINCT ON / ROW_NUMBER() over every
+observation) are timed against their latest_observations replacements. Also
+times a single observation insert, which keeps latest_observations current,
+to show the write-path cost does not grow with history.
+
+Run from the api directory:
+    DATABASE_URL=... python benchmarks/latest_observations_bench.py [--depths 1000 10000 100000] [--backfill]
+"""
+
+import os
+import sys
+import time
+import asyncio
+import argparse
+from typing import List
+
+import asyncpg
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.harness import DATABASE_URL, latency_summary, seed_observations
+
+# (name, old query, new query); $1 is the user id
+QUERIES = [
+    (
+        "latest per biomarker (insights, visit questions)",
+        """
+        SELECT DISTINCT ON (o.biomarker_id) o.biomarker_id, o.value, o.status, b.name, b.unit, b.category
+        FROM observations o
+        JOIN biomarker_definitions b ON o.biomarker_id = b.id
+        WHERE o.user_id = $1 AND o.deleted_at IS NULL
+        ORDER BY o.biomarker_id, o.effective_date DESC
+        """,
+        """
+        SELECT lo.biomarker_id, lo.value, lo.status, b.name, b.unit, b.category
+        FROM latest_observations lo
+        JOIN biomarker_definitions b ON lo.biomarker_id = b.id
+        WHERE lo.user_id = $1
+        """,
+    ),
+    (
+        "flagged latest (visit prep, visit PDF)",
+        """
+        SELECT o.*, bd.name as biomarker_name, bd.unit
+        FROM observations o
+        JOIN biomarker_definitions bd ON o.biomarker_id = bd.id
+        WHERE o.user_id = $1 AND o.deleted_at IS NULL
+          AND o.status IN ('attention', 'critical')
+          AND o.id IN (
+              SELECT id FROM (
+                  SELECT id, ROW_NUMBER() OVER (PARTITION BY biomarker_id ORDER BY effective_date DESC) as rn
+                  FROM observations WHERE user_id = $1 AND deleted_at IS NULL
+              ) sub WHERE rn = 1
+          )
+        ORDER BY CASE WHEN o.status = 'critical' THEN 1 ELSE 2 END, bd.category
+        """,
+        """
+        SELECT o.*, bd.name as biomarker_name, bd.unit
+        FROM latest_observations lo
+        JOIN observations o ON o.id = lo.observation_id
+        JOIN biomarker_definitions bd ON lo.biomarker_id = bd.id
+        WHERE lo.user_id = $1 AND lo.status IN ('attention', 'critical')
+        ORDER BY CASE WHEN o.status = 'critical' THEN 1 ELSE 2 END, bd.category
+        """,
+    ),
+]
+
+# ============================================
+# Benchmark
+# ============================================
+
+async def timed(conn, rounds: int, query: str, *args) -> List[float]:
+    await conn.fetch(query, *args)
+    latencies = []
+    for _ in range(rounds):
+        started = time.perf_counter()
+        await conn.fetch(query, *args)
+        latencies.append(time.perf_counter() - started)
+    return latencies
+
+
+async def timed_insert(conn, rounds: int, user_id) -> List[float]:
+    """One observation insert (plus its latest_observations upkeep), rolled back"""
+    latencies = []
+    for _ in range(rounds):
+        transaction = conn.transaction()
+        await transaction.start()
+        try:
+            started = time.perf_counter()
+            await conn.execute(
+                """
+                INSERT INTO observations (user_id, biomarker_id, value, unit, effective_date)
+                VALUES ($1, 'glucose', 95, 'mg/dL', CURRENT_DATE)
+                """,
+                user_id
+            )
+            latencies.append(time.perf_counter() - started)
+        finally:
+            await transaction.rollback()
+    return latencies
+
+
+async def main(args) -> int:
+    conn = await asyncpg.connect(DATABASE_URL)
+    try:
+        for depth in args.depths:
+            user_id = await conn.fetchval(
+                """
+                INSERT INTO users (email, password_hash) VALUES ($1, 'x')
+                ON CONFLICT (email) DO UPDATE SET email = EXCLUDED.email
+                RETURNING id
+                """,
+                f"history-{depth}@bench.example.com"
+            )
+            await seed_observations(conn, user_id, depth)
+            await conn.execute("ANALYZE observations")
+            await conn.execute("ANALYZE latest_observations")
+            print(f"{depth} observations:")
+            for name, old, new in QUERIES:
+                print(f"  {name}")
+                print(f"    old: {latency_summary(await timed(conn, args.rounds, old, user_id))}")
+                print(f"    new: {latency_summary(await timed(conn, args.rounds, new, user_id))}")
+            print(f"  insert one observation: {latency_summary(await timed_insert(conn, args.rounds, user_id))}")
+
+        if args.backfill:
+            started = time.perf_counter()
+            rows = await conn.fetchval("SELECT rebuild_latest_observations()")
+            print(f"backfill (maintenance.py backfill-latest-observations): {rows} rows in {time.perf_counter() - started:.2f}s")
+    finally:
+        await conn.close()
+    return 0
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Latest-observation lookups on deep histories")
+    parser.add_argument("--depths", type=int, nargs="+", default=[1000, 10000, 100000], help="Observations per user")
+    parser.add_argument("--rounds", type=int, default=50)
+    parser.add_argument("--backfill", action="store_true", help="Also time a full rebuild of latest_observations")
+    sys.exit(asyncio.run(main(parser.parse_args())))
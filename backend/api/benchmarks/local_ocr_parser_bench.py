@@ -0,0 +1,142 @@
+"""
+HealthCanvas - Local OCR Parser Benchmark
+Row recall, latency and escalation rate of the local OCR path on synthetic lab reports
+
+Reports are rendered to PNG scans with Pillow and read by _extract_document
+(Tesseract + parse_lab_text), the function the local OCR workers run. Without
+the tesseract binary only parse_lab_text is measured, on the text lines the
+scan would contain.
+
+Run from the api directory:
+    python benchmarks/local_ocr_parser_bench.py [--reports 100] [--seed 1] [--noise] [--text-only]
+"""
+
+import io
+import os
+import sys
+import time
+import random
+import argparse
+from typing import List, Tuple
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from PIL import Image, ImageDraw, ImageFilter, ImageFont
+
+from services.gemini_service import BIOMARKER_ALIASES
+from services.local_ocr import TESSERACT_AVAILABLE, LocalOCR, _extract_document, parse_lab_text
+
+UNITS = ["mg/dL", "%", "g/dL", "mIU/L", "U/L", "ng/mL", "x10^3/uL", "pg/mL"]
+
+# ============================================
+# Synthetic Reports
+# ============================================
+
+def synthetic_report(rng: random.Random, rows: int) -> Tuple[List[Tuple[str, float]], List[Tuple[str, float]]]:
+    """
+    OCR lines as Tesseract would return them (text, confidence), and the
+    (biomarker id, value) pairs the parser should recover. Rows use a random
+    alias of each biomarker, an optional H/L flag glued to the value, a unit
+    and a reference range, between a letterhead, a column header and a footer.
+    """
+    lines = [
+        ("CITY DIAGNOSTICS LAB", 0.95),
+        ("Patient: John Doe   Date: 05/01/2024", 0.93),
+        ("Test Result Unit Reference Range", 0.9),
+    ]
+    truth = []
+    for biomarker_id in rng.sample(list(BIOMARKER_ALIASES), rows):
+        name = rng.choice(BIOMARKER_ALIASES[biomarker_id]).title()
+        value = round(rng.uniform(1, 300), 1)
+        flag = rng.choice(["", "H", "L", ""])
+        reference = f"{rng.randint(1, 50)}-{rng.randint(60, 200)}"
+        lines.append((f"{name} {value}{flag} {rng.choice(UNITS)} {reference}", rng.uniform(0.82, 0.97)))
+        truth.append((biomarker_id, value))
+    lines.append(("End of report - Page 1 of 1", 0.9))
+    return lines, truth
+
+
+def render_scan(rng: random.Random, lines: List[Tuple[str, float]], noise: bool) -> bytes:
+    """
+    The report as a PNG at roughly 300 DPI: 10pt text on a letter-width
+    page. With `noise`, the page is slightly rotated and blurred like a
+    phone photo or a cheap scanner.
+    """
+    font = ImageFont.load_default(size=42)
+    line_height = 68
+    image = Image.new("L", (2550, 200 + line_height * len(lines)), 255)
+    draw = ImageDraw.Draw(image)
+    for i, (text, _) in enumerate(lines):
+        draw.text((150, 100 + i * line_height), text, fill=0, font=font)
+    if noise:
+        image = image.rotate(rng.uniform(-1.5, 1.5), resample=Image.BICUBIC, expand=True, fillcolor=255)
+        image = image.filter(ImageFilter.GaussianBlur(rng.uniform(0.5, 1.5)))
+    buffer = io.BytesIO()
+    image.save(buffer, format="PNG")
+    return buffer.getvalue()
+
+
+def percentile(samples: List[float], p: float) -> float:
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * p))]
+
+# ============================================
+# Benchmark
+# ============================================
+
+def main(args) -> int:
+    rng = random.Random(args.seed)
+    reports = [synthetic_report(rng, rng.randint(5, 15)) for _ in range(args.reports)]
+
+    ocr = TESSERACT_AVAILABLE and not args.text_only
+    if not ocr:
+        reason = "--text-only" if args.text_only else "tesseract is not installed"
+        print(f"Skipping rendering and OCR ({reason}): timing parse_lab_text on the report text only")
+
+    extractions, latencies = [], []
+    for lines, _ in reports:
+        if ocr:
+            scan = render_scan(rng, lines, args.noise)
+            started = time.perf_counter()
+            extractions.append(_extract_document(scan, "image/png"))
+        else:
+            started = time.perf_counter()
+            extractions.append(parse_lab_text(lines))
+        latencies.append(time.perf_counter() - started)
+
+    found = expected = 0
+    missed = []
+    for (lines, truth), extraction in zip(reports, extractions):
+        recovered = {(value.mapped_biomarker_id, value.value) for value in extraction.values}
+        for row in truth:
+            expected += 1
+            if row in recovered:
+                found += 1
+            else:
+                missed.append(row)
+    escalations = {}
+    for extraction in extractions:
+        reason = LocalOCR.escalation_reason(extraction)
+        if reason:
+            escalations[reason] = escalations.get(reason, 0) + 1
+    escalated = sum(escalations.values())
+
+    print(
+        f"{len(reports)} {'scanned' if ocr else 'text'} reports, {expected} rows: recall {found / expected:.3f}, "
+        f"p50 {percentile(latencies, 0.5) * 1000:.3f} ms, p95 {percentile(latencies, 0.95) * 1000:.3f} ms per report"
+    )
+    print(
+        f"escalation rate {escalated / len(reports):.1%} ({escalated} to Gemini)"
+        + "".join(f", {reason} {count}" for reason, count in sorted(escalations.items()))
+    )
+    for biomarker_id, value in missed[:10]:
+        print(f"  missed {biomarker_id} = {value}")
+    return 0
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Local OCR parser benchmark on synthetic reports")
+    parser.add_argument("--reports", type=int, default=100)
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--noise", action="store_true", help="rotate and blur the rendered scans")
+    parser.add_argument("--text-only", action="store_true", help="skip rendering and OCR even if Tesseract is installed")
+    sys.exit(main(parser.parse_args()))
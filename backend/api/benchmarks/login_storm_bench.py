@@ -0,0 +1,100 @@
+"""
+HealthCanvas - Login Storm Benchmark
+Latency of /api/auth/me on an API worker while a burst of logins runs PBKDF2
+
+Starts the API against DATABASE_URL, measures /api/auth/me on its own, then
+again while `--concurrency` clients log in back to back. With hashing on
+the event loop every login stalls /me for the full KDF time; with the
+hashing pool /me should stay close to its idle latency, and logins beyond
+PASSWORD_HASH_MAX_PENDING queued hashes get 503.
+
+Run from the api directory:
+    DATABASE_URL=... python benchmarks/login_storm_bench.py [--concurrency 32] [--seconds 10]
+"""
+
+import os
+import sys
+import time
+import asyncio
+import argparse
+from collections import Counter
+from typing import Dict, List
+
+import httpx
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.harness import PASSWORD, ApiServer, latency_summary, sign_in
+
+# ============================================
+# Load
+# ============================================
+
+async def probe_me(client: httpx.AsyncClient, headers: Dict[str, str], stop: asyncio.Event,
+                   interval: float) -> List[float]:
+    """Call /api/auth/me every `interval` seconds until stopped"""
+    latencies = []
+    while not stop.is_set():
+        started = time.perf_counter()
+        response = await client.get("/api/auth/me", headers=headers)
+        latencies.append(time.perf_counter() - started)
+        response.raise_for_status()
+        await asyncio.sleep(interval)
+    return latencies
+
+
+async def login_loop(client: httpx.AsyncClient, email: str, stop: asyncio.Event,
+                     latencies: List[float], statuses: Counter):
+    while not stop.is_set():
+        started = time.perf_counter()
+        response = await client.post("/api/auth/login", json={"email": email, "password": PASSWORD})
+        latencies.append(time.perf_counter() - started)
+        statuses[response.status_code] += 1
+        if response.status_code == 503:
+            await asyncio.sleep(float(response.headers.get("Retry-After", "1")))
+
+
+async def measure(client: httpx.AsyncClient, headers: Dict[str, str], emails: List[str], args) -> Dict:
+    stop = asyncio.Event()
+    login_latencies: List[float] = []
+    statuses: Counter = Counter()
+    probe = asyncio.create_task(probe_me(client, headers, stop, args.interval))
+    storm = [asyncio.create_task(login_loop(client, email, stop, login_latencies, statuses)) for email in emails]
+    await asyncio.sleep(args.seconds)
+    stop.set()
+    me = await probe
+    await asyncio.gather(*storm)
+    return {"me": me, "logins": login_latencies, "statuses": statuses}
+
+# ============================================
+# Benchmark
+# ============================================
+
+async def main(args) -> int:
+    with ApiServer() as server:
+        limits = httpx.Limits(max_connections=args.concurrency + 4)
+        async with httpx.AsyncClient(base_url=server.url, limits=limits, timeout=120) as client:
+            headers = await sign_in(client, "storm-probe@bench.example.com")
+            emails = [f"storm-{i}@bench.example.com" for i in range(args.concurrency)]
+            for email in emails:
+                await sign_in(client, email)
+
+            idle = await measure(client, headers, [], args)
+            print(f"/api/auth/me idle:          {latency_summary(idle['me'])}")
+
+            storm = await measure(client, headers, emails, args)
+            print(f"/api/auth/me during storm:  {latency_summary(storm['me'])}")
+            ok = storm["statuses"][200]
+            print(
+                f"logins ({args.concurrency} clients): {ok / args.seconds:.1f}/s succeeded, "
+                f"{latency_summary(storm['logins'])}"
+            )
+            print("login statuses: " + ", ".join(f"{code} x{count}" for code, count in sorted(storm["statuses"].items())))
+    return 0
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="/api/auth/me latency during a login storm")
+    parser.add_argument("--concurrency", type=int, default=32, help="Clients logging in back to back")
+    parser.add_argument("--seconds", type=float, default=10, help="Duration of each phase")
+    parser.add_argument("--interval", type=float, default=0.01, help="Pause between /me probes")
+    sys.exit(asyncio.run(main(parser.parse_args())))
@@ -0,0 +1,98 @@
+"""
+HealthCanvas - Observation Export Memory Benchmark
+API process RSS while streaming /api/export/observations, against history size
+
+For each `--rows` size a user is seeded against DATABASE_URL, then every
+export format (NDJSON, CSV, gzipped NDJSON) is downloaded and discarded while
+the API process's RSS is sampled. Rows are streamed from a cursor, so peak
+RSS should stay flat as the history grows from thousands to a million rows.
+
+Run from the api directory:
+    DATABASE_URL=... python benchmarks/observation_export_bench.py [--rows 10000 100000 1000000]
+"""
+
+import os
+import sys
+import time
+import asyncio
+import argparse
+
+import asyncpg
+import httpx
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.harness import DATABASE_URL, ApiServer, seed_observations, sign_in, user_id
+
+EMAIL = "observation-export@bench.example.com"
+EXPORTS = [
+    ("ndjson", {"format": "ndjson"}),
+    ("csv", {"format": "csv"}),
+    ("ndjson gzip", {"format": "ndjson", "gzip": "true"}),
+]
+SAMPLE_SECONDS = 0.05
+
+# ============================================
+# Export
+# ============================================
+
+async def sample_rss(server: ApiServer, stop: asyncio.Event) -> float:
+    """Highest API process RSS seen until `stop` is set"""
+    highest = 0.0
+    while not stop.is_set():
+        highest = max(highest, server.memory()["api_rss"])
+        await asyncio.sleep(SAMPLE_SECONDS)
+    return highest
+
+
+async def export(client: httpx.AsyncClient, headers, params) -> int:
+    """Download the export and throw it away; return its size in bytes"""
+    size = 0
+    async with client.stream("GET", "/api/export/observations", params=params, headers=headers) as response:
+        response.raise_for_status()
+        async for chunk in response.aiter_raw():
+            size += len(chunk)
+    return size
+
+# ============================================
+# Benchmark
+# ============================================
+
+async def main(args) -> int:
+    conn = await asyncpg.connect(DATABASE_URL)
+    owner = None
+    try:
+        with ApiServer() as server:
+            async with httpx.AsyncClient(base_url=server.url, timeout=None) as client:
+                headers = await sign_in(client, EMAIL)
+                owner = await user_id(conn, EMAIL)
+                for rows in args.rows:
+                    started = time.perf_counter()
+                    await seed_observations(conn, owner, rows)
+                    print(f"{rows} observations (seeded in {time.perf_counter() - started:.1f}s):")
+                    for name, params in EXPORTS:
+                        server.reset_peaks()
+                        baseline = server.memory()["api_rss"]
+                        stop = asyncio.Event()
+                        sampling = asyncio.create_task(sample_rss(server, stop))
+                        started = time.perf_counter()
+                        size = await export(client, headers, params)
+                        elapsed = time.perf_counter() - started
+                        stop.set()
+                        sampled = await sampling
+                        peak = server.memory()["api_peak"]
+                        print(
+                            f"  {name:12} {size / 2**20:8.1f} MiB in {elapsed:6.2f}s ({rows / elapsed:8.0f} rows/s)  "
+                            f"API RSS {baseline:.1f} MiB before, sampled max {sampled:.1f}, peak {peak:.1f} "
+                            f"(+{peak - baseline:.1f})"
+                        )
+    finally:
+        if owner is not None:
+            await conn.execute("DELETE FROM observations WHERE user_id = $1", owner)
+        await conn.close()
+    return 0
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="API memory while streaming observation exports")
+    parser.add_argument("--rows", type=int, nargs="+", default=[10000, 100000, 1000000], help="History sizes to export")
+    sys.exit(asyncio.run(main(parser.parse_args())))
@@ -0,0 +1,113 @@
+"""
+HealthCanvas - Visit PDF Export Benchmark
+Concurrent /api/export/visit-pdf throughput, and latency of other endpoints while exports render
+
+Starts the API against DATABASE_URL with the PDF cache off (every export
+renders) and Gemini unconfigured (no AI insights), then for each concurrency
+level runs that many clients exporting back to back while a probe calls
+/api/auth/me and /api/biomarkers. With rendering on the event loop the probe
+waits behind every render; with the render pool it should stay near its
+idle latency, and exports beyond PDF_RENDER_MAX_PENDING get 503.
+
+Run from the api directory:
+    DATABASE_URL=... python benchmarks/visit_pdf_bench.py [--concurrency 1 4 8 16] [--seconds 10]
+"""
+
+import os
+import sys
+import time
+import asyncio
+import argparse
+from collections import Counter
+from typing import Dict, List
+
+import asyncpg
+import httpx
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.harness import DATABASE_URL, ApiServer, latency_summary, seed_observations, sign_in, user_id
+
+EMAIL = "visit-pdf@bench.example.com"
+SERVER_ENV = {"PDF_CACHE_MAX_AGE_SECONDS": "0", "GEMINI_API_KEY": ""}
+# Pause after a 503 so saturated clients do not spin
+BUSY_BACKOFF_SECONDS = 0.1
+
+# ============================================
+# Load
+# ============================================
+
+async def probe(client: httpx.AsyncClient, headers: Dict[str, str], stop: asyncio.Event) -> List[float]:
+    latencies = []
+    while not stop.is_set():
+        for path in ("/api/auth/me", "/api/biomarkers"):
+            started = time.perf_counter()
+            response = await client.get(path, headers=headers)
+            latencies.append(time.perf_counter() - started)
+            response.raise_for_status()
+        await asyncio.sleep(0.02)
+    return latencies
+
+
+async def exporter(client: httpx.AsyncClient, headers: Dict[str, str], stop: asyncio.Event,
+                   latencies: List[float], statuses: Counter):
+    while not stop.is_set():
+        started = time.perf_counter()
+        response = await client.get("/api/export/visit-pdf", headers=headers)
+        statuses[response.status_code] += 1
+        if response.status_code == 200:
+            latencies.append(time.perf_counter() - started)
+        elif response.status_code == 503:
+            await asyncio.sleep(BUSY_BACKOFF_SECONDS)
+        else:
+            raise RuntimeError(f"visit-pdf returned {response.status_code}: {response.text[:200]}")
+
+
+async def measure(client, headers, concurrency: int, seconds: float):
+    stop = asyncio.Event()
+    export_latencies: List[float] = []
+    statuses: Counter = Counter()
+    probing = asyncio.create_task(probe(client, headers, stop))
+    exporters = [
+        asyncio.create_task(exporter(client, headers, stop, export_latencies, statuses))
+        for _ in range(concurrency)
+    ]
+    await asyncio.sleep(seconds)
+    stop.set()
+    probe_latencies = await probing
+    await asyncio.gather(*exporters)
+    return probe_latencies, export_latencies, statuses
+
+# ============================================
+# Benchmark
+# ============================================
+
+async def main(args) -> int:
+    conn = await asyncpg.connect(DATABASE_URL)
+    try:
+        with ApiServer(env=SERVER_ENV) as server:
+            limits = httpx.Limits(max_connections=max(args.concurrency) + 4)
+            async with httpx.AsyncClient(base_url=server.url, limits=limits, timeout=120) as client:
+                headers = await sign_in(client, EMAIL)
+                await seed_observations(conn, await user_id(conn, EMAIL), args.observations)
+                # The render pool's processes start on first use
+                (await client.get("/api/export/visit-pdf", headers=headers)).raise_for_status()
+
+                probe_latencies, _, _ = await measure(client, headers, 0, args.seconds)
+                print(f"idle: other endpoints {latency_summary(probe_latencies)}")
+                for concurrency in args.concurrency:
+                    probe_latencies, export_latencies, statuses = await measure(client, headers, concurrency, args.seconds)
+                    print(f"{concurrency} concurrent exports: {statuses[200] / args.seconds:.1f} PDFs/s")
+                    print(f"  exports:         {latency_summary(export_latencies)}")
+                    print(f"  other endpoints: {latency_summary(probe_latencies)}")
+                    print("  export statuses: " + ", ".join(f"{code} x{count}" for code, count in sorted(statuses.items())))
+    finally:
+        await conn.close()
+    return 0
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Concurrent visit PDF export benchmark")
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 4, 8, 16], help="Clients exporting at once")
+    parser.add_argument("--seconds", type=float, default=10, help="Duration of each level")
+    parser.add_argument("--observations", type=int, default=500, help="Observations seeded for the exporting user")
+    sys.exit(asyncio.run(main(parser.parse_args())))
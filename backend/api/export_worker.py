@@ -0,0 +1,51 @@
+"""
+HealthCanvas - Export Worker
+Runs export jobs in a dedicated process instead of inside the API workers
+
+Run from the api directory (and set EXPORT_WORKERS=0 for the API):
+    python export_worker.py [--workers N]
+"""
+
+import argparse
+import asyncio
+import signal
+import sys
+
+from main import create_db_pool, create_db_connection
+
+async def run(workers: int) -> int:
+    from services.export_jobs import get_export_job_queue
+    from services.gemini_service import get_ai_response_cache, close_gemini_service
+    from services.pdf_service import close_pdf_renderer
+
+    pool = await create_db_pool(min_size=1, max_size=workers + 2)
+    get_ai_response_cache().attach(pool)
+    queue = get_export_job_queue()
+
+    stopping = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        loop.add_signal_handler(sig, stopping.set)
+
+    await queue.start(pool, connect=create_db_connection, workers=workers)
+    print(f"✅ Export worker running up to {workers} job(s) at a time")
+    try:
+        await stopping.wait()
+    finally:
+        # Running jobs are handed back to the queue
+        await queue.stop()
+        get_ai_response_cache().detach()
+        await close_gemini_service()
+        close_pdf_renderer()
+        await pool.close()
+    return 0
+
+def main() -> int:
+    from services.export_jobs import EXPORT_WORKERS
+
+    parser = argparse.ArgumentParser(description="HealthCanvas export worker")
+    parser.add_argument("--workers", type=int, default=EXPORT_WORKERS or 2, help="Jobs to run concurrently")
+    return asyncio.run(run(parser.parse_args().workers))
+
+if __name__ == "__main__":
+    sys.exit(main())
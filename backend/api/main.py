@@ -3,22 +3,24 @@ HealthCanvas - Backend API
 FastAPI Application with PostgreSQL
 """
 
-from fastapi import FastAPI, Depends, HTTPException, status, Query, BackgroundTasks, File, UploadFile
+from fastapi import FastAPI, Depends, HTTPException, status, Query, BackgroundTasks, File, UploadFile, Request, Response
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
-from fastapi.responses import StreamingResponse
+from fastapi.responses import JSONResponse, StreamingResponse
+from starlette.background import BackgroundTask
 from pydantic import BaseModel, EmailStr, Field, validator
 from typing import Optional, List, Dict, Any
 from datetime import datetime, date, timedelta
 from decimal import Decimal
 import uuid
-import hashlib
+import base64
+import asyncio
+import json
 import secrets
 import jwt
 import asyncpg
 from contextlib import asynccontextmanager
 import os
-import io
 
 # ============================================
 # Configuration
@@ -30,6 +32,8 @@ class Config:
     JWT_ALGORITHM = "HS256"
     JWT_EXPIRATION_HOURS = 24
     REFRESH_TOKEN_DAYS = 30
+    # Bearer token for /api/system/metrics; the endpoint is disabled when unset
+    METRICS_TOKEN = os.getenv("METRICS_TOKEN")
     
     # Parse CORS origins from environment variable
     _cors_env = os.getenv("CORS_ORIGINS", "http://localhost:3000,http://localhost:5173")
@@ -43,10 +47,8 @@ config = Config()
 
 db_pool = None
 
-@asynccontextmanager
-async def lifespan(app: FastAPI):
-    global db_pool
-    
+def _db_connect_args():
+    """Return (dsn, ssl) for DATABASE_URL"""
     # Handle Neon database connection with SSL
     db_url = config.DATABASE_URL
     
@@ -62,19 +64,77 @@ async def lifespan(app: FastAPI):
         if "?" in db_url:
             db_url = db_url.split("?")[0]
     
+    return db_url, ssl_context
+
+async def create_db_pool(min_size: int = 2, max_size: int = 10) -> asyncpg.Pool:
+    """Create a connection pool for DATABASE_URL (shared by the API and maintenance commands)"""
+    db_url, ssl_context = _db_connect_args()
+    return await asyncpg.create_pool(
+        db_url, 
+        min_size=min_size, 
+        max_size=max_size,
+        ssl=ssl_context
+    )
+
+async def create_db_connection() -> asyncpg.Connection:
+    """Open a standalone connection (e.g. for LISTEN) outside the pool"""
+    db_url, ssl_context = _db_connect_args()
+    return await asyncpg.connect(db_url, ssl=ssl_context)
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    global db_pool
+    
     try:
-        db_pool = await asyncpg.create_pool(
-            db_url, 
-            min_size=2, 
-            max_size=10,
-            ssl=ssl_context
-        )
+        db_pool = await create_db_pool()
         print("✅ Database connected successfully")
     except Exception as e:
         print(f"❌ Database connection failed: {e}")
         raise
     
+    from services.principal_cache import get_principal_cache
+    principals = get_principal_cache()
+    await principals.start(connect=create_db_connection)
+    
+    from services.biomarker_catalog import get_biomarker_catalog
+    catalog = get_biomarker_catalog()
+    await catalog.start(db_pool, connect=create_db_connection)
+    
+    from services.biomarker_resolver import get_biomarker_resolver
+    resolver = get_biomarker_resolver()
+    await resolver.start(db_pool)
+    
+    from services.pattern_rules import get_pattern_engine
+    patterns = get_pattern_engine()
+    await patterns.start(db_pool)
+    
+    from services.gemini_service import get_ai_response_cache
+    get_ai_response_cache().attach(db_pool)
+    
+    from services.export_jobs import get_export_job_queue
+    export_jobs = get_export_job_queue()
+    await export_jobs.start(db_pool, connect=create_db_connection)
+    
     yield
+
+    await export_jobs.stop()
+    await patterns.stop()
+    await resolver.stop()
+    await catalog.stop()
+    await principals.stop()
+    get_ai_response_cache().detach()
+
+    from services.gemini_service import close_gemini_service
+    await close_gemini_service()
+
+    from services.pdf_service import close_pdf_renderer
+    close_pdf_renderer()
+
+    from services.password_service import close_password_hasher
+    close_password_hasher()
+
+    from services.local_ocr import close_local_ocr
+    close_local_ocr()
     await db_pool.close()
 
 app = FastAPI(
@@ -91,6 +151,55 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Next-Cursor"],
+)
+
+# Upload size limits
+class RequestSizeLimitMiddleware:
+    """
+    Rejects request bodies over a per-path limit with 413 before they are
+    parsed: up front from Content-Length, or as soon as a chunked body has
+    streamed past the limit.
+    """
+
+    def __init__(self, app, limits: Dict[str, int]):
+        self.app = app
+        self.limits = limits
+
+    async def __call__(self, scope, receive, send):
+        limit = self.limits.get(scope["path"]) if scope["type"] == "http" else None
+        if limit is None:
+            await self.app(scope, receive, send)
+            return
+
+        content_length = dict(scope["headers"]).get(b"content-length", b"")
+        if content_length.isdigit() and int(content_length) > limit:
+            response = JSONResponse({"detail": "Request body too large"}, status_code=413)
+            await response(scope, receive, send)
+            return
+
+        received = 0
+
+        async def limited_receive():
+            nonlocal received
+            message = await receive()
+            if message["type"] == "http.request":
+                received += len(message.get("body", b""))
+                if received > limit:
+                    raise HTTPException(status_code=413, detail="Request body too large")
+            return message
+
+        await self.app(scope, limited_receive, send)
+
+from services.ocr_pipeline import OCR_MAX_FILE_BYTES, OCR_MAX_FILES
+from services.uploads import MULTIPART_OVERHEAD_BYTES
+
+app.add_middleware(
+    RequestSizeLimitMiddleware,
+    limits={
+        "/api/ocr/extract": OCR_MAX_FILE_BYTES + MULTIPART_OVERHEAD_BYTES,
+        "/api/ocr/extract-batch": OCR_MAX_FILES * OCR_MAX_FILE_BYTES + MULTIPART_OVERHEAD_BYTES,
+    },
 )
 
 # ============================================
@@ -99,11 +208,13 @@ app.add_middleware(
 
 security = HTTPBearer()
 
-def hash_password(password: str) -> str:
-    return hashlib.pbkdf2_hmac('sha256', password.encode(), b'healthcanvas_salt', 100000).hex()
-
-def verify_password(password: str, hashed: str) -> bool:
-    return hash_password(password) == hashed
+def service_busy(e) -> HTTPException:
+    """Map a saturated worker pool to 503 so clients back off"""
+    return HTTPException(
+        status_code=503,
+        detail="Server busy, please retry shortly",
+        headers={"Retry-After": str(e.retry_after)}
+    )
 
 def create_access_token(user_id: str) -> str:
     payload = {
@@ -125,6 +236,8 @@ def create_refresh_token(user_id: str) -> str:
     return jwt.encode(payload, config.JWT_SECRET, algorithm=config.JWT_ALGORITHM)
 
 async def get_current_user(credentials: HTTPAuthorizationCredentials = Depends(security)) -> dict:
+    from services.principal_cache import get_principal_cache
+    
     try:
         payload = jwt.decode(credentials.credentials, config.JWT_SECRET, algorithms=[config.JWT_ALGORITHM])
         if payload.get("type") != "access":
@@ -133,10 +246,17 @@ async def get_current_user(credentials: HTTPAuthorizationCredentials = Depends(s
         if not user_id:
             raise HTTPException(status_code=401, detail="Invalid token")
         
+        # Signature and expiry are already verified, so a cached principal is safe to reuse
+        cache = get_principal_cache()
+        cached = cache.get(user_id, payload.get("iat"))
+        if cached is not None:
+            return cached
+        
         async with db_pool.acquire() as conn:
             user = await conn.fetchrow("SELECT id, email, first_name, last_name FROM users WHERE id = $1 AND deleted_at IS NULL", uuid.UUID(user_id))
             if not user:
                 raise HTTPException(status_code=401, detail="User not found")
+            cache.put(user_id, payload.get("iat"), dict(user))
             return dict(user)
     except jwt.ExpiredSignatureError:
         raise HTTPException(status_code=401, detail="Token expired")
@@ -200,6 +320,40 @@ class ObservationResponse(BaseModel):
     notes: Optional[str]
     created_at: datetime
 
+# Bulk Observation Models (one lab panel = many values sharing a date and lab)
+MAX_BULK_OBSERVATIONS = 1000
+MAX_OBSERVATION_VALUE = Decimal("1000000")  # DECIMAL(10,4) upper bound
+
+class PanelValueCreate(BaseModel):
+    biomarker_id: str
+    value: Decimal
+    lab_reference_low: Optional[Decimal] = None
+    lab_reference_high: Optional[Decimal] = None
+    notes: Optional[str] = None
+    # Test name as extracted from the report; saving confirms it maps to biomarker_id
+    source_test_name: Optional[str] = Field(None, max_length=200)
+
+class ObservationPanelCreate(BaseModel):
+    effective_date: date
+    lab_name: Optional[str] = Field(None, max_length=100)
+    values: List[PanelValueCreate]
+
+class BulkObservationCreate(BaseModel):
+    panels: List[ObservationPanelCreate]
+
+class BulkObservationResult(BaseModel):
+    panel_index: int
+    value_index: int
+    biomarker_id: str
+    success: bool
+    observation: Optional[ObservationResponse] = None
+    error: Optional[str] = None
+
+class BulkObservationResponse(BaseModel):
+    created: int
+    failed: int
+    results: List[BulkObservationResult]
+
 # Medication Models
 class MedicationCreate(BaseModel):
     name: str
@@ -332,6 +486,15 @@ class DashboardResponse(BaseModel):
 
 @app.post("/api/auth/register", response_model=TokenResponse, tags=["Auth"])
 async def register(user: UserRegister):
+    from services.password_service import get_password_hasher
+    from services.worker_pool import WorkerPoolSaturated
+    
+    # Hash before taking a connection so the pool is not held during KDF work
+    try:
+        password_hash = await get_password_hasher().hash(user.password)
+    except WorkerPoolSaturated as e:
+        raise service_busy(e)
+    
     async with db_pool.acquire() as conn:
         # Check if email exists
         existing = await conn.fetchval("SELECT id FROM users WHERE email = $1", user.email)
@@ -345,7 +508,7 @@ async def register(user: UserRegister):
             VALUES ($1, $2, $3, $4)
             RETURNING id
             """,
-            user.email, hash_password(user.password), user.first_name, user.last_name
+            user.email, password_hash, user.first_name, user.last_name
         )
         
         return TokenResponse(
@@ -355,16 +518,39 @@ async def register(user: UserRegister):
 
 @app.post("/api/auth/login", response_model=TokenResponse, tags=["Auth"])
 async def login(credentials: UserLogin):
+    from services.password_service import get_password_hasher
+    from services.worker_pool import WorkerPoolSaturated
+    
     async with db_pool.acquire() as conn:
         user = await conn.fetchrow(
             "SELECT id, password_hash FROM users WHERE email = $1 AND deleted_at IS NULL",
             credentials.email
         )
-        if not user or not verify_password(credentials.password, user['password_hash']):
-            raise HTTPException(status_code=401, detail="Invalid credentials")
-        
-        # Update last login
-        await conn.execute("UPDATE users SET last_login_at = NOW() WHERE id = $1", user['id'])
+    if not user:
+        raise HTTPException(status_code=401, detail="Invalid credentials")
+    
+    hasher = get_password_hasher()
+    try:
+        check = await hasher.verify(credentials.password, user['password_hash'])
+        # Upgrade legacy or outdated hashes while we still have the plaintext
+        new_hash = await hasher.hash(credentials.password) if check.valid and check.needs_rehash else None
+    except WorkerPoolSaturated as e:
+        raise service_busy(e)
+    if not check.valid:
+        raise HTTPException(status_code=401, detail="Invalid credentials")
+    
+    async with db_pool.acquire() as conn:
+        if new_hash:
+            await conn.execute(
+                """
+                UPDATE users SET last_login_at = NOW(),
+                password_hash = CASE WHEN password_hash = $3 THEN $1 ELSE password_hash END
+                WHERE id = $2
+                """,
+                new_hash, user['id'], user['password_hash']
+            )
+        else:
+            await conn.execute("UPDATE users SET last_login_at = NOW() WHERE id = $1", user['id'])
         
         return TokenResponse(
             access_token=create_access_token(str(user['id'])),
@@ -384,25 +570,86 @@ async def get_me(user: dict = Depends(get_current_user)):
 # Biomarker Definitions
 # ============================================
 
+def _etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    if not if_none_match:
+        return False
+    candidates = [tag.strip() for tag in if_none_match.split(",")]
+    return "*" in candidates or etag in candidates or f"W/{etag}" in candidates
+
 @app.get("/api/biomarkers", tags=["Biomarkers"])
-async def get_biomarkers(category: Optional[str] = None):
-    async with db_pool.acquire() as conn:
-        if category:
-            rows = await conn.fetch(
-                "SELECT * FROM biomarker_definitions WHERE category = $1 ORDER BY name",
-                category
-            )
-        else:
-            rows = await conn.fetch("SELECT * FROM biomarker_definitions ORDER BY category, name")
-        return [dict(row) for row in rows]
+async def get_biomarkers(request: Request, category: Optional[str] = None):
+    from services.biomarker_catalog import get_biomarker_catalog
+    
+    # Served from the in-memory catalog; bodies are pre-rendered per version
+    body, etag = get_biomarker_catalog().encoded(category or None)
+    headers = {"ETag": etag, "Cache-Control": "no-cache"}
+    if _etag_matches(request.headers.get("if-none-match"), etag):
+        return Response(status_code=304, headers=headers)
+    return Response(content=body, media_type="application/json", headers=headers)
 
 @app.get("/api/biomarkers/{biomarker_id}", tags=["Biomarkers"])
 async def get_biomarker(biomarker_id: str):
+    from services.biomarker_catalog import get_biomarker_catalog
+    
+    row = get_biomarker_catalog().get(biomarker_id)
+    if not row:
+        raise HTTPException(status_code=404, detail="Biomarker not found")
+    return row
+
+class AliasConfirm(BaseModel):
+    test_name: str = Field(..., min_length=1, max_length=200)
+    biomarker_id: str
+
+@app.post("/api/biomarkers/aliases", tags=["Biomarkers"])
+async def confirm_biomarker_alias(alias: AliasConfirm, user: dict = Depends(get_current_user)):
+    """
+    Confirm which biomarker a lab report test name means. The mapping applies
+    to this user's future extractions at once, and to everyone's once enough
+    users agree.
+    """
+    from services.biomarker_catalog import get_biomarker_catalog
+    from services.biomarker_resolver import get_biomarker_resolver
+    
+    if not get_biomarker_catalog().get(alias.biomarker_id):
+        raise HTTPException(status_code=404, detail="Biomarker not found")
+    
+    resolver = get_biomarker_resolver()
     async with db_pool.acquire() as conn:
-        row = await conn.fetchrow("SELECT * FROM biomarker_definitions WHERE id = $1", biomarker_id)
-        if not row:
-            raise HTTPException(status_code=404, detail="Biomarker not found")
-        return dict(row)
+        recorded = await resolver.confirm(conn, user['id'], [(alias.test_name, alias.biomarker_id)])
+    if not recorded:
+        raise HTTPException(status_code=400, detail="Test name has no letters or digits")
+    
+    return {
+        "test_name": alias.test_name,
+        "normalized_name": recorded[0],
+        "biomarker_id": alias.biomarker_id,
+        "confirmations": resolver.confirmations(alias.test_name, alias.biomarker_id),
+        "shared": resolver.is_shared(alias.test_name)
+    }
+
+# ============================================
+# Keyset Pagination
+# ============================================
+
+# Listings return one page; when there is more, this header carries an opaque
+# cursor for the next page (pass it back as ?cursor=). A cursor holds the sort
+# key of the last row, so every page is an index seek however deep it is.
+NEXT_CURSOR_HEADER = "X-Next-Cursor"
+
+def encode_cursor(*key) -> str:
+    payload = json.dumps([value.isoformat() if hasattr(value, 'isoformat') else str(value) for value in key])
+    return base64.urlsafe_b64encode(payload.encode()).decode().rstrip("=")
+
+def decode_cursor(cursor: str, *types) -> tuple:
+    """Parse a cursor back into its sort key, one parser per value (400 if malformed)"""
+    try:
+        values = json.loads(base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)))
+        # encode_cursor only writes strings; anything else was not issued by us
+        if not isinstance(values, list) or len(values) != len(types) or not all(isinstance(v, str) for v in values):
+            raise ValueError(cursor)
+        return tuple(parse(value) for parse, value in zip(types, values))
+    except (ValueError, TypeError):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
 
 # ============================================
 # Observations (Lab Results)
@@ -410,11 +657,13 @@ async def get_biomarker(biomarker_id: str):
 
 @app.get("/api/observations", response_model=List[ObservationResponse], tags=["Observations"])
 async def get_observations(
+    response: Response,
     user: dict = Depends(get_current_user),
     biomarker_id: Optional[str] = None,
     start_date: Optional[date] = None,
     end_date: Optional[date] = None,
-    limit: int = Query(100, le=500)
+    limit: int = Query(100, ge=1, le=500),
+    cursor: Optional[str] = None
 ):
     async with db_pool.acquire() as conn:
         query = """
@@ -439,10 +688,20 @@ async def get_observations(
             params.append(end_date)
             param_idx += 1
         
-        query += f" ORDER BY o.effective_date DESC, o.created_at DESC LIMIT ${param_idx}"
-        params.append(limit)
+        if cursor:
+            query += f" AND (o.effective_date, o.created_at, o.id) < (${param_idx}, ${param_idx + 1}, ${param_idx + 2})"
+            params.extend(decode_cursor(cursor, date.fromisoformat, datetime.fromisoformat, uuid.UUID))
+            param_idx += 3
+        
+        # One extra row tells whether there is a next page
+        query += f" ORDER BY o.effective_date DESC, o.created_at DESC, o.id DESC LIMIT ${param_idx}"
+        params.append(limit + 1)
         
         rows = await conn.fetch(query, *params)
+        if len(rows) > limit:
+            rows = rows[:limit]
+            last = rows[-1]
+            response.headers[NEXT_CURSOR_HEADER] = encode_cursor(last['effective_date'], last['created_at'], last['id'])
         return [ObservationResponse(
             id=str(row['id']),
             biomarker_id=row['biomarker_id'],
@@ -457,14 +716,21 @@ async def get_observations(
             created_at=row['created_at']
         ) for row in rows]
 
+def observations_changed(user_id):
+    """Drop this worker's cached AI answers for a user; the triggers clear the shared tier"""
+    from services.gemini_service import get_ai_response_cache
+    get_ai_response_cache().invalidate_user(user_id)
+
 @app.post("/api/observations", response_model=ObservationResponse, tags=["Observations"])
 async def create_observation(obs: ObservationCreate, user: dict = Depends(get_current_user)):
+    from services.biomarker_catalog import get_biomarker_catalog
+    
+    # Verify biomarker exists
+    bio = get_biomarker_catalog().get(obs.biomarker_id)
+    if not bio:
+        raise HTTPException(status_code=400, detail="Invalid biomarker_id")
+    
     async with db_pool.acquire() as conn:
-        # Verify biomarker exists
-        bio = await conn.fetchrow("SELECT * FROM biomarker_definitions WHERE id = $1", obs.biomarker_id)
-        if not bio:
-            raise HTTPException(status_code=400, detail="Invalid biomarker_id")
-        
         row = await conn.fetchrow(
             """
             INSERT INTO observations (user_id, biomarker_id, value, unit, effective_date, lab_name, lab_reference_low, lab_reference_high, notes)
@@ -474,6 +740,7 @@ async def create_observation(obs: ObservationCreate, user: dict = Depends(get_cu
             user['id'], obs.biomarker_id, obs.value, bio['unit'], obs.effective_date,
             obs.lab_name, obs.lab_reference_low, obs.lab_reference_high, obs.notes
         )
+        observations_changed(user['id'])
         
         return ObservationResponse(
             id=str(row['id']),
@@ -491,6 +758,8 @@ async def create_observation(obs: ObservationCreate, user: dict = Depends(get_cu
 
 @app.put("/api/observations/{observation_id}", response_model=ObservationResponse, tags=["Observations"])
 async def update_observation(observation_id: str, obs: ObservationUpdate, user: dict = Depends(get_current_user)):
+    from services.biomarker_catalog import get_biomarker_catalog
+    
     async with db_pool.acquire() as conn:
         # Verify ownership
         existing = await conn.fetchrow(
@@ -528,7 +797,8 @@ async def update_observation(observation_id: str, obs: ObservationUpdate, user:
         query = f"UPDATE observations SET {', '.join(updates)} WHERE id = ${param_idx} RETURNING *"
         
         row = await conn.fetchrow(query, *params)
-        bio = await conn.fetchrow("SELECT * FROM biomarker_definitions WHERE id = $1", row['biomarker_id'])
+        observations_changed(user['id'])
+        bio = get_biomarker_catalog().get(row['biomarker_id'])
         
         return ObservationResponse(
             id=str(row['id']),
@@ -544,6 +814,102 @@ async def update_observation(observation_id: str, obs: ObservationUpdate, user:
             created_at=row['created_at']
         )
 
+@app.post("/api/observations/bulk", response_model=BulkObservationResponse, tags=["Observations"])
+async def create_observations_bulk(bulk: BulkObservationCreate, user: dict = Depends(get_current_user)):
+    """
+    Create whole lab panels in one transaction.
+    Invalid values are reported per row; valid ones are still stored.
+    """
+    total = sum(len(panel.values) for panel in bulk.panels)
+    if total == 0:
+        raise HTTPException(status_code=400, detail="No observations provided")
+    if total > MAX_BULK_OBSERVATIONS:
+        raise HTTPException(status_code=400, detail=f"Too many observations (max {MAX_BULK_OBSERVATIONS})")
+    
+    from services.biomarker_catalog import get_biomarker_catalog
+    catalog = get_biomarker_catalog()
+    
+    async with db_pool.acquire() as conn:
+        results = []
+        records = []
+        inserted = []  # (result, observation id) pairs to fill in after COPY
+        confirmed = []  # (test name, biomarker id) pairs to learn from
+        for panel_index, panel in enumerate(bulk.panels):
+            for value_index, v in enumerate(panel.values):
+                result = BulkObservationResult(
+                    panel_index=panel_index, value_index=value_index,
+                    biomarker_id=v.biomarker_id, success=False
+                )
+                results.append(result)
+                
+                bio = catalog.get(v.biomarker_id)
+                if not bio:
+                    result.error = "Invalid biomarker_id"
+                    continue
+                if abs(v.value) >= MAX_OBSERVATION_VALUE:
+                    result.error = "Value out of range"
+                    continue
+                if any(
+                    bound is not None and abs(bound) >= MAX_OBSERVATION_VALUE
+                    for bound in (v.lab_reference_low, v.lab_reference_high)
+                ):
+                    result.error = "Reference value out of range"
+                    continue
+                
+                # Ids are generated here because COPY cannot return rows
+                obs_id = uuid.uuid4()
+                records.append((
+                    obs_id, user['id'], v.biomarker_id, v.value, bio['unit'], panel.effective_date,
+                    panel.lab_name, v.lab_reference_low, v.lab_reference_high, v.notes
+                ))
+                inserted.append((result, obs_id))
+                if v.source_test_name:
+                    confirmed.append((v.source_test_name, v.biomarker_id))
+        
+        rows = {}
+        if records:
+            async with conn.transaction():
+                # COPY still fires the status and derived-table triggers
+                await conn.copy_records_to_table(
+                    'observations',
+                    records=records,
+                    columns=[
+                        'id', 'user_id', 'biomarker_id', 'value', 'unit', 'effective_date',
+                        'lab_name', 'lab_reference_low', 'lab_reference_high', 'notes'
+                    ]
+                )
+                rows = {
+                    row['id']: row for row in await conn.fetch(
+                        "SELECT * FROM observations WHERE id = ANY($1::uuid[])",
+                        [r[0] for r in records]
+                    )
+                }
+                if confirmed:
+                    from services.biomarker_resolver import get_biomarker_resolver
+                    await get_biomarker_resolver().confirm(conn, user['id'], confirmed)
+            observations_changed(user['id'])
+    
+    for result, obs_id in inserted:
+        row = rows[obs_id]
+        bio = catalog.get(row['biomarker_id'])
+        result.success = True
+        result.observation = ObservationResponse(
+            id=str(row['id']),
+            biomarker_id=row['biomarker_id'],
+            biomarker_name=bio['name'],
+            category=bio['category'],
+            value=row['value'],
+            unit=row['unit'],
+            effective_date=row['effective_date'],
+            status=row['status'],
+            lab_name=row['lab_name'],
+            notes=row['notes'],
+            created_at=row['created_at']
+        )
+    
+    created = len(records)
+    return BulkObservationResponse(created=created, failed=len(results) - created, results=results)
+
 @app.delete("/api/observations/{observation_id}", tags=["Observations"])
 async def delete_observation(observation_id: str, user: dict = Depends(get_current_user)):
     async with db_pool.acquire() as conn:
@@ -553,6 +919,7 @@ async def delete_observation(observation_id: str, user: dict = Depends(get_curre
         )
         if result == "UPDATE 0":
             raise HTTPException(status_code=404, detail="Observation not found")
+        observations_changed(user['id'])
         return {"status": "deleted"}
 
 # ============================================
@@ -771,11 +1138,7 @@ async def create_goal(goal: GoalCreate, user: dict = Depends(get_current_user)):
     async with db_pool.acquire() as conn:
         # Get current value
         current = await conn.fetchval(
-            """
-            SELECT value FROM observations 
-            WHERE user_id = $1 AND biomarker_id = $2 AND deleted_at IS NULL
-            ORDER BY effective_date DESC LIMIT 1
-            """,
+            "SELECT value FROM latest_observations WHERE user_id = $1 AND biomarker_id = $2",
             user['id'], goal.biomarker_id
         )
         
@@ -798,12 +1161,27 @@ async def create_goal(goal: GoalCreate, user: dict = Depends(get_current_user)):
 # ============================================
 
 @app.get("/api/journal", response_model=List[JournalEntryResponse], tags=["Journal"])
-async def get_journal(user: dict = Depends(get_current_user), limit: int = Query(30, le=100)):
+async def get_journal(
+    response: Response,
+    user: dict = Depends(get_current_user),
+    limit: int = Query(30, ge=1, le=100),
+    cursor: Optional[str] = None
+):
+    # entry_date is unique per user, so it is the whole keyset
+    before = decode_cursor(cursor, date.fromisoformat)[0] if cursor else None
     async with db_pool.acquire() as conn:
         rows = await conn.fetch(
-            "SELECT * FROM journal_entries WHERE user_id = $1 ORDER BY entry_date DESC LIMIT $2",
-            user['id'], limit
+            """
+            SELECT * FROM journal_entries
+            WHERE user_id = $1 AND ($2::date IS NULL OR entry_date < $2)
+            ORDER BY entry_date DESC
+            LIMIT $3
+            """,
+            user['id'], before, limit + 1
         )
+        if len(rows) > limit:
+            rows = rows[:limit]
+            response.headers[NEXT_CURSOR_HEADER] = encode_cursor(rows[-1]['entry_date'])
         return [JournalEntryResponse(
             id=str(row['id']), entry_date=row['entry_date'],
             sleep_hours=row['sleep_hours'], energy_level=row['energy_level'],
@@ -841,135 +1219,81 @@ async def create_journal_entry(entry: JournalEntryCreate, user: dict = Depends(g
 # Dashboard & Analytics
 # ============================================
 
+# All dashboard sections in one round trip; each section is aggregated to JSON
+# server-side so the response can be assembled without per-row model objects.
+DASHBOARD_QUERY = """
+    SELECT
+        (
+            SELECT COALESCE(json_agg(s), '[]')
+            FROM (
+                SELECT category, score, marker_count FROM health_scores WHERE user_id = $1
+            ) s
+        ) AS category_scores,
+        (
+            SELECT COALESCE(json_agg(r), '[]')
+            FROM (
+                SELECT o.id, o.biomarker_id, bd.name AS biomarker_name, bd.category, o.value,
+                       bd.unit, o.effective_date, o.status, o.lab_name, o.notes, o.created_at
+                FROM observations o
+                JOIN biomarker_definitions bd ON o.biomarker_id = bd.id
+                WHERE o.user_id = $1 AND o.deleted_at IS NULL
+                ORDER BY o.effective_date DESC, o.created_at DESC
+                LIMIT 10
+            ) r
+        ) AS recent_observations,
+        (
+            SELECT COALESCE(json_agg(m), '[]')
+            FROM (
+                SELECT id, name, dosage, frequency, category, start_date, is_active, notes
+                FROM medications
+                WHERE user_id = $1 AND is_active = TRUE AND deleted_at IS NULL
+            ) m
+        ) AS active_medications,
+        (
+            SELECT COALESCE(json_agg(c), '[]')
+            FROM (
+                SELECT id, name, clinical_status, onset_date, notes
+                FROM conditions
+                WHERE user_id = $1 AND clinical_status = 'active' AND deleted_at IS NULL
+            ) c
+        ) AS active_conditions,
+        (
+            SELECT COALESCE(json_agg(a), '[]')
+            FROM (
+                SELECT id, severity AS type, title AS name, description, related_markers AS markers, detected_at
+                FROM pattern_alerts
+                WHERE user_id = $1 AND status = 'active'
+                ORDER BY detected_at, alert_type
+            ) a
+        ) AS pattern_alerts
+"""
+
+def _load_json(value: str):
+    # Keep numeric precision: DECIMAL columns stay Decimal instead of float
+    return json.loads(value, parse_float=Decimal)
+
 @app.get("/api/dashboard", response_model=DashboardResponse, tags=["Dashboard"])
 async def get_dashboard(user: dict = Depends(get_current_user)):
     async with db_pool.acquire() as conn:
-        # Get health scores by category
-        scores = await conn.fetch(
-            """
-            SELECT category, score, marker_count FROM health_scores WHERE user_id = $1
-            """,
-            user['id']
-        )
-        
-        category_scores = [HealthScoreResponse(
-            category=row['category'], score=row['score'], marker_count=row['marker_count']
-        ) for row in scores]
-        
-        # Calculate overall score
-        overall_score = None
-        if category_scores:
-            overall_score = sum(s.score for s in category_scores) / len(category_scores)
-        
-        # Get recent observations
-        recent_obs = await conn.fetch(
-            """
-            SELECT o.*, bd.name as biomarker_name, bd.category, bd.unit
-            FROM observations o
-            JOIN biomarker_definitions bd ON o.biomarker_id = bd.id
-            WHERE o.user_id = $1 AND o.deleted_at IS NULL
-            ORDER BY o.effective_date DESC, o.created_at DESC
-            LIMIT 10
-            """,
-            user['id']
-        )
-        
-        recent_observations = [ObservationResponse(
-            id=str(row['id']), biomarker_id=row['biomarker_id'],
-            biomarker_name=row['biomarker_name'], category=row['category'],
-            value=row['value'], unit=row['unit'], effective_date=row['effective_date'],
-            status=row['status'], lab_name=row['lab_name'], notes=row['notes'],
-            created_at=row['created_at']
-        ) for row in recent_obs]
-        
-        # Get active medications
-        meds = await conn.fetch(
-            "SELECT * FROM medications WHERE user_id = $1 AND is_active = TRUE AND deleted_at IS NULL",
-            user['id']
-        )
-        
-        active_medications = [MedicationResponse(
-            id=str(row['id']), name=row['name'], dosage=row['dosage'],
-            frequency=row['frequency'], category=row['category'],
-            start_date=row['start_date'], is_active=row['is_active'], notes=row['notes']
-        ) for row in meds]
-        
-        # Get active conditions
-        conds = await conn.fetch(
-            "SELECT * FROM conditions WHERE user_id = $1 AND clinical_status = 'active' AND deleted_at IS NULL",
-            user['id']
-        )
-        
-        active_conditions = [ConditionResponse(
-            id=str(row['id']), name=row['name'], clinical_status=row['clinical_status'],
-            onset_date=row['onset_date'], notes=row['notes']
-        ) for row in conds]
-        
-        # Detect patterns
-        pattern_alerts = await detect_patterns(conn, user['id'])
-        
-        return DashboardResponse(
-            overall_score=overall_score,
-            category_scores=category_scores,
-            recent_observations=recent_observations,
-            active_medications=active_medications,
-            active_conditions=active_conditions,
-            pattern_alerts=pattern_alerts
-        )
-
-async def detect_patterns(conn, user_id) -> List[Dict[str, Any]]:
-    """Detect health patterns from user's data"""
-    patterns = []
-    
-    # Get latest values for key biomarkers
-    latest = {}
-    rows = await conn.fetch(
-        """
-        SELECT DISTINCT ON (biomarker_id) biomarker_id, value, status
-        FROM observations
-        WHERE user_id = $1 AND deleted_at IS NULL
-        ORDER BY biomarker_id, effective_date DESC
-        """,
-        user_id
-    )
-    for row in rows:
-        latest[row['biomarker_id']] = {'value': float(row['value']), 'status': row['status']}
-    
-    # Metabolic Syndrome Check
-    metabolic_flags = sum([
-        latest.get('glucose', {}).get('value', 0) > 100,
-        latest.get('triglycerides', {}).get('value', 0) > 150,
-        latest.get('hdl', {}).get('value', 100) < 40,
-        latest.get('hba1c', {}).get('value', 0) > 5.6
-    ])
-    
-    if metabolic_flags >= 3:
-        patterns.append({
-            'type': 'warning',
-            'name': 'Metabolic Syndrome Risk',
-            'description': 'Multiple markers suggest metabolic syndrome risk. Discuss with your doctor.',
-            'markers': ['glucose', 'triglycerides', 'hdl', 'hba1c']
-        })
+        row = await conn.fetchrow(DASHBOARD_QUERY, user['id'])
     
-    # Anemia Check
-    if latest.get('hemoglobin', {}).get('value', 100) < 12 and latest.get('ferritin', {}).get('value', 100) < 30:
-        patterns.append({
-            'type': 'attention',
-            'name': 'Possible Iron Deficiency',
-            'description': 'Low hemoglobin with low ferritin may indicate iron deficiency.',
-            'markers': ['hemoglobin', 'ferritin']
-        })
+    category_scores = _load_json(row['category_scores'])
     
-    # Kidney Function
-    if latest.get('creatinine', {}).get('value', 0) > 1.3 and latest.get('egfr', {}).get('value', 100) < 60:
-        patterns.append({
-            'type': 'warning',
-            'name': 'Reduced Kidney Function',
-            'description': 'Elevated creatinine with low eGFR suggests reduced kidney function.',
-            'markers': ['creatinine', 'egfr']
-        })
+    # Calculate overall score
+    overall_score = None
+    if category_scores:
+        overall_score = sum(Decimal(s['score']) for s in category_scores) / len(category_scores)
     
-    return patterns
+    # Plain dicts are validated against DashboardResponse once, in a single pass
+    return {
+        'overall_score': overall_score,
+        'category_scores': category_scores,
+        'recent_observations': _load_json(row['recent_observations']),
+        'active_medications': _load_json(row['active_medications']),
+        'active_conditions': _load_json(row['active_conditions']),
+        # Precomputed by the pattern alert sweep
+        'pattern_alerts': _load_json(row['pattern_alerts'])
+    }
 
 # ============================================
 # Visit Preparation Export
@@ -982,16 +1306,10 @@ async def get_visit_prep(user: dict = Depends(get_current_user)):
         flagged = await conn.fetch(
             """
             SELECT o.*, bd.name as biomarker_name, bd.unit
-            FROM observations o
-            JOIN biomarker_definitions bd ON o.biomarker_id = bd.id
-            WHERE o.user_id = $1 AND o.deleted_at IS NULL
-              AND o.status IN ('attention', 'critical')
-              AND o.id IN (
-                  SELECT id FROM (
-                      SELECT id, ROW_NUMBER() OVER (PARTITION BY biomarker_id ORDER BY effective_date DESC) as rn
-                      FROM observations WHERE user_id = $1 AND deleted_at IS NULL
-                  ) sub WHERE rn = 1
-              )
+            FROM latest_observations lo
+            JOIN observations o ON o.id = lo.observation_id
+            JOIN biomarker_definitions bd ON lo.biomarker_id = bd.id
+            WHERE lo.user_id = $1 AND lo.status IN ('attention', 'critical')
             ORDER BY CASE WHEN o.status = 'critical' THEN 1 ELSE 2 END, bd.category
             """,
             user['id']
@@ -1045,24 +1363,32 @@ async def extract_lab_values(
 ):
     """
     Extract lab values from uploaded lab report (PDF or image).
-    Uses Gemini Vision for OCR and intelligent extraction.
+    Reads it with local Tesseract OCR first and uses Gemini Vision when the
+    local reading is not confident enough.
     """
     try:
-        from services.gemini_service import get_gemini_service
+        from services.local_ocr import lab_value_extractor
+        from services.biomarker_resolver import get_biomarker_resolver
+        from services.ocr_pipeline import OCR_ALLOWED_TYPES, OCR_MAX_FILE_BYTES
+        from services.uploads import spool_upload, UploadTooLarge
         
         # Validate file type
-        allowed_types = ['application/pdf', 'image/jpeg', 'image/png', 'image/webp']
-        if file.content_type not in allowed_types:
+        if file.content_type not in OCR_ALLOWED_TYPES:
             raise HTTPException(status_code=400, detail=f"Unsupported file type: {file.content_type}")
         
-        # Read file content
-        content = await file.read()
-        if len(content) > 10 * 1024 * 1024:  # 10MB limit
-            raise HTTPException(status_code=400, detail="File too large (max 10MB)")
+        # Spool to disk in chunks rather than reading it into memory
+        try:
+            upload = await spool_upload(file, OCR_MAX_FILE_BYTES)  # 10MB limit
+        except UploadTooLarge as e:
+            raise HTTPException(status_code=413, detail=str(e))
+        
+        # Extract locally, escalating to Gemini
+        with upload:
+            extract = lab_value_extractor()
+            result = await extract(upload.path, upload.mime_type)
         
-        # Extract using Gemini
-        gemini = get_gemini_service()
-        result = await gemini.extract_lab_values(content, file.content_type)
+        # Names this user (or enough others) confirmed before, and OCR typos
+        get_biomarker_resolver().apply(result, user['id'])
         
         if not result.success:
             raise HTTPException(status_code=422, detail=result.error or "Failed to extract lab values")
@@ -1084,15 +1410,81 @@ async def extract_lab_values(
                 }
                 for v in result.extracted_values
             ],
-            "unmapped_count": sum(1 for v in result.extracted_values if not v.mapped_biomarker_id)
+            "unmapped_count": sum(1 for v in result.extracted_values if not v.mapped_biomarker_id),
+            "engine": result.engine
         }
         
+    except HTTPException:
+        raise
     except ValueError as e:
         raise HTTPException(status_code=500, detail=f"AI service not configured: {str(e)}")
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 
+@app.post("/api/ocr/extract-batch", tags=["AI"])
+async def extract_lab_values_batch(
+    files: List[UploadFile] = File(...),
+    user: dict = Depends(get_current_user)
+):
+    """
+    Extract lab values from several lab reports or scanned pages at once.
+    PDFs are split into pages and pages are extracted concurrently. Streams
+    NDJSON: a `start` event, one `page` event per page as it finishes, then a
+    `summary` event with the values merged and de-duplicated across pages.
+    """
+    from services.local_ocr import lab_value_extractor
+    from services.ocr_pipeline import (
+        split_pages, extract_pages, OCR_ALLOWED_TYPES, OCR_MAX_FILE_BYTES, OCR_MAX_FILES
+    )
+    from services.uploads import spool_upload, close_uploads, UploadTooLarge
+    from services.biomarker_resolver import get_biomarker_resolver
+    
+    try:
+        extract_page = lab_value_extractor()
+    except ValueError as e:
+        raise HTTPException(status_code=500, detail=f"AI service not configured: {str(e)}")
+    
+    resolver = get_biomarker_resolver()
+    
+    async def extract(content, mime_type):
+        return resolver.apply(await extract_page(content, mime_type), user['id'])
+    
+    if len(files) > OCR_MAX_FILES:
+        raise HTTPException(status_code=400, detail=f"Too many files (max {OCR_MAX_FILES})")
+    
+    for file in files:
+        if file.content_type not in OCR_ALLOWED_TYPES:
+            raise HTTPException(status_code=400, detail=f"Unsupported file type: {file.content_type}")
+    
+    # Spool every file to disk; they are removed once the response is sent
+    uploads = []
+    try:
+        for file in files:
+            try:
+                uploads.append(await spool_upload(file, OCR_MAX_FILE_BYTES))
+            except UploadTooLarge as e:
+                raise HTTPException(status_code=413, detail=f"{e}: {file.filename}")
+        
+        try:
+            pages = await split_pages([(u.filename, u.mime_type, u.path) for u in uploads])
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+        except Exception as e:
+            raise HTTPException(status_code=400, detail=f"Could not read PDF: {str(e)}")
+    except BaseException:
+        close_uploads(*uploads)
+        raise
+    
+    async def stream():
+        async for event in extract_pages(pages, extract):
+            yield json.dumps(event, default=str) + "\n"
+    
+    return StreamingResponse(
+        stream(), media_type="application/x-ndjson", background=BackgroundTask(close_uploads, *uploads)
+    )
+
+
 @app.get("/api/ai/explain/{biomarker_id}", tags=["AI"])
 async def explain_biomarker(
     biomarker_id: str,
@@ -1103,23 +1495,17 @@ async def explain_biomarker(
     """
     try:
         from services.gemini_service import get_gemini_service
+        from services.biomarker_catalog import get_biomarker_catalog
+        
+        # Get biomarker definition
+        biomarker = get_biomarker_catalog().get(biomarker_id)
+        if not biomarker:
+            raise HTTPException(status_code=404, detail="Biomarker not found")
         
         async with db_pool.acquire() as conn:
-            # Get biomarker definition
-            biomarker = await conn.fetchrow(
-                "SELECT * FROM biomarker_definitions WHERE id = $1", biomarker_id
-            )
-            if not biomarker:
-                raise HTTPException(status_code=404, detail="Biomarker not found")
-            
             # Get latest observation for this user
             observation = await conn.fetchrow(
-                """
-                SELECT value, status, effective_date 
-                FROM observations 
-                WHERE user_id = $1 AND biomarker_id = $2 AND deleted_at IS NULL
-                ORDER BY effective_date DESC LIMIT 1
-                """,
+                "SELECT value, status, effective_date FROM latest_observations WHERE user_id = $1 AND biomarker_id = $2",
                 user['id'], biomarker_id
             )
             
@@ -1189,12 +1575,11 @@ async def get_health_insights(
             # Get latest observations
             observations = await conn.fetch(
                 """
-                SELECT DISTINCT ON (o.biomarker_id)
-                    o.biomarker_id, o.value, o.status, b.name, b.unit, b.category
-                FROM observations o
-                JOIN biomarker_definitions b ON o.biomarker_id = b.id
-                WHERE o.user_id = $1 AND o.deleted_at IS NULL
-                ORDER BY o.biomarker_id, o.effective_date DESC
+                SELECT lo.biomarker_id, lo.value, lo.status, b.name, b.unit, b.category
+                FROM latest_observations lo
+                JOIN biomarker_definitions b ON lo.biomarker_id = b.id
+                WHERE lo.user_id = $1
+                ORDER BY lo.biomarker_id
                 """,
                 user['id']
             )
@@ -1224,7 +1609,7 @@ async def get_health_insights(
         
         # Generate insights
         gemini = get_gemini_service()
-        result = await gemini.generate_insights(obs_data, condition_names, medication_names)
+        result = await gemini.generate_insights(obs_data, condition_names, medication_names, user_id=str(user['id']))
         
         if not result.success:
             raise HTTPException(status_code=500, detail=result.error)
@@ -1255,13 +1640,11 @@ async def get_smart_visit_questions(
             # Get flagged markers
             flagged = await conn.fetch(
                 """
-                SELECT DISTINCT ON (o.biomarker_id)
-                    b.name, o.value, b.unit, o.status
-                FROM observations o
-                JOIN biomarker_definitions b ON o.biomarker_id = b.id
-                WHERE o.user_id = $1 AND o.deleted_at IS NULL
-                AND o.status IN ('attention', 'critical')
-                ORDER BY o.biomarker_id, o.effective_date DESC
+                SELECT b.name, lo.value, b.unit, lo.status
+                FROM latest_observations lo
+                JOIN biomarker_definitions b ON lo.biomarker_id = b.id
+                WHERE lo.user_id = $1 AND lo.status IN ('attention', 'critical')
+                ORDER BY lo.biomarker_id
                 """,
                 user['id']
             )
@@ -1296,7 +1679,7 @@ async def get_smart_visit_questions(
         condition_names = [c['name'] for c in conditions]
         
         gemini = get_gemini_service()
-        questions = await gemini.generate_visit_questions(flagged_data, changes_data, condition_names)
+        questions = await gemini.generate_visit_questions(flagged_data, changes_data, condition_names, user_id=str(user['id']))
         
         return {"success": True, "questions": questions}
         
@@ -1355,7 +1738,7 @@ async def get_test_timing_recommendations(
         ]
         
         gemini = get_gemini_service()
-        result = await gemini.optimize_test_timing(history_data)
+        result = await gemini.optimize_test_timing(history_data, user_id=str(user['id']))
         
         return {"success": True, **result}
         
@@ -1367,135 +1750,390 @@ async def get_test_timing_recommendations(
 # PDF Export Endpoints
 # ============================================
 
+# Clients may keep a copy but must revalidate it (a data change mints a new ETag)
+PDF_CACHE_CONTROL = "private, no-cache"
+
+def pdf_response(pdf, filename: str, etag: Optional[str] = None) -> StreamingResponse:
+    """Stream a rendered PDF from its temp file in fixed-size chunks"""
+    headers = {
+        "Content-Disposition": f"attachment; filename={filename}",
+        "Content-Length": str(pdf.size)
+    }
+    if etag:
+        headers.update({"ETag": etag, "Cache-Control": PDF_CACHE_CONTROL})
+    return StreamingResponse(pdf.iter_chunks(), media_type="application/pdf", headers=headers)
+
+def _parse_byte_range(range_header: Optional[str], size: int) -> Optional[tuple]:
+    """
+    Parse a single `bytes=` range into inclusive (start, end). Returns None to
+    serve the whole body (no header, malformed or multi-range requests) and
+    raises 416 when the range lies outside the file.
+    """
+    if not range_header or not range_header.startswith("bytes=") or "," in range_header:
+        return None
+    first, _, last = range_header[len("bytes="):].strip().partition("-")
+    try:
+        if first:
+            start = int(first)
+            end = min(int(last), size - 1) if last else size - 1
+        else:
+            # Suffix range: the last N bytes
+            start = max(size - int(last), 0)
+            end = size - 1
+    except ValueError:
+        return None
+    if start > end or start >= size:
+        raise HTTPException(
+            status_code=416,
+            detail="Requested range not satisfiable",
+            headers={"Content-Range": f"bytes */{size}"}
+        )
+    return start, end
+
+def cached_pdf_response(request: Request, cache, user_id, kind: str, key: str, filename: str) -> Optional[Response]:
+    """
+    Answer from the PDF artifact cache: 304 for a matching If-None-Match,
+    206 for a single byte range (honouring If-Range), else the whole file.
+    Returns None on a cache miss.
+    """
+    etag = cache.etag(key)
+    if _etag_matches(request.headers.get("if-none-match"), etag):
+        return Response(status_code=304, headers={"ETag": etag, "Cache-Control": PDF_CACHE_CONTROL})
+    
+    pdf = cache.open(user_id, kind, key)
+    if pdf is None:
+        return None
+    
+    headers = {
+        "Content-Disposition": f"attachment; filename={filename}",
+        "ETag": etag,
+        "Cache-Control": PDF_CACHE_CONTROL,
+        "Accept-Ranges": "bytes"
+    }
+    byte_range = None
+    if request.headers.get("if-range", etag).strip() == etag:
+        try:
+            byte_range = _parse_byte_range(request.headers.get("range"), pdf.size)
+        except HTTPException:
+            pdf.close()
+            raise
+    
+    if byte_range is None:
+        headers["Content-Length"] = str(pdf.size)
+        return StreamingResponse(pdf.iter_range(), media_type="application/pdf", headers=headers)
+    
+    start, end = byte_range
+    headers["Content-Range"] = f"bytes {start}-{end}/{pdf.size}"
+    headers["Content-Length"] = str(end - start + 1)
+    return StreamingResponse(pdf.iter_range(start, end), status_code=206, media_type="application/pdf", headers=headers)
+
 @app.get("/api/export/visit-pdf", tags=["Export"])
 async def export_visit_pdf(
+    request: Request,
     user: dict = Depends(get_current_user)
 ):
     """
     Generate and download a PDF visit summary.
+    While the user's data is unchanged the previous render is served from the
+    PDF cache (strong ETag, If-None-Match and Range supported). Otherwise
+    rendering runs in the PDF process pool; returns 503 when it is saturated.
+    For a request that never holds the connection, use /api/export/jobs.
     """
     try:
-        from services.pdf_service import get_pdf_service
-        from services.gemini_service import get_gemini_service
+        from services.pdf_service import get_pdf_renderer
+        from services.pdf_cache import get_pdf_artifact_cache
+        from services.reports import load_report_header, load_visit_summary
+        from services.worker_pool import WorkerPoolSaturated
         
         async with db_pool.acquire() as conn:
-            # Get user info
-            user_info = await conn.fetchrow(
-                "SELECT first_name, last_name FROM users WHERE id = $1", user['id']
-            )
-            patient_name = f"{user_info['first_name'] or ''} {user_info['last_name'] or ''}".strip() or "Patient"
-            
-            # Get flagged markers
-            flagged = await conn.fetch(
-                """
-                SELECT DISTINCT ON (o.biomarker_id) b.name, o.value, b.unit, o.status
-                FROM observations o
-                JOIN biomarker_definitions b ON o.biomarker_id = b.id
-                WHERE o.user_id = $1 AND o.deleted_at IS NULL AND o.status IN ('attention', 'critical')
-                ORDER BY o.biomarker_id, o.effective_date DESC
-                """,
-                user['id']
-            )
-            
-            # Get significant changes
-            changes = await conn.fetch(
-                """
-                WITH ordered AS (
-                    SELECT biomarker_id, value, effective_date,
-                           LAG(value) OVER (PARTITION BY biomarker_id ORDER BY effective_date) as prev
-                    FROM observations WHERE user_id = $1 AND deleted_at IS NULL
-                )
-                SELECT b.name, 
-                       CASE WHEN o.prev > 0 THEN ((o.value - o.prev) / o.prev * 100) ELSE 0 END as change
-                FROM ordered o
-                JOIN biomarker_definitions b ON o.biomarker_id = b.id
-                WHERE o.prev IS NOT NULL AND ABS((o.value - o.prev) / NULLIF(o.prev, 0) * 100) > 15
-                """,
-                user['id']
-            )
-            
-            # Get medications, conditions, allergies
-            medications = await conn.fetch(
-                "SELECT name, dosage, frequency, active FROM medications WHERE user_id = $1 AND deleted_at IS NULL",
-                user['id']
-            )
-            conditions = await conn.fetch(
-                "SELECT name, clinical_status as status FROM conditions WHERE user_id = $1 AND deleted_at IS NULL",
-                user['id']
-            )
-            allergies = await conn.fetch(
-                "SELECT allergen as name, criticality as severity FROM allergies WHERE user_id = $1 AND deleted_at IS NULL",
-                user['id']
-            )
+            patient_name, data_version = await load_report_header(conn, user['id'])
+        filename = f"visit-summary-{datetime.now().strftime('%Y-%m-%d')}.pdf"
         
-        # Format data
-        flagged_data = [{"name": f['name'], "value": float(f['value']), "unit": f['unit'], "status": f['status']} for f in flagged]
-        changes_data = [{"name": c['name'], "change": float(c['change']), "direction": "increased" if c['change'] > 0 else "decreased"} for c in changes]
+        cache = get_pdf_artifact_cache()
+        cache_key = cache.key("visit-summary", user['id'], data_version, patient_name)
+        cached = cached_pdf_response(request, cache, user['id'], "visit-summary", cache_key, filename)
+        if cached is not None:
+            return cached
         
-        # Try to get AI insights
-        ai_insights = None
-        try:
-            gemini = get_gemini_service()
-            # Get observations for insights
-            async with db_pool.acquire() as conn:
-                obs = await conn.fetch(
-                    """
-                    SELECT DISTINCT ON (o.biomarker_id) b.name, o.value, b.unit, o.status
-                    FROM observations o
-                    JOIN biomarker_definitions b ON o.biomarker_id = b.id
-                    WHERE o.user_id = $1 AND o.deleted_at IS NULL
-                    ORDER BY o.biomarker_id, o.effective_date DESC
-                    """,
-                    user['id']
-                )
-            obs_data = [{"name": o['name'], "value": float(o['value']), "unit": o['unit'], "status": o['status']} for o in obs]
-            condition_names = [c['name'] for c in conditions if c['status'] == 'active']
-            med_names = [m['name'] for m in medications if m['active']]
-            
-            insight_result = await gemini.generate_insights(obs_data, condition_names, med_names)
-            if insight_result.success:
-                ai_insights = {
-                    "summary": insight_result.summary,
-                    "lifestyle_suggestions": insight_result.lifestyle_suggestions
-                }
-        except:
-            pass  # AI insights are optional
-        
-        # Generate default questions
-        questions = [
-            "What do my flagged markers indicate about my health?",
-            "Should I be concerned about the significant changes in my results?",
-            "Are my current medications affecting any of these results?",
-            "What lifestyle changes would you recommend?",
-            "When should I retest these markers?"
-        ]
+        # Not cacheable when AI insights failed transiently
+        report, cacheable = await load_visit_summary(db_pool, user['id'], patient_name)
         
         # Generate PDF
-        pdf_service = get_pdf_service()
-        from datetime import datetime
-        
-        pdf_bytes = pdf_service.generate_visit_summary(
-            patient_name=patient_name,
-            report_date=datetime.now(),
-            flagged_markers=flagged_data,
-            significant_changes=changes_data,
-            medications=[dict(m) for m in medications],
-            conditions=[dict(c) for c in conditions],
-            allergies=[dict(a) for a in allergies],
-            questions=questions,
-            ai_insights=ai_insights
-        )
-        
-        return StreamingResponse(
-            io.BytesIO(pdf_bytes),
-            media_type="application/pdf",
-            headers={"Content-Disposition": f"attachment; filename=visit-summary-{datetime.now().strftime('%Y-%m-%d')}.pdf"}
-        )
-        
+        try:
+            pdf = await get_pdf_renderer().visit_summary(**report)
+        except WorkerPoolSaturated as e:
+            raise service_busy(e)
+        except asyncio.TimeoutError:
+            raise HTTPException(status_code=504, detail="PDF rendering timed out")
+        
+        if not (cacheable and cache.enabled):
+            return pdf_response(pdf, filename)
+        await asyncio.to_thread(cache.put, user['id'], "visit-summary", cache_key, pdf.file)
+        return pdf_response(pdf, filename, etag=cache.etag(cache_key))
+        
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 
+@app.get("/api/export/lab-report-pdf", tags=["Export"])
+async def export_lab_report_pdf(
+    user: dict = Depends(get_current_user)
+):
+    """
+    Download the full lab history as a PDF, grouped by category.
+    """
+    from services.pdf_service import get_pdf_renderer
+    from services.reports import load_report_header, load_lab_history
+    from services.worker_pool import WorkerPoolSaturated
+    
+    async with db_pool.acquire() as conn:
+        patient_name, _ = await load_report_header(conn, user['id'])
+        report = await load_lab_history(conn, user['id'], patient_name)
+    
+    try:
+        pdf = await get_pdf_renderer().lab_report_summary(**report)
+    except WorkerPoolSaturated as e:
+        raise service_busy(e)
+    except asyncio.TimeoutError:
+        raise HTTPException(status_code=504, detail="PDF rendering timed out")
+    
+    return pdf_response(pdf, f"lab-history-{datetime.now().strftime('%Y-%m-%d')}.pdf")
+
+@app.get("/api/export/observations", tags=["Export"])
+async def export_observations(
+    user: dict = Depends(get_current_user),
+    format: str = Query("ndjson", pattern="^(ndjson|csv)$"),
+    biomarker_id: Optional[str] = None,
+    start_date: Optional[date] = None,
+    end_date: Optional[date] = None,
+    gzip: bool = False
+):
+    """
+    Download every observation, oldest first, as NDJSON or CSV (optionally
+    gzipped). Rows are streamed from a database cursor as they are read, so
+    any history size can be exported; returns 503 when too many exports are
+    already running.
+    """
+    from services.data_export import (
+        EXPORT_FORMATS, OBSERVATION_EXPORT_COLUMNS, get_data_exporter, observation_export_query
+    )
+    from services.worker_pool import WorkerPoolSaturated
+    
+    exporter = get_data_exporter()
+    try:
+        exporter.check_capacity()
+    except WorkerPoolSaturated as e:
+        raise service_busy(e)
+    
+    query, params = observation_export_query(user['id'], biomarker_id, start_date, end_date)
+    filename = f"observations-{datetime.now().strftime('%Y-%m-%d')}.{format}" + (".gz" if gzip else "")
+    return StreamingResponse(
+        exporter.stream(db_pool, query, params, OBSERVATION_EXPORT_COLUMNS, format, gzip=gzip),
+        media_type="application/gzip" if gzip else EXPORT_FORMATS[format],
+        headers={"Content-Disposition": f"attachment; filename={filename}"}
+    )
+
+# ============================================
+# Export Jobs
+# ============================================
+
+class ExportJobCreate(BaseModel):
+    kind: str = Field(..., description="visit-summary or lab-report")
+
+def export_job_response(job: Dict[str, Any]) -> Dict[str, Any]:
+    return {
+        "id": str(job['id']),
+        "kind": job['kind'],
+        "status": job['status'],
+        "progress": job['progress'],
+        "stage": job['stage'],
+        "attempts": job['attempts'],
+        "max_attempts": job['max_attempts'],
+        "error": job['error'],
+        "created_at": job['created_at'],
+        "started_at": job['started_at'],
+        "finished_at": job['finished_at'],
+        "expires_at": job['expires_at'],
+        "download_url": f"/api/export/jobs/{job['id']}/download" if job['status'] == 'succeeded' else None
+    }
+
+def open_export_result(row: Dict[str, Any], filename: Optional[str] = None):
+    """Open a finished job's result file; multi-file results are directories holding `filename`"""
+    path = row['result_path']
+    if os.path.isdir(path):
+        path = os.path.join(path, filename or row['result_filename'])
+    try:
+        return open(path, "rb")
+    except FileNotFoundError:
+        raise HTTPException(status_code=410, detail="Export result has expired")
+
+def iter_export_file(file):
+    with file:
+        while chunk := file.read(64 * 1024):
+            yield chunk
+
+@app.post("/api/export/jobs", status_code=202, tags=["Export"])
+async def create_export_job(job: ExportJobCreate, response: Response, user: dict = Depends(get_current_user)):
+    """
+    Queue an export and return immediately; poll the job for progress.
+    An identical export that is still pending is returned instead of a new one.
+    """
+    from services.export_jobs import get_export_job_queue, EXPORT_HANDLERS
+    
+    if job.kind not in EXPORT_HANDLERS:
+        raise HTTPException(status_code=400, detail=f"Unknown export kind. Use one of: {', '.join(sorted(EXPORT_HANDLERS))}")
+    
+    row = await get_export_job_queue().enqueue(user['id'], job.kind)
+    response.headers["Location"] = f"/api/export/jobs/{row['id']}"
+    return export_job_response(row)
+
+@app.get("/api/export/jobs/{job_id}", tags=["Export"])
+async def get_export_job(job_id: str, user: dict = Depends(get_current_user)):
+    from services.export_jobs import get_export_job_queue
+    
+    row = await get_export_job_queue().get(job_id, user['id'])
+    if not row:
+        raise HTTPException(status_code=404, detail="Export job not found")
+    return export_job_response(row)
+
+@app.get("/api/export/jobs/{job_id}/download", tags=["Export"])
+async def download_export_job(job_id: str, user: dict = Depends(get_current_user)):
+    from services.export_jobs import get_export_job_queue
+    
+    row = await get_export_job_queue().get(job_id, user['id'])
+    if not row:
+        raise HTTPException(status_code=404, detail="Export job not found")
+    if row['status'] != 'succeeded':
+        raise HTTPException(status_code=409, detail=f"Export job is {row['status']}")
+    
+    file = open_export_result(row)
+    return StreamingResponse(
+        iter_export_file(file),
+        media_type=row['result_media_type'],
+        headers={
+            "Content-Disposition": f"attachment; filename={row['result_filename']}",
+            "Content-Length": str(os.fstat(file.fileno()).st_size)
+        }
+    )
+
+
+# ============================================
+# FHIR Bulk Data Export
+# ============================================
+
+FHIR_NDJSON_FORMATS = {"application/fhir+ndjson", "application/ndjson", "ndjson"}
+
+def operation_outcome(status_code: int, diagnostics: str, code: str = "processing") -> JSONResponse:
+    return JSONResponse(
+        status_code=status_code,
+        media_type="application/fhir+json",
+        content={
+            "resourceType": "OperationOutcome",
+            "issue": [{"severity": "error", "code": code, "diagnostics": diagnostics}]
+        }
+    )
+
+def fhir_export_request_url(request: Request, params: Dict[str, Any]) -> str:
+    query = {"_type": ",".join(params["types"])}
+    if params.get("since"):
+        query["_since"] = params["since"]
+    return str(request.url_for("fhir_patient_export").include_query_params(**query))
+
+@app.get("/api/fhir/Patient/$export", status_code=202, tags=["Export"], name="fhir_patient_export")
+async def fhir_patient_export(
+    request: Request,
+    response: Response,
+    _type: Optional[str] = Query(None, description="Comma-separated resource types; all when omitted"),
+    _since: Optional[datetime] = Query(None, description="Only resources changed at or after this instant"),
+    _outputFormat: str = Query("application/fhir+ndjson"),
+    user: dict = Depends(get_current_user)
+):
+    """
+    FHIR Bulk Data kick-off for the signed-in patient's own records.
+    Queues a fhir-bulk export job; poll the Content-Location URL until it
+    returns the manifest of NDJSON files.
+    """
+    from services.fhir_export import FHIR_EXPORT_KIND, FHIR_RESOURCE_TYPES
+    from services.export_jobs import get_export_job_queue
+    
+    if _outputFormat not in FHIR_NDJSON_FORMATS:
+        return operation_outcome(400, f"Unsupported _outputFormat: {_outputFormat}", code="not-supported")
+    types = [t.strip() for t in _type.split(",") if t.strip()] if _type else FHIR_RESOURCE_TYPES
+    unknown = [t for t in types if t not in FHIR_RESOURCE_TYPES]
+    if unknown or not types:
+        return operation_outcome(
+            400, f"Unsupported _type: {', '.join(unknown)}. Use any of: {', '.join(FHIR_RESOURCE_TYPES)}",
+            code="not-supported"
+        )
+    if _since is not None and _since.tzinfo is None:
+        return operation_outcome(400, "_since must include a timezone", code="invalid")
+    
+    params = {
+        "types": [t for t in FHIR_RESOURCE_TYPES if t in types],
+        "since": _since.isoformat() if _since else None
+    }
+    row = await get_export_job_queue().enqueue(user['id'], FHIR_EXPORT_KIND, params)
+    response.headers["Content-Location"] = str(request.url_for("fhir_bulk_status", job_id=str(row['id'])))
+    return {"id": str(row['id']), "status": row['status']}
+
+@app.get("/api/fhir/bulkstatus/{job_id}", tags=["Export"], name="fhir_bulk_status")
+async def fhir_bulk_status(job_id: str, request: Request, user: dict = Depends(get_current_user)):
+    """Bulk export status: 202 while running, then the manifest of output files"""
+    from services.fhir_export import FHIR_EXPORT_KIND, load_manifest
+    from services.export_jobs import get_export_job_queue, EXPORT_POLL_SECONDS
+    
+    row = await get_export_job_queue().get(job_id, user['id'])
+    if not row or row['kind'] != FHIR_EXPORT_KIND:
+        return operation_outcome(404, "Export job not found", code="not-found")
+    if row['status'] in ('queued', 'running'):
+        return Response(status_code=202, headers={
+            "X-Progress": f"{row['progress']}% {row['stage'] or row['status']}",
+            "Retry-After": str(max(1, int(EXPORT_POLL_SECONDS)))
+        })
+    if row['status'] != 'succeeded':
+        return operation_outcome(500, row['error'] or f"Export job is {row['status']}", code="exception")
+    
+    try:
+        manifest = await asyncio.to_thread(load_manifest, row['result_path'])
+    except FileNotFoundError:
+        return operation_outcome(410, "Export result has expired", code="not-found")
+    params = json.loads(row['params']) if isinstance(row['params'], str) else row['params']
+    return {
+        "transactionTime": manifest['transactionTime'],
+        "request": fhir_export_request_url(request, params),
+        "requiresAccessToken": True,
+        "output": [
+            {
+                "type": item['type'],
+                "url": str(request.url_for("fhir_bulk_file", job_id=job_id, resource_type=item['type'])),
+                "count": item['count']
+            }
+            for item in manifest['output']
+        ],
+        "error": []
+    }
+
+@app.get("/api/fhir/bulkfiles/{job_id}/{resource_type}.ndjson", tags=["Export"], name="fhir_bulk_file")
+async def fhir_bulk_file(job_id: str, resource_type: str, user: dict = Depends(get_current_user)):
+    from services.fhir_export import FHIR_EXPORT_KIND, FHIR_NDJSON_MEDIA_TYPE, FHIR_RESOURCE_TYPES
+    from services.export_jobs import get_export_job_queue
+    
+    row = await get_export_job_queue().get(job_id, user['id'])
+    if not row or row['kind'] != FHIR_EXPORT_KIND or resource_type not in FHIR_RESOURCE_TYPES:
+        raise HTTPException(status_code=404, detail="Export file not found")
+    if row['status'] != 'succeeded':
+        raise HTTPException(status_code=409, detail=f"Export job is {row['status']}")
+    
+    file = open_export_result(row, f"{resource_type}.ndjson")
+    return StreamingResponse(
+        iter_export_file(file),
+        media_type=FHIR_NDJSON_MEDIA_TYPE,
+        headers={"Content-Length": str(os.fstat(file.fileno()).st_size)}
+    )
+
+
 # ============================================
 # Family Members (Family Health Graph)
 # ============================================
@@ -1661,6 +2299,46 @@ async def get_family_risk_patterns(user: dict = Depends(get_current_user)):
 async def health_check():
     return {"status": "healthy", "version": "3.0.0"}
 
+async def require_metrics_token(credentials: HTTPAuthorizationCredentials = Depends(security)):
+    if not config.METRICS_TOKEN:
+        raise HTTPException(status_code=404, detail="Not Found")
+    if not secrets.compare_digest(credentials.credentials.encode(), config.METRICS_TOKEN.encode()):
+        raise HTTPException(status_code=403, detail="Invalid metrics token")
+
+@app.get("/api/system/metrics", tags=["System"], dependencies=[Depends(require_metrics_token)])
+async def system_metrics():
+    """In-process cache and worker pool counters for this API worker (needs METRICS_TOKEN)."""
+    from services.principal_cache import get_principal_cache
+    from services.password_service import get_password_hasher
+    from services.biomarker_catalog import get_biomarker_catalog
+    from services.alias_index import get_alias_index
+    from services.biomarker_resolver import get_biomarker_resolver
+    from services.pattern_rules import get_pattern_engine
+    from services.data_export import get_data_exporter
+    from services.gemini_service import gemini_service_stats, get_ai_response_cache
+    from services.pdf_service import pdf_renderer_stats
+    from services.pdf_cache import get_pdf_artifact_cache
+    from services.export_jobs import get_export_job_queue
+    from services.local_ocr import local_ocr_stats
+    from services.metrics import latency_stats
+    
+    return {
+        "ai_response_cache": get_ai_response_cache().stats(),
+        "biomarker_catalog": get_biomarker_catalog().stats(),
+        "alias_index": get_alias_index().stats(),
+        "alias_resolver": get_biomarker_resolver().stats(),
+        "pattern_rules": get_pattern_engine().stats(),
+        "principal_cache": get_principal_cache().stats(),
+        "password_hash_pool": get_password_hasher().stats(),
+        "pdf_render_pool": pdf_renderer_stats(),
+        "pdf_artifact_cache": get_pdf_artifact_cache().stats(),
+        "export_jobs": get_export_job_queue().stats(),
+        "data_export": get_data_exporter().stats(),
+        "gemini_client": gemini_service_stats(),
+        "local_ocr": local_ocr_stats(),
+        "latency": latency_stats()
+    }
+
 @app.get("/", tags=["System"])
 async def root():
     return {"message": "HealthCanvas API", "docs": "/docs", "version": "3.0.0"}
@@ -0,0 +1,180 @@
+"""
+HealthCanvas - Maintenance Commands
+Consistency checks and rebuilds for derived tables
+
+Run from the api directory:
+    python maintenance.py backfill-latest-observations
+    python maintenance.py check-latest-observations [--repair]
+    python maintenance.py check-health-scores [--repair]
+    python maintenance.py purge-ai-cache
+    python maintenance.py purge-pdf-cache
+    python maintenance.py purge-export-jobs
+    python maintenance.py evaluate-patterns
+"""
+
+import argparse
+import asyncio
+import sys
+
+from main import create_db_pool
+
+# ============================================
+# Latest Observations
+# ============================================
+
+async def backfill_latest_observations(pool) -> int:
+    """Populate latest_observations (and the scores derived from it) from observations"""
+    async with pool.acquire() as conn:
+        async with conn.transaction():
+            latest = await conn.fetchval("SELECT rebuild_latest_observations()")
+            scores = await conn.fetchval("SELECT rebuild_health_scores()")
+    print(f"latest_observations: backfilled {latest} row(s)")
+    print(f"health_scores: rebuilt {scores} row(s)")
+    return 0
+
+async def check_latest_observations(pool, repair: bool = False) -> int:
+    """Compare latest_observations with a from-scratch computation; optionally backfill it"""
+    async with pool.acquire() as conn:
+        mismatches = await conn.fetch("SELECT * FROM check_latest_observations()")
+    for row in mismatches:
+        print(
+            f"  {row['user_id']} / {row['biomarker_id']}: "
+            f"stored={row['stored_observation_id']} expected={row['expected_observation_id']}"
+        )
+    print(f"latest_observations: {len(mismatches)} inconsistent row(s)")
+
+    if mismatches and repair:
+        return await backfill_latest_observations(pool)
+    return 1 if mismatches else 0
+
+# ============================================
+# Health Scores
+# ============================================
+
+async def check_health_scores(pool, repair: bool = False) -> int:
+    """Compare health_scores with a from-scratch computation; optionally rebuild it"""
+    async with pool.acquire() as conn:
+        mismatches = await conn.fetch("SELECT * FROM check_health_scores()")
+        for row in mismatches:
+            print(
+                f"  {row['user_id']} / {row['category']}: "
+                f"stored={row['stored_score']} ({row['stored_count']}) "
+                f"expected={row['expected_score']} ({row['expected_count']})"
+            )
+        print(f"health_scores: {len(mismatches)} inconsistent row(s)")
+
+        if mismatches and repair:
+            async with conn.transaction():
+                rebuilt = await conn.fetchval("SELECT rebuild_health_scores()")
+            print(f"health_scores: rebuilt {rebuilt} row(s)")
+            return 0
+
+    return 1 if mismatches else 0
+
+# ============================================
+# AI Response Cache
+# ============================================
+
+async def purge_ai_cache(pool) -> int:
+    """Delete expired rows from the persistent AI response cache"""
+    async with pool.acquire() as conn:
+        result = await conn.execute("DELETE FROM ai_response_cache WHERE expires_at <= NOW()")
+    print(f"ai_response_cache: purged {result.split()[-1]} expired row(s)")
+    return 0
+
+# ============================================
+# PDF Artifact Cache
+# ============================================
+
+def purge_pdf_cache() -> int:
+    """Delete cached PDFs older than PDF_CACHE_MAX_AGE_SECONDS"""
+    from services.pdf_cache import get_pdf_artifact_cache
+
+    removed = get_pdf_artifact_cache().purge()
+    print(f"pdf cache: purged {removed} expired file(s)")
+    return 0
+
+# ============================================
+# Export Jobs
+# ============================================
+
+async def purge_export_jobs(pool) -> int:
+    """Delete expired export jobs and their result files"""
+    from services.export_jobs import get_export_job_queue
+
+    queue = get_export_job_queue()
+    queue.attach(pool)
+    removed = await queue.purge_expired()
+    print(f"export_jobs: purged {removed} expired job(s)")
+    return 0
+
+# ============================================
+# Pattern Alerts
+# ============================================
+
+async def evaluate_patterns(pool) -> int:
+    """Evaluate pattern rules for every user and update pattern_alerts"""
+    from services.pattern_rules import get_pattern_engine
+
+    engine = get_pattern_engine()
+    await engine.start(pool, sweep=False)
+    try:
+        result = await engine.sweep(full=True)
+    finally:
+        await engine.stop()
+    if result is None:
+        print("pattern_alerts: another process is sweeping, try again later")
+        return 1
+    print(
+        f"pattern_alerts: evaluated {result['users']} user(s) against {len(engine.compiled.rules)} rule(s) "
+        f"in {result['seconds']:.1f}s ({result['users_per_second']:.0f} users/s), "
+        f"opened {result['opened']}, resolved {result['resolved']}, deleted {result['expired']} expired"
+    )
+    return 0
+
+# ============================================
+# Entry Point
+# ============================================
+
+async def run(args) -> int:
+    if args.command == "purge-pdf-cache":
+        return purge_pdf_cache()
+    pool = await create_db_pool(min_size=1, max_size=2)
+    try:
+        if args.command == "backfill-latest-observations":
+            return await backfill_latest_observations(pool)
+        if args.command == "check-latest-observations":
+            return await check_latest_observations(pool, repair=args.repair)
+        if args.command == "check-health-scores":
+            return await check_health_scores(pool, repair=args.repair)
+        if args.command == "purge-ai-cache":
+            return await purge_ai_cache(pool)
+        if args.command == "purge-export-jobs":
+            return await purge_export_jobs(pool)
+        if args.command == "evaluate-patterns":
+            return await evaluate_patterns(pool)
+    finally:
+        await pool.close()
+    return 2
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="HealthCanvas maintenance commands")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    subparsers.add_parser("backfill-latest-observations", help="Rebuild latest_observations from observations")
+
+    latest = subparsers.add_parser("check-latest-observations", help="Verify the latest_observations table")
+    latest.add_argument("--repair", action="store_true", help="Backfill the table if it is inconsistent")
+
+    scores = subparsers.add_parser("check-health-scores", help="Verify the health_scores table")
+    scores.add_argument("--repair", action="store_true", help="Rebuild the table if it is inconsistent")
+
+    subparsers.add_parser("purge-ai-cache", help="Delete expired AI response cache rows")
+    subparsers.add_parser("purge-pdf-cache", help="Delete expired cached PDF exports")
+    subparsers.add_parser("purge-export-jobs", help="Delete expired export jobs and their files")
+    subparsers.add_parser("evaluate-patterns", help="Evaluate pattern rules for all users into pattern_alerts")
+
+    return asyncio.run(run(parser.parse_args()))
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -2,12 +2,57 @@
 HealthCanvas Backend Services
 """
 
-from .gemini_service import GeminiService, get_gemini_service
+from .gemini_service import GeminiService, get_gemini_service, AIResponseCache, get_ai_response_cache
 from .pdf_service import PDFService, get_pdf_service
+from .pdf_cache import PDFArtifactCache, get_pdf_artifact_cache
+from .export_jobs import ExportJobQueue, get_export_job_queue
+from .data_export import DataExporter, get_data_exporter
+from .fhir_export import FHIR_RESOURCE_TYPES, compile_serializers
+from .local_ocr import LocalOCR, get_local_ocr
+from .password_service import PasswordHasher, get_password_hasher
+from .principal_cache import PrincipalCache, get_principal_cache
+from .biomarker_catalog import BiomarkerCatalog, get_biomarker_catalog
+from .alias_index import AliasIndex, get_alias_index
+from .biomarker_resolver import BiomarkerResolver, get_biomarker_resolver
+from .pattern_rules import PatternEngine, get_pattern_engine
+from .metrics import LatencyHistogram, get_latency_histogram
+from .single_flight import SingleFlight
+from .notify_listener import NotifyListener
+from .worker_pool import BoundedWorkerPool, WorkerPoolSaturated
 
 __all__ = [
     'GeminiService',
     'get_gemini_service',
+    'AIResponseCache',
+    'get_ai_response_cache',
     'PDFService', 
-    'get_pdf_service'
+    'get_pdf_service',
+    'PDFArtifactCache',
+    'get_pdf_artifact_cache',
+    'ExportJobQueue',
+    'get_export_job_queue',
+    'DataExporter',
+    'get_data_exporter',
+    'FHIR_RESOURCE_TYPES',
+    'compile_serializers',
+    'LocalOCR',
+    'get_local_ocr',
+    'PasswordHasher',
+    'get_password_hasher',
+    'PrincipalCache',
+    'get_principal_cache',
+    'BiomarkerCatalog',
+    'get_biomarker_catalog',
+    'AliasIndex',
+    'get_alias_index',
+    'BiomarkerResolver',
+    'get_biomarker_resolver',
+    'PatternEngine',
+    'get_pattern_engine',
+    'LatencyHistogram',
+    'get_latency_histogram',
+    'SingleFlight',
+    'NotifyListener',
+    'BoundedWorkerPool',
+    'WorkerPoolSaturated'
 ]
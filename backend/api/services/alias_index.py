@@ -0,0 +1,218 @@
+"""
+HealthCanvas - Biomarker Alias Index
+Maps lab report test names to biomarker IDs with a precompiled exact map and token trie
+"""
+
+import re
+from dataclasses import dataclass
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from .biomarker_catalog import get_biomarker_catalog
+from .gemini_service import BIOMARKER_ALIASES
+
+# ============================================
+# Configuration
+# ============================================
+
+# Below this a name is left unmapped rather than guessed
+ALIAS_MIN_CONFIDENCE = 0.6
+# Words that say nothing about which test it is; they do not count against coverage
+FILLER_TOKENS = frozenset({
+    "serum", "plasma", "blood", "level", "levels", "test", "result", "s", "the", "of",
+    "direct", "calculated", "random", "ultrasensitive", "sensitive", "method", "good", "bad",
+})
+# Words that make it a different, derived test ('MCH' is a mean, not hemoglobin),
+# unless an alias of the matched biomarker includes them
+DERIVED_TOKENS = frozenset({"ratio", "non", "vldl", "mean", "binding", "saturation", "index", "antibody", "antibodies"})
+# Partial names shorter than this ('d', 'gt') are too ambiguous to match inside an alias
+MIN_PARTIAL_CHARS = 4
+
+_SEPARATORS = re.compile(r"[^a-z0-9]+")
+_BRITISH_SPELLINGS = {"haem": "hem", "oest": "est"}
+_BRITISH_PREFIX = re.compile(r"\b(" + "|".join(_BRITISH_SPELLINGS) + ")")
+
+def normalize_test_name(name: str) -> Tuple[str, ...]:
+    """'S.Haemoglobin (Serum)' -> ('s', 'hemoglobin', 'serum')"""
+    text = _BRITISH_PREFIX.sub(lambda m: _BRITISH_SPELLINGS[m.group(1)], name.lower())
+    return tuple(token for token in _SEPARATORS.split(text) if token)
+
+# ============================================
+# Alias Index
+# ============================================
+
+@dataclass(frozen=True)
+class AliasMatch:
+    biomarker_id: str
+    alias: str
+    confidence: float
+    method: str  # exact, alias (an alias inside the name), partial (the name inside an alias)
+
+
+class _TrieNode:
+    __slots__ = ("children", "biomarker_id", "alias", "qualifiers")
+
+    def __init__(self):
+        self.children: Dict[str, "_TrieNode"] = {}
+        self.biomarker_id: Optional[str] = None
+        self.alias: Optional[str] = None
+        # Extra words that turn this alias into another biomarker's ('hdl' + 'cholesterol')
+        self.qualifiers: List[frozenset] = []
+
+
+class AliasIndex:
+    """
+    Built once from alias lists; lookups are a hash probe, then a token trie
+    walk from each word of the name. Aliases match whole words only, so 'ca'
+    or 'hb' never match inside another word, and the biomarker whose aliases
+    cover the most of the name wins regardless of dictionary order. A generic
+    alias ('cholesterol') is ignored when the name also has the words of a
+    more specific alias of another biomarker ('hdl cholesterol').
+    """
+
+    def __init__(self, aliases: Dict[str, Iterable[str]]):
+        self.exact: Dict[Tuple[str, ...], Tuple[str, str]] = {}
+        self.root = _TrieNode()
+        # Word sequences inside aliases -> biomarker, None when several share it
+        self.partials: Dict[Tuple[str, ...], Optional[Tuple[str, str]]] = {}
+        self.conflicts = 0
+
+        for biomarker_id, names in aliases.items():
+            for alias in names:
+                tokens = normalize_test_name(alias)
+                if not tokens:
+                    continue
+                existing = self.exact.setdefault(tokens, (biomarker_id, alias))
+                if existing[0] != biomarker_id:
+                    self.conflicts += 1  # first listed keeps it
+                    continue
+                self._insert(tokens, biomarker_id, alias)
+                self._add_partials(tokens, biomarker_id, alias)
+        self._add_qualifiers()
+
+    def _insert(self, tokens: Tuple[str, ...], biomarker_id: str, alias: str):
+        node = self.root
+        for token in tokens:
+            node = node.children.setdefault(token, _TrieNode())
+        if node.biomarker_id is None:
+            node.biomarker_id, node.alias = biomarker_id, alias
+
+    def _add_qualifiers(self):
+        # For each alias, the shorter aliases of other biomarkers inside it
+        for tokens, (biomarker_id, _) in self.exact.items():
+            for start in range(len(tokens)):
+                for end in range(start + 1, len(tokens) + 1):
+                    part = tokens[start:end]
+                    hit = self.exact.get(part)
+                    if part != tokens and hit and hit[0] != biomarker_id:
+                        self._find(part).qualifiers.append(frozenset(tokens) - frozenset(part))
+
+    def _find(self, tokens: Tuple[str, ...]) -> _TrieNode:
+        node = self.root
+        for token in tokens:
+            node = node.children[token]
+        return node
+
+    def _add_partials(self, tokens: Tuple[str, ...], biomarker_id: str, alias: str):
+        for start in range(len(tokens)):
+            for end in range(start + 1, len(tokens) + 1):
+                part = tokens[start:end]
+                if part == tokens or sum(map(len, part)) < MIN_PARTIAL_CHARS:
+                    continue
+                if part not in self.partials:
+                    self.partials[part] = (biomarker_id, alias)
+                elif self.partials[part] is not None and self.partials[part][0] != biomarker_id:
+                    self.partials[part] = None
+
+    def _scan(self, tokens: Tuple[str, ...]) -> List[Tuple[int, int, str, str]]:
+        """Every alias occurrence in the name as (start, end, biomarker_id, alias)"""
+        found = []
+        words = frozenset(tokens)
+        for start in range(len(tokens)):
+            node = self.root
+            for end in range(start, len(tokens)):
+                node = node.children.get(tokens[end])
+                if node is None:
+                    break
+                if node.biomarker_id is None or any(q <= words for q in node.qualifiers):
+                    continue
+                # 'CA 19-9', 'CA 125': a short abbreviation followed by a number is another assay
+                if len(node.alias) <= 2 and end + 1 < len(tokens) and tokens[end + 1].isdigit():
+                    continue
+                found.append((start, end + 1, node.biomarker_id, node.alias))
+        return found
+
+    def match(self, test_name: str) -> Optional[AliasMatch]:
+        """Best match for a test name with a 0-1 confidence, or None"""
+        tokens = normalize_test_name(test_name)
+        if not tokens:
+            return None
+
+        hit = self.exact.get(tokens)
+        if hit:
+            return AliasMatch(hit[0], hit[1], 1.0, "exact")
+
+        # Score each biomarker by how much of the name its aliases cover
+        covered: Dict[str, set] = {}
+        longest: Dict[str, Tuple[int, str]] = {}
+        for start, end, biomarker_id, alias in self._scan(tokens):
+            covered.setdefault(biomarker_id, set()).update(range(start, end))
+            length = sum(map(len, tokens[start:end]))
+            if length > longest.get(biomarker_id, (0, ""))[0]:
+                longest[biomarker_id] = (length, alias)
+
+        if covered:
+            def score(biomarker_id: str) -> Tuple[int, int]:
+                return sum(len(tokens[i]) for i in covered[biomarker_id]), longest[biomarker_id][0]
+
+            best = max(covered, key=score)
+            if any(tokens[i] in DERIVED_TOKENS for i in range(len(tokens)) if i not in covered[best]):
+                return None
+            best_chars = score(best)[0]
+            total_chars = sum(
+                len(token) for i, token in enumerate(tokens)
+                if i in covered[best] or token not in FILLER_TOKENS
+            )
+            coverage = best_chars / total_chars
+            return AliasMatch(best, longest[best][1], round(0.5 + 0.45 * coverage, 3), "alias")
+
+        # A shortened name such as 'Glucose' for 'fasting glucose'
+        content = tuple(token for token in tokens if token not in FILLER_TOKENS) or tokens
+        hit = self.partials.get(content)
+        if hit:
+            share = sum(map(len, content)) / sum(map(len, normalize_test_name(hit[1])))
+            # At least half of the alias: 'Glucose' maps, a stray 'Protein' does not
+            return AliasMatch(hit[0], hit[1], round(0.4 + 0.4 * share, 3), "partial")
+        return None
+
+    def biomarker_id(self, test_name: str, min_confidence: float = ALIAS_MIN_CONFIDENCE) -> Optional[str]:
+        match = self.match(test_name)
+        return match.biomarker_id if match and match.confidence >= min_confidence else None
+
+    def stats(self) -> Dict[str, int]:
+        return {"aliases": len(self.exact), "partials": len(self.partials), "conflicts": self.conflicts}
+
+
+# ============================================
+# Index Instance
+# ============================================
+
+_alias_index: Optional[AliasIndex] = None
+_alias_index_version = -1
+
+def build_alias_index(catalog_rows: Iterable[dict] = ()) -> AliasIndex:
+    """Built-in aliases first, then catalog names and the `aliases` column"""
+    aliases: Dict[str, List[str]] = {biomarker_id: list(names) for biomarker_id, names in BIOMARKER_ALIASES.items()}
+    for row in catalog_rows:
+        names = aliases.setdefault(row['id'], [])
+        names.append(row['name'])
+        names.extend(row.get('aliases') or [])
+    return AliasIndex(aliases)
+
+def get_alias_index() -> AliasIndex:
+    """The index for the current biomarker catalog, rebuilt when the catalog reloads"""
+    global _alias_index, _alias_index_version
+    catalog = get_biomarker_catalog()
+    if _alias_index is None or _alias_index_version != catalog.version:
+        _alias_index = build_alias_index(catalog.list())
+        _alias_index_version = catalog.version
+    return _alias_index
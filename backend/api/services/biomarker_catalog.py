@@ -0,0 +1,158 @@
+"""
+HealthCanvas - Biomarker Catalog
+Process-wide, in-memory copy of biomarker_definitions with versioned refresh
+"""
+
+import os
+import json
+import asyncio
+import hashlib
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+from fastapi.encoders import jsonable_encoder
+
+from services.notify_listener import NotifyListener
+
+# ============================================
+# Configuration
+# ============================================
+
+CATALOG_NOTIFY_CHANNEL = "biomarker_catalog"
+CATALOG_REFRESH_SECONDS = float(os.getenv("CATALOG_REFRESH_SECONDS", "300"))
+
+# ============================================
+# Catalog Snapshot
+# ============================================
+
+class CatalogSnapshot:
+    """Immutable view of the catalog; swapped atomically on refresh"""
+
+    def __init__(self, rows: List[Dict[str, Any]], version: int):
+        self.version = version
+        self.rows = rows
+        self.by_id: Dict[str, Dict[str, Any]] = {row['id']: row for row in rows}
+        self.by_category: Dict[str, List[Dict[str, Any]]] = {}
+        for row in rows:
+            self.by_category.setdefault(row['category'], []).append(row)
+        for category_rows in self.by_category.values():
+            category_rows.sort(key=lambda r: r['name'])
+
+        # Pre-rendered response bodies and ETags, keyed by category (None = all)
+        self.bodies: Dict[Optional[str], bytes] = {None: self._encode(rows)}
+        for category, category_rows in self.by_category.items():
+            self.bodies[category] = self._encode(category_rows)
+        self.etags = {key: f'"{hashlib.sha1(body).hexdigest()[:20]}"' for key, body in self.bodies.items()}
+
+    @staticmethod
+    def _encode(rows: List[Dict[str, Any]]) -> bytes:
+        # Same encoding FastAPI applies to a returned list of dicts
+        return json.dumps(
+            jsonable_encoder(rows), ensure_ascii=False, allow_nan=False, separators=(",", ":")
+        ).encode("utf-8")
+
+
+class BiomarkerCatalog:
+    """
+    Loaded at startup and refreshed when Postgres sends a NOTIFY on
+    `biomarker_catalog` (fired by a trigger on biomarker_definitions), with a
+    periodic reload as a fallback for connections that cannot LISTEN
+    (e.g. transaction-mode poolers). A dropped LISTEN connection is
+    re-established and followed by a reload, since changes made while it was
+    down were never announced.
+    """
+
+    def __init__(self):
+        self._snapshot = CatalogSnapshot([], version=0)
+        self._pool = None
+        self._listener = NotifyListener(
+            "Biomarker catalog",
+            {CATALOG_NOTIFY_CHANNEL: self._on_notify},
+            on_reconnect=self._safe_reload,
+        )
+        self._refresh_task: Optional[asyncio.Task] = None
+        self._reload_lock = asyncio.Lock()
+        self.reloads = 0
+
+    # ----- lookups -----
+
+    @property
+    def version(self) -> int:
+        return self._snapshot.version
+
+    def get(self, biomarker_id: str) -> Optional[Dict[str, Any]]:
+        return self._snapshot.by_id.get(biomarker_id)
+
+    def list(self, category: Optional[str] = None) -> List[Dict[str, Any]]:
+        if category is None:
+            return self._snapshot.rows
+        return self._snapshot.by_category.get(category, [])
+
+    def encoded(self, category: Optional[str] = None):
+        """Return (body, etag) for a listing, pre-rendered at load time"""
+        snapshot = self._snapshot
+        if category is not None and category not in snapshot.by_category:
+            empty = CatalogSnapshot._encode([])
+            return empty, f'"{hashlib.sha1(empty).hexdigest()[:20]}"'
+        return snapshot.bodies[category], snapshot.etags[category]
+
+    # ----- loading -----
+
+    async def reload(self):
+        async with self._reload_lock:
+            async with self._pool.acquire() as conn:
+                rows = await conn.fetch("SELECT * FROM biomarker_definitions ORDER BY category, name")
+            self._snapshot = CatalogSnapshot([dict(row) for row in rows], version=self._snapshot.version + 1)
+            self.reloads += 1
+
+    async def start(self, pool, connect: Optional[Callable[[], Awaitable[Any]]] = None):
+        """Load the catalog and subscribe to change notifications"""
+        self._pool = pool
+        await self.reload()
+
+        if connect is not None:
+            await self._listener.start(connect)
+
+        if CATALOG_REFRESH_SECONDS > 0:
+            self._refresh_task = asyncio.create_task(self._periodic_refresh())
+
+    async def stop(self):
+        if self._refresh_task:
+            self._refresh_task.cancel()
+            self._refresh_task = None
+        await self._listener.stop()
+
+    def _on_notify(self, connection, pid, channel, payload):
+        asyncio.get_running_loop().create_task(self._safe_reload())
+
+    async def _periodic_refresh(self):
+        while True:
+            await asyncio.sleep(CATALOG_REFRESH_SECONDS)
+            await self._safe_reload()
+
+    async def _safe_reload(self):
+        try:
+            await self.reload()
+        except Exception as e:
+            print(f"⚠️ Biomarker catalog reload failed: {e}")
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "version": self.version,
+            "biomarkers": len(self._snapshot.rows),
+            "reloads": self.reloads,
+            **self._listener.stats(),
+        }
+
+
+# ============================================
+# Singleton Instance
+# ============================================
+
+_biomarker_catalog = None
+
+def get_biomarker_catalog() -> BiomarkerCatalog:
+    """Get or create the biomarker catalog singleton"""
+    global _biomarker_catalog
+    if _biomarker_catalog is None:
+        _biomarker_catalog = BiomarkerCatalog()
+    return _biomarker_catalog
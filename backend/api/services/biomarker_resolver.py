@@ -0,0 +1,313 @@
+"""
+HealthCanvas - Biomarker Name Resolution
+Resolves lab report test names using confirmed mappings, the alias index and trigram typo correction
+"""
+
+import os
+import asyncio
+from collections import Counter
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from typing import Any, Dict, Iterable, List, Optional, Set, Tuple
+
+from .alias_index import ALIAS_MIN_CONFIDENCE, AliasIndex, get_alias_index, normalize_test_name
+from .gemini_service import OCRResult
+
+# ============================================
+# Configuration
+# ============================================
+
+# Distinct users who must confirm a name before it resolves for everyone
+ALIAS_SHARED_MIN_USERS = int(os.getenv("ALIAS_SHARED_MIN_USERS", "2"))
+ALIAS_REFRESH_SECONDS = float(os.getenv("ALIAS_REFRESH_SECONDS", "30"))
+# Incremental refreshes miss votes removed with a deleted user; a full reload picks that up
+ALIAS_FULL_RELOAD_SECONDS = float(os.getenv("ALIAS_FULL_RELOAD_SECONDS", "3600"))
+# Re-read this far behind the watermark so rows committed late are not skipped
+ALIAS_REFRESH_OVERLAP = timedelta(seconds=10)
+
+# Trigram (Jaccard) similarity for correcting a misread word; OCR typos like
+# 'creatinlne' score 0.5-0.8 against the real word, unrelated words below 0.3
+FUZZY_MIN_SIMILARITY = float(os.getenv("FUZZY_MIN_SIMILARITY", "0.5"))
+# Shorter words are abbreviations, where one wrong letter is a different test
+FUZZY_MIN_CHARS = 5
+# OCR misreads substitute letters; a longer or shorter word ('creatine') is another analyte
+FUZZY_MAX_LENGTH_DIFFERENCE = 1
+# Confidence kept when a match needed typo correction
+FUZZY_CONFIDENCE_FACTOR = 0.9
+
+# ============================================
+# Trigram Index
+# ============================================
+
+def trigrams(name: str) -> Set[str]:
+    """pg_trgm-style trigrams: each word padded with two spaces before and one after"""
+    grams = set()
+    for word in name.split():
+        padded = f"  {word} "
+        grams.update(padded[i:i + 3] for i in range(len(padded) - 2))
+    return grams
+
+
+class TrigramIndex:
+    """Inverted index from trigram to the words of known names, for similarity search"""
+
+    def __init__(self):
+        self.words: List[Tuple[str, int]] = []  # (word, trigram count)
+        self.postings: Dict[str, List[int]] = {}
+        self.known: Set[str] = set()
+
+    def add(self, word: str):
+        if word in self.known:
+            return
+        self.known.add(word)
+        grams = trigrams(word)
+        entry = len(self.words)
+        self.words.append((word, len(grams)))
+        for gram in grams:
+            self.postings.setdefault(gram, []).append(entry)
+
+    def best(self, word: str) -> Optional[Tuple[str, float]]:
+        """Most similar known word of about the same length as (word, similarity)"""
+        grams = trigrams(word)
+        shared: Counter = Counter()
+        for gram in grams:
+            shared.update(self.postings.get(gram, ()))
+        best = None
+        for entry, count in shared.items():
+            known, size = self.words[entry]
+            if abs(len(known) - len(word)) > FUZZY_MAX_LENGTH_DIFFERENCE:
+                continue
+            similarity = count / (len(grams) + size - count)
+            if best is None or similarity > best[1]:
+                best = (known, similarity)
+        return best
+
+# ============================================
+# Resolver
+# ============================================
+
+@dataclass(frozen=True)
+class Resolution:
+    biomarker_id: str
+    confidence: float
+    source: str  # user, shared, alias, fuzzy
+
+
+class BiomarkerResolver:
+    """
+    Resolves a test name, in order, from: the user's own confirmed mapping,
+    a mapping enough users agree on, and the alias index. Failing those, OCR
+    typos are corrected word by word ('Creatinlne' -> 'creatinine') against
+    the words of every known name by trigram similarity, and the corrected
+    name is looked up again.
+
+    Confirmed mappings live in biomarker_alias_mappings, one vote per user
+    and name. They are held in memory and refreshed incrementally from an
+    updated_at watermark, so resolving never touches the database.
+    """
+
+    def __init__(self):
+        self._votes: Dict[str, Dict[str, str]] = {}  # name -> user id -> biomarker id
+        self._shared: Dict[str, str] = {}
+        self._fuzzy: Optional[TrigramIndex] = None
+        self._fuzzy_source: Optional[AliasIndex] = None
+        self._watermark: Optional[datetime] = None
+        self._last_full_reload = 0.0
+        self._pool = None
+        self._refresh_task: Optional[asyncio.Task] = None
+        self.refreshes = 0
+        self.lookups: Counter = Counter()
+
+    # ----- votes -----
+
+    def _vote(self, name: str, user_id: str, biomarker_id: str):
+        self._votes.setdefault(name, {})[user_id] = biomarker_id
+        self._update_shared(name)
+
+    def _update_shared(self, name: str):
+        ranked = Counter(self._votes.get(name, {}).values()).most_common(2)
+        top = ranked[0] if ranked else None
+        if top and top[1] >= ALIAS_SHARED_MIN_USERS and (len(ranked) == 1 or ranked[1][1] < top[1]):
+            if self._shared.get(name) != top[0]:
+                self._shared[name] = top[0]
+                self._fuzzy = None  # rebuilt with the new name on next use
+        elif self._shared.pop(name, None) is not None:
+            self._fuzzy = None
+
+    def _load(self, rows: Iterable[Any]):
+        for row in rows:
+            self._vote(row['normalized_name'], str(row['user_id']), row['biomarker_id'])
+            if self._watermark is None or row['updated_at'] > self._watermark:
+                self._watermark = row['updated_at']
+
+    # ----- resolving -----
+
+    def _vocabulary(self, index: AliasIndex) -> TrigramIndex:
+        if self._fuzzy is None or self._fuzzy_source is not index:
+            fuzzy = TrigramIndex()
+            for tokens in list(index.exact) + [name.split() for name in self._shared]:
+                for token in tokens:
+                    fuzzy.add(token)
+            self._fuzzy, self._fuzzy_source = fuzzy, index
+        return self._fuzzy
+
+    def _correct(self, tokens: List[str], index: AliasIndex) -> List[str]:
+        vocabulary = self._vocabulary(index)
+        corrected = []
+        for token in tokens:
+            if len(token) >= FUZZY_MIN_CHARS and token not in vocabulary.known and not token.isdigit():
+                best = vocabulary.best(token)
+                if best and best[1] >= FUZZY_MIN_SIMILARITY:
+                    token = best[0]
+            corrected.append(token)
+        return corrected
+
+    def _lookup(self, name: str, user_id, index: AliasIndex) -> Optional[Resolution]:
+        if user_id is not None:
+            own = self._votes.get(name, {}).get(str(user_id))
+            if own:
+                return Resolution(own, 1.0, "user")
+        shared = self._shared.get(name)
+        if shared:
+            return Resolution(shared, 0.95, "shared")
+        match = index.match(name)
+        if match and match.confidence >= ALIAS_MIN_CONFIDENCE:
+            return Resolution(match.biomarker_id, match.confidence, "alias")
+        return None
+
+    def resolve(self, test_name: str, user_id=None) -> Optional[Resolution]:
+        tokens = list(normalize_test_name(test_name))
+        if not tokens:
+            return None
+
+        index = get_alias_index()
+        resolution = self._lookup(" ".join(tokens), user_id, index)
+        if resolution is None:
+            corrected = self._correct(tokens, index)
+            if corrected != tokens:
+                resolution = self._lookup(" ".join(corrected), user_id, index)
+                if resolution:
+                    resolution = Resolution(
+                        resolution.biomarker_id, round(resolution.confidence * FUZZY_CONFIDENCE_FACTOR, 3), "fuzzy"
+                    )
+
+        self.lookups[resolution.source if resolution else "unresolved"] += 1
+        return resolution
+
+    def apply(self, result: OCRResult, user_id=None) -> OCRResult:
+        """Fill in mapped_biomarker_id on extracted values, preferring confirmed mappings"""
+        for value in result.extracted_values or []:
+            resolution = self.resolve(value.test_name, user_id)
+            if resolution:
+                value.mapped_biomarker_id = resolution.biomarker_id
+        return result
+
+    # ----- confirming -----
+
+    async def confirm(self, conn, user_id, mappings: Iterable[Tuple[str, str]]) -> List[str]:
+        """
+        Record (test name, biomarker id) pairs the user confirmed; the
+        biomarker ids must exist. Returns the normalized names recorded.
+        """
+        records = {}
+        for test_name, biomarker_id in mappings:
+            name = " ".join(normalize_test_name(test_name))
+            if name:
+                records[name] = (name, user_id, biomarker_id, test_name.strip()[:200])
+        if not records:
+            return []
+
+        await conn.executemany(
+            """
+            INSERT INTO biomarker_alias_mappings (normalized_name, user_id, biomarker_id, test_name)
+            VALUES ($1, $2, $3, $4)
+            ON CONFLICT (normalized_name, user_id) DO UPDATE
+            SET biomarker_id = EXCLUDED.biomarker_id, test_name = EXCLUDED.test_name, updated_at = NOW()
+            """,
+            list(records.values())
+        )
+        # Visible in this process at once; other processes pick it up on refresh
+        for name, _, biomarker_id, _ in records.values():
+            self._vote(name, str(user_id), biomarker_id)
+        return list(records)
+
+    def confirmations(self, test_name: str, biomarker_id: str) -> int:
+        name = " ".join(normalize_test_name(test_name))
+        return sum(1 for voted in self._votes.get(name, {}).values() if voted == biomarker_id)
+
+    def is_shared(self, test_name: str) -> bool:
+        return " ".join(normalize_test_name(test_name)) in self._shared
+
+    # ----- loading -----
+
+    async def reload(self):
+        async with self._pool.acquire() as conn:
+            rows = await conn.fetch(
+                "SELECT normalized_name, user_id, biomarker_id, updated_at FROM biomarker_alias_mappings"
+            )
+        self._votes, self._shared, self._fuzzy, self._watermark = {}, {}, None, None
+        self._load(rows)
+        self._last_full_reload = asyncio.get_running_loop().time()
+
+    async def refresh(self):
+        """Apply mappings changed since the last load"""
+        if self._watermark is None:
+            await self.reload()
+            return
+        async with self._pool.acquire() as conn:
+            rows = await conn.fetch(
+                """
+                SELECT normalized_name, user_id, biomarker_id, updated_at
+                FROM biomarker_alias_mappings
+                WHERE updated_at > $1
+                ORDER BY updated_at
+                """,
+                self._watermark - ALIAS_REFRESH_OVERLAP
+            )
+        self._load(rows)
+        self.refreshes += 1
+
+    async def start(self, pool):
+        self._pool = pool
+        await self.reload()
+        if ALIAS_REFRESH_SECONDS > 0:
+            self._refresh_task = asyncio.create_task(self._periodic_refresh())
+
+    async def stop(self):
+        if self._refresh_task:
+            self._refresh_task.cancel()
+            self._refresh_task = None
+
+    async def _periodic_refresh(self):
+        while True:
+            await asyncio.sleep(ALIAS_REFRESH_SECONDS)
+            try:
+                if asyncio.get_running_loop().time() - self._last_full_reload >= ALIAS_FULL_RELOAD_SECONDS:
+                    await self.reload()
+                else:
+                    await self.refresh()
+            except Exception as e:
+                print(f"⚠️ Alias mapping refresh failed: {e}")
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "names": len(self._votes),
+            "shared": len(self._shared),
+            "votes": sum(len(votes) for votes in self._votes.values()),
+            "refreshes": self.refreshes,
+            "lookups": dict(self.lookups),
+        }
+
+
+# ============================================
+# Singleton Instance
+# ============================================
+
+_biomarker_resolver = None
+
+def get_biomarker_resolver() -> BiomarkerResolver:
+    """Get or create the biomarker resolver singleton"""
+    global _biomarker_resolver
+    if _biomarker_resolver is None:
+        _biomarker_resolver = BiomarkerResolver()
+    return _biomarker_resolver
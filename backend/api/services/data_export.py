@@ -0,0 +1,206 @@
+"""
+HealthCanvas - Data Export
+Streams a user's full history as NDJSON or CSV from server-side cursors
+"""
+
+import io
+import os
+import csv
+import json
+import zlib
+import asyncio
+from datetime import date
+from typing import Any, AsyncIterator, Callable, Dict, Iterable, List, Optional, Tuple
+
+from .worker_pool import WorkerPoolSaturated
+
+# ============================================
+# Configuration
+# ============================================
+
+# Each running export holds a database connection for its whole duration
+EXPORT_STREAM_MAX_CONCURRENT = int(os.getenv("EXPORT_STREAM_MAX_CONCURRENT", "3"))
+# Rows fetched per cursor round trip
+EXPORT_CURSOR_ROWS = int(os.getenv("EXPORT_CURSOR_ROWS", "2000"))
+# Encoded output is sent in chunks of about this size
+EXPORT_FLUSH_BYTES = 64 * 1024
+EXPORT_GZIP_LEVEL = 6
+
+EXPORT_FORMATS = {"ndjson": "application/x-ndjson", "csv": "text/csv"}
+
+OBSERVATION_EXPORT_COLUMNS = [
+    "id", "effective_date", "biomarker_id", "biomarker_name", "category", "value", "unit", "status",
+    "lab_name", "lab_reference_low", "lab_reference_high", "notes", "created_at",
+]
+
+# ============================================
+# Queries
+# ============================================
+
+def observation_export_query(user_id, biomarker_id: Optional[str] = None,
+                             start_date: Optional[date] = None, end_date: Optional[date] = None) -> Tuple[str, list]:
+    """Live observations oldest first, in the keyset index order"""
+    query = """
+        SELECT o.id, o.effective_date, o.biomarker_id, bd.name AS biomarker_name, bd.category, o.value, o.unit,
+               o.status, o.lab_name, o.lab_reference_low, o.lab_reference_high, o.notes, o.created_at
+        FROM observations o
+        JOIN biomarker_definitions bd ON o.biomarker_id = bd.id
+        WHERE o.user_id = $1 AND o.deleted_at IS NULL
+    """
+    params: List[Any] = [user_id]
+    if biomarker_id:
+        params.append(biomarker_id)
+        query += f" AND o.biomarker_id = ${len(params)}"
+    if start_date:
+        params.append(start_date)
+        query += f" AND o.effective_date >= ${len(params)}"
+    if end_date:
+        params.append(end_date)
+        query += f" AND o.effective_date <= ${len(params)}"
+    query += " ORDER BY o.effective_date, o.created_at, o.id"
+    return query, params
+
+async def iter_cursor(conn, query: str, params: list, rows: int = EXPORT_CURSOR_ROWS) -> AsyncIterator[List[Any]]:
+    """Batches of records from a server-side cursor; conn must be inside a transaction"""
+    cursor = await conn.cursor(query, *params)
+    while batch := await cursor.fetch(rows):
+        yield batch
+
+# ============================================
+# Encoders
+# ============================================
+
+def _json_default(value):
+    # DECIMAL columns become JSON numbers, as in the API's responses; UUIDs strings
+    if hasattr(value, "isoformat"):
+        return value.isoformat()
+    if hasattr(value, "as_integer_ratio"):
+        return float(value)
+    return str(value)
+
+def ndjson_encoder(columns: List[str]) -> Tuple[Optional[str], Callable[[Iterable[Any]], str]]:
+    """(header, encode) where encode turns a batch of records into NDJSON lines"""
+    dumps = json.JSONEncoder(ensure_ascii=False, separators=(",", ":"), default=_json_default).encode
+
+    def encode(records: Iterable[Any]) -> str:
+        return "".join(dumps(dict(zip(columns, record))) + "\n" for record in records)
+    return None, encode
+
+def csv_encoder(columns: List[str]) -> Tuple[Optional[str], Callable[[Iterable[Any]], str]]:
+    """(header, encode) where encode turns a batch of records into CSV rows"""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer, lineterminator="\n")
+    writer.writerow(columns)
+    header = buffer.getvalue()
+
+    def encode(records: Iterable[Any]) -> str:
+        buffer.seek(0)
+        buffer.truncate()
+        writer.writerows(
+            ["" if value is None else value.isoformat() if hasattr(value, "isoformat") else value for value in record]
+            for record in records
+        )
+        return buffer.getvalue()
+    return header, encode
+
+ENCODERS = {"ndjson": ndjson_encoder, "csv": csv_encoder}
+
+# ============================================
+# Exporter
+# ============================================
+
+class DataExporter:
+    """
+    Streams query results straight from an asyncpg server-side cursor
+    (which needs a transaction) through an encoder to the client. Rows are
+    fetched EXPORT_CURSOR_ROWS at a time and output is flushed in
+    EXPORT_FLUSH_BYTES chunks, optionally gzipped on the fly, so memory
+    stays flat however many rows the export has. At most
+    EXPORT_STREAM_MAX_CONCURRENT exports run at once per process.
+    """
+
+    def __init__(self, max_concurrent: int = EXPORT_STREAM_MAX_CONCURRENT):
+        self.max_concurrent = max_concurrent
+        self._slots = asyncio.Semaphore(max_concurrent)
+        self.active = 0
+        self.exports = 0
+        self.rejected = 0
+        self.rows = 0
+        self.bytes = 0
+
+    def check_capacity(self):
+        """Raise WorkerPoolSaturated when every export slot is in use"""
+        if self._slots.locked():
+            self.rejected += 1
+            raise WorkerPoolSaturated("data export", retry_after=5)
+
+    async def records(self, pool, query: str, params: list) -> AsyncIterator[List[Any]]:
+        """Batches of records from a server-side cursor, one export slot held throughout"""
+        async with self._slots:
+            self.active += 1
+            self.exports += 1
+            try:
+                async with pool.acquire() as conn:
+                    async with conn.transaction(readonly=True, isolation="repeatable_read"):
+                        async for batch in iter_cursor(conn, query, params):
+                            self.rows += len(batch)
+                            yield batch
+            finally:
+                self.active -= 1
+
+    async def stream(self, pool, query: str, params: list, columns: List[str], fmt: str,
+                     gzip: bool = False) -> AsyncIterator[bytes]:
+        """Encoded export body; `fmt` is a key of ENCODERS"""
+        header, encode = ENCODERS[fmt](columns)
+        compressor = zlib.compressobj(EXPORT_GZIP_LEVEL, zlib.DEFLATED, 31) if gzip else None
+        pending: List[bytes] = [header.encode()] if header else []
+        size = sum(map(len, pending))
+
+        def emit(chunks: List[bytes]) -> bytes:
+            data = b"".join(chunks)
+            if compressor is not None:
+                data = compressor.compress(data)
+            self.bytes += len(data)
+            return data
+
+        async for batch in self.records(pool, query, params):
+            encoded = encode(batch).encode()
+            pending.append(encoded)
+            size += len(encoded)
+            if size >= EXPORT_FLUSH_BYTES:
+                data = emit(pending)
+                pending, size = [], 0
+                if data:
+                    yield data
+
+        data = emit(pending)
+        if compressor is not None:
+            tail = compressor.flush()
+            self.bytes += len(tail)
+            data += tail
+        if data:
+            yield data
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "active": self.active,
+            "max_concurrent": self.max_concurrent,
+            "exports": self.exports,
+            "rejected": self.rejected,
+            "rows": self.rows,
+            "bytes": self.bytes,
+        }
+
+
+# ============================================
+# Singleton Instance
+# ============================================
+
+_data_exporter = None
+
+def get_data_exporter() -> DataExporter:
+    """Get or create the data exporter singleton"""
+    global _data_exporter
+    if _data_exporter is None:
+        _data_exporter = DataExporter()
+    return _data_exporter
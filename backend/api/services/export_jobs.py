@@ -0,0 +1,426 @@
+"""
+HealthCanvas - Export Jobs
+Postgres-backed queue for heavy exports, run by a bounded set of local workers
+"""
+
+import os
+import json
+import uuid
+import shutil
+import socket
+import asyncio
+from datetime import datetime
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+from .metrics import get_latency_histogram
+from .notify_listener import NotifyListener
+from .pdf_service import PDF_RENDER_DIR, get_pdf_renderer
+from .pdf_cache import get_pdf_artifact_cache
+from .reports import load_report_header, load_visit_summary, load_lab_history
+
+# ============================================
+# Configuration
+# ============================================
+
+EXPORT_NOTIFY_CHANNEL = "export_jobs"
+# Jobs run concurrently per process; 0 leaves jobs to a dedicated export_worker.py
+EXPORT_WORKERS = int(os.getenv("EXPORT_WORKERS", "2"))
+EXPORT_POLL_SECONDS = float(os.getenv("EXPORT_POLL_SECONDS", "5"))
+EXPORT_MAX_ATTEMPTS = int(os.getenv("EXPORT_MAX_ATTEMPTS", "3"))
+EXPORT_RETRY_BACKOFF_SECONDS = float(os.getenv("EXPORT_RETRY_BACKOFF_SECONDS", "10"))
+# Time budget per attempt; a running job without a heartbeat for twice this long is requeued
+EXPORT_JOB_TIMEOUT_SECONDS = float(os.getenv("EXPORT_JOB_TIMEOUT_SECONDS", "120"))
+EXPORT_RESULT_DIR = os.getenv("EXPORT_RESULT_DIR") or os.path.join(PDF_RENDER_DIR, "healthcanvas-exports")
+EXPORT_RESULT_TTL_SECONDS = float(os.getenv("EXPORT_RESULT_TTL_SECONDS", str(24 * 3600)))
+
+# ============================================
+# Job Handlers
+# ============================================
+
+class ExportResult:
+    """
+    What a handler produced. The file itself is at ExportJob.result_path, or
+    for multi-file exports result_path is a directory and `filename` names
+    the entry point inside it.
+    """
+
+    def __init__(self, filename: str, media_type: str):
+        self.filename = filename
+        self.media_type = media_type
+
+
+class ExportJob:
+    """A claimed job as seen by its handler"""
+
+    def __init__(self, queue: "ExportJobQueue", row):
+        self.queue = queue
+        self.pool = queue.pool
+        self.id = row['id']
+        self.user_id = row['user_id']
+        self.kind = row['kind']
+        self.params: Dict[str, Any] = json.loads(row['params']) if row['params'] else {}
+        self.attempt = row['attempts']
+        self.result_path = os.path.join(EXPORT_RESULT_DIR, str(self.id))
+
+    async def progress(self, percent: int, stage: str):
+        """Report progress; also serves as the job's heartbeat"""
+        async with self.pool.acquire() as conn:
+            await conn.execute(
+                "UPDATE export_jobs SET progress = $2, stage = $3, heartbeat_at = NOW() WHERE id = $1",
+                self.id, percent, stage
+            )
+
+
+ExportHandler = Callable[[ExportJob], Awaitable[ExportResult]]
+
+EXPORT_HANDLERS: Dict[str, ExportHandler] = {}
+
+def register_export_handler(kind: str):
+    """Register the coroutine that runs jobs of `kind`"""
+    def decorator(handler: ExportHandler) -> ExportHandler:
+        EXPORT_HANDLERS[kind] = handler
+        return handler
+    return decorator
+
+def _write_result(source, path: str):
+    with open(path, "wb") as out:
+        while True:
+            chunk = source.read(64 * 1024)
+            if not chunk:
+                break
+            out.write(chunk)
+
+def _discard(path: Optional[str]):
+    if path:
+        try:
+            if os.path.isdir(path):
+                shutil.rmtree(path)
+            else:
+                os.unlink(path)
+        except FileNotFoundError:
+            pass
+
+def _result_size(path: str) -> int:
+    if os.path.isdir(path):
+        return sum(entry.stat().st_size for entry in os.scandir(path) if entry.is_file())
+    return os.path.getsize(path)
+
+@register_export_handler("visit-summary")
+async def export_visit_summary(job: ExportJob) -> ExportResult:
+    cache = get_pdf_artifact_cache()
+
+    await job.progress(5, "Loading health data")
+    async with job.pool.acquire() as conn:
+        patient_name, data_version = await load_report_header(conn, job.user_id)
+    cache_key = cache.key("visit-summary", job.user_id, data_version, patient_name)
+
+    pdf = cache.open(job.user_id, "visit-summary", cache_key)
+    if pdf is None:
+        await job.progress(15, "Preparing insights")
+        report, cacheable = await load_visit_summary(job.pool, job.user_id, patient_name)
+        await job.progress(60, "Rendering PDF")
+        pdf = await get_pdf_renderer().visit_summary(**report)
+        if cacheable:
+            await asyncio.to_thread(cache.put, job.user_id, "visit-summary", cache_key, pdf.file)
+
+    await job.progress(90, "Saving")
+    try:
+        await asyncio.to_thread(_write_result, pdf.file, job.result_path)
+    finally:
+        pdf.file.close()
+    return ExportResult(f"visit-summary-{datetime.now().strftime('%Y-%m-%d')}.pdf", "application/pdf")
+
+@register_export_handler("lab-report")
+async def export_lab_report(job: ExportJob) -> ExportResult:
+    await job.progress(5, "Loading lab history")
+    async with job.pool.acquire() as conn:
+        patient_name, _ = await load_report_header(conn, job.user_id)
+        report = await load_lab_history(conn, job.user_id, patient_name)
+
+    await job.progress(40, "Rendering PDF")
+    pdf = await get_pdf_renderer().lab_report_summary(**report)
+
+    await job.progress(90, "Saving")
+    try:
+        await asyncio.to_thread(_write_result, pdf.file, job.result_path)
+    finally:
+        pdf.file.close()
+    return ExportResult(f"lab-history-{datetime.now().strftime('%Y-%m-%d')}.pdf", "application/pdf")
+
+# ============================================
+# Export Job Queue
+# ============================================
+
+class ExportJobQueue:
+    """
+    Jobs live in the export_jobs table, so they survive restarts and any
+    process with workers can run them:
+
+    - Workers claim the oldest runnable job with FOR UPDATE SKIP LOCKED and
+      wake on NOTIFY `export_jobs` (fired on insert), polling as a fallback.
+    - Each attempt runs under EXPORT_JOB_TIMEOUT_SECONDS. Failures are retried
+      with exponential backoff until max_attempts, then marked failed.
+    - Jobs whose worker died (no heartbeat) are requeued by any live process.
+    - Results are files in EXPORT_RESULT_DIR on the worker's host; finished
+      jobs expire after EXPORT_RESULT_TTL_SECONDS (see maintenance.py).
+    """
+
+    def __init__(self):
+        self.pool = None
+        self.worker_id = f"{socket.gethostname()}:{os.getpid()}"
+        self._wakeup = asyncio.Event()
+        # Jobs enqueued while disconnected are picked up by the wakeup after a reconnect
+        self._listener = NotifyListener(
+            "Export jobs",
+            {EXPORT_NOTIFY_CHANNEL: self._on_notify},
+            on_reconnect=self._on_reconnect,
+        )
+        self._tasks: List[asyncio.Task] = []
+        self.workers = 0
+        self.running = 0
+        self.succeeded = 0
+        self.retried = 0
+        self.failed = 0
+        self.recovered = 0
+        self.latency = get_latency_histogram("export.job")
+
+    def attach(self, pool):
+        """Use this pool for enqueueing and lookups (no workers)"""
+        self.pool = pool
+
+    async def start(self, pool, connect: Optional[Callable[[], Awaitable[Any]]] = None,
+                    workers: int = EXPORT_WORKERS):
+        """Attach the pool and start `workers` job runners in this process"""
+        self.attach(pool)
+        if workers <= 0:
+            return
+        os.makedirs(EXPORT_RESULT_DIR, exist_ok=True)
+
+        if connect is not None:
+            await self._listener.start(connect)
+
+        self.workers = workers
+        self._tasks = [asyncio.create_task(self._work()) for _ in range(workers)]
+        self._tasks.append(asyncio.create_task(self._recover_stale()))
+
+    async def stop(self):
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+        self.workers = 0
+        await self._listener.stop()
+
+    def _on_notify(self, connection, pid, channel, payload):
+        self._wakeup.set()
+
+    async def _on_reconnect(self):
+        self._wakeup.set()
+
+    # ----- API -----
+
+    async def enqueue(self, user_id, kind: str, params: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+        """Queue a job, or return the user's identical job that is still pending"""
+        params_json = json.dumps(params or {}, sort_keys=True)
+        async with self.pool.acquire() as conn:
+            async with conn.transaction():
+                # Serialise enqueues per user so duplicates can't race past the check
+                await conn.execute("SELECT pg_advisory_xact_lock(hashtext($1::text))", str(user_id))
+                row = await conn.fetchrow(
+                    """
+                    SELECT * FROM export_jobs
+                    WHERE user_id = $1 AND kind = $2 AND params = $3::jsonb AND status IN ('queued', 'running')
+                    ORDER BY created_at DESC LIMIT 1
+                    """,
+                    user_id, kind, params_json
+                )
+                if row is None:
+                    row = await conn.fetchrow(
+                        """
+                        INSERT INTO export_jobs (user_id, kind, params, max_attempts)
+                        VALUES ($1, $2, $3::jsonb, $4)
+                        RETURNING *
+                        """,
+                        user_id, kind, params_json, EXPORT_MAX_ATTEMPTS
+                    )
+        return dict(row)
+
+    async def get(self, job_id: str, user_id) -> Optional[Dict[str, Any]]:
+        try:
+            job_uuid = uuid.UUID(job_id)
+        except ValueError:
+            return None
+        async with self.pool.acquire() as conn:
+            row = await conn.fetchrow(
+                "SELECT * FROM export_jobs WHERE id = $1 AND user_id = $2", job_uuid, user_id
+            )
+        return dict(row) if row else None
+
+    # ----- workers -----
+
+    async def _work(self):
+        while True:
+            self._wakeup.clear()
+            try:
+                row = await self._claim()
+            except Exception as e:
+                print(f"⚠️ Export job claim failed: {e}")
+                row = None
+
+            if row is None:
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), EXPORT_POLL_SECONDS)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+            try:
+                await self._run(ExportJob(self, row))
+            except Exception as e:
+                # Recording the outcome failed; the job is recovered once its heartbeat goes stale
+                print(f"⚠️ Export job {row['id']} could not be finalised: {e}")
+
+    async def _claim(self):
+        async with self.pool.acquire() as conn:
+            return await conn.fetchrow(
+                """
+                UPDATE export_jobs
+                SET status = 'running', attempts = attempts + 1, worker = $1, error = NULL,
+                    heartbeat_at = NOW(), started_at = COALESCE(started_at, NOW())
+                WHERE id = (
+                    SELECT id FROM export_jobs
+                    WHERE status = 'queued' AND run_after <= NOW()
+                    ORDER BY run_after
+                    FOR UPDATE SKIP LOCKED
+                    LIMIT 1
+                )
+                RETURNING *
+                """,
+                self.worker_id
+            )
+
+    async def _run(self, job: ExportJob):
+        handler = EXPORT_HANDLERS.get(job.kind)
+        self.running += 1
+        try:
+            with self.latency.time():
+                if handler is None:
+                    raise ValueError(f"Unknown export kind: {job.kind}")
+                result = await asyncio.wait_for(handler(job), EXPORT_JOB_TIMEOUT_SECONDS)
+        except asyncio.CancelledError:
+            # Shutting down: hand the job to the next worker without using up an attempt
+            _discard(job.result_path)
+            await asyncio.shield(self._release(job))
+            raise
+        except Exception as e:
+            _discard(job.result_path)
+            error = "Timed out" if isinstance(e, asyncio.TimeoutError) else str(e) or type(e).__name__
+            await self._fail(job, error)
+        else:
+            await self._succeed(job, result)
+        finally:
+            self.running -= 1
+
+    async def _succeed(self, job: ExportJob, result: ExportResult):
+        async with self.pool.acquire() as conn:
+            await conn.execute(
+                """
+                UPDATE export_jobs
+                SET status = 'succeeded', progress = 100, stage = 'Done', heartbeat_at = NULL,
+                    result_path = $2, result_filename = $3, result_media_type = $4, result_size = $5,
+                    finished_at = NOW(), expires_at = NOW() + make_interval(secs => $6)
+                WHERE id = $1
+                """,
+                job.id, job.result_path, result.filename, result.media_type,
+                _result_size(job.result_path), EXPORT_RESULT_TTL_SECONDS
+            )
+        self.succeeded += 1
+
+    async def _fail(self, job: ExportJob, error: str):
+        async with self.pool.acquire() as conn:
+            status = await conn.fetchval(
+                """
+                UPDATE export_jobs
+                SET status = CASE WHEN attempts >= max_attempts THEN 'failed' ELSE 'queued' END,
+                    error = $2, heartbeat_at = NULL,
+                    run_after = NOW() + make_interval(secs => $3 * power(2, attempts - 1)),
+                    finished_at = CASE WHEN attempts >= max_attempts THEN NOW() END,
+                    expires_at = CASE WHEN attempts >= max_attempts THEN NOW() + make_interval(secs => $4) END
+                WHERE id = $1
+                RETURNING status
+                """,
+                job.id, error, EXPORT_RETRY_BACKOFF_SECONDS, EXPORT_RESULT_TTL_SECONDS
+            )
+        if status == 'failed':
+            self.failed += 1
+        else:
+            self.retried += 1
+
+    async def _release(self, job: ExportJob):
+        try:
+            async with self.pool.acquire() as conn:
+                await conn.execute(
+                    """
+                    UPDATE export_jobs
+                    SET status = 'queued', attempts = attempts - 1, heartbeat_at = NULL, run_after = NOW()
+                    WHERE id = $1 AND status = 'running'
+                    """,
+                    job.id
+                )
+        except Exception as e:
+            print(f"⚠️ Export job release failed, it will be recovered later: {e}")
+
+    async def _recover_stale(self):
+        """Requeue (or fail, when out of attempts) jobs whose worker stopped heartbeating"""
+        while True:
+            await asyncio.sleep(EXPORT_JOB_TIMEOUT_SECONDS)
+            try:
+                async with self.pool.acquire() as conn:
+                    result = await conn.execute(
+                        """
+                        UPDATE export_jobs
+                        SET status = CASE WHEN attempts >= max_attempts THEN 'failed' ELSE 'queued' END,
+                            error = 'Worker stopped responding', heartbeat_at = NULL, run_after = NOW(),
+                            finished_at = CASE WHEN attempts >= max_attempts THEN NOW() END,
+                            expires_at = CASE WHEN attempts >= max_attempts THEN NOW() + make_interval(secs => $2) END
+                        WHERE status = 'running' AND heartbeat_at < NOW() - make_interval(secs => $1)
+                        """,
+                        EXPORT_JOB_TIMEOUT_SECONDS * 2, EXPORT_RESULT_TTL_SECONDS
+                    )
+                self.recovered += int(result.split()[-1])
+            except Exception as e:
+                print(f"⚠️ Export job recovery failed: {e}")
+
+    async def purge_expired(self) -> int:
+        """Delete expired jobs and their result files; returns jobs removed"""
+        async with self.pool.acquire() as conn:
+            rows = await conn.fetch(
+                "DELETE FROM export_jobs WHERE expires_at <= NOW() RETURNING result_path"
+            )
+        for row in rows:
+            _discard(row['result_path'])
+        return len(rows)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "workers": self.workers,
+            "running": self.running,
+            "succeeded": self.succeeded,
+            "retried": self.retried,
+            "failed": self.failed,
+            "recovered": self.recovered,
+            **self._listener.stats(),
+        }
+
+
+# ============================================
+# Singleton Instance
+# ============================================
+
+_export_job_queue = None
+
+def get_export_job_queue() -> ExportJobQueue:
+    """Get or create the export job queue singleton"""
+    global _export_job_queue
+    if _export_job_queue is None:
+        _export_job_queue = ExportJobQueue()
+    return _export_job_queue
@@ -0,0 +1,356 @@
+"""
+HealthCanvas - FHIR Bulk Export
+Serializes a user's records as FHIR R4 resources, one NDJSON file per resource type
+"""
+
+import os
+import json
+import asyncio
+from dataclasses import dataclass
+from datetime import datetime, timezone, tzinfo
+from typing import Any, Callable, Dict, Iterable, List, Optional
+from zoneinfo import ZoneInfo, ZoneInfoNotFoundError
+
+from .data_export import iter_cursor
+from .export_jobs import ExportJob, ExportResult, register_export_handler
+
+# ============================================
+# Configuration
+# ============================================
+
+FHIR_EXPORT_KIND = "fhir-bulk"
+FHIR_NDJSON_MEDIA_TYPE = "application/fhir+ndjson"
+FHIR_MANIFEST_FILENAME = "manifest.json"
+
+_TERMINOLOGY = "http://terminology.hl7.org/CodeSystem"
+LOINC_SYSTEM = "http://loinc.org"
+ICD10_SYSTEM = "http://hl7.org/fhir/sid/icd-10"
+CVX_SYSTEM = "http://hl7.org/fhir/sid/cvx"
+CPT_SYSTEM = "http://www.ama-assn.org/go/cpt"
+
+# ============================================
+# Serializers
+# ============================================
+
+@dataclass(frozen=True)
+class ResourceSerializer:
+    """How one resource type is read (query on $1 user id, $2 optional since) and built"""
+    resource_type: str
+    query: str
+    build: Callable[[Any], Dict[str, Any]]
+
+
+def _concept(code: Optional[str], system: str, text: Optional[str]) -> Dict[str, Any]:
+    concept: Dict[str, Any] = {"text": text} if text else {}
+    if code:
+        coding = {"system": system, "code": code}
+        if text:
+            coding["display"] = text
+        concept["coding"] = [coding]
+    return concept
+
+def _status_concept(system: str, code: Optional[str]) -> Optional[Dict[str, Any]]:
+    return {"coding": [{"system": f"{_TERMINOLOGY}/{system}", "code": code}]} if code else None
+
+def _quantity(value, unit: Optional[str]) -> Optional[Dict[str, Any]]:
+    if value is None:
+        return None
+    quantity = {"value": float(value)}
+    if unit:
+        quantity["unit"] = unit
+    return quantity
+
+def _date_time(day, time=None, zone: Optional[tzinfo] = None) -> Optional[str]:
+    """
+    FHIR dateTime. A time must carry an offset, so a wall-clock time is
+    placed in `zone`; without a zone only the date is given.
+    """
+    if day is None:
+        return None
+    if time is None or zone is None:
+        return day.isoformat()
+    return datetime.combine(day, time, tzinfo=zone).isoformat()
+
+def user_zone(name: Optional[str]) -> Optional[tzinfo]:
+    """The zone for a users.timezone value: UTC when unset, None when unrecognised"""
+    if not name:
+        return timezone.utc
+    try:
+        return ZoneInfo(name)
+    except (ZoneInfoNotFoundError, ValueError):
+        return None
+
+def _instant(value) -> Optional[str]:
+    return value.isoformat() if value else None
+
+def _compact(resource: Dict[str, Any]) -> Dict[str, Any]:
+    """Drop empty elements; FHIR forbids nulls and empty arrays/objects"""
+    return {key: value for key, value in resource.items() if value is not None and value != [] and value != {}}
+
+def _meta(row) -> Dict[str, Any]:
+    return {"lastUpdated": _instant(row['updated_at'] or row['created_at'])}
+
+def _notes(*texts: Optional[str]) -> List[Dict[str, str]]:
+    return [{"text": text} for text in texts if text]
+
+
+def compile_serializers(biomarkers: Iterable[Dict[str, Any]],
+                        zone: Optional[tzinfo] = None) -> Dict[str, ResourceSerializer]:
+    """
+    Build every serializer once per export. Everything that does not depend
+    on the row (codings per biomarker, category and status concepts) is
+    created here and shared by all rows, so building a resource is a few
+    dict literals and the JSON encoder does the rest. Recorded times are
+    wall-clock times in the patient's `zone` (see user_zone).
+    """
+    laboratory = [{"coding": [{"system": f"{_TERMINOLOGY}/observation-category", "code": "laboratory", "display": "Laboratory"}]}]
+    lab_report = [{"coding": [{"system": f"{_TERMINOLOGY}/v2-0074", "code": "LAB", "display": "Laboratory"}]}]
+    biomarker_codes = {
+        row['id']: _concept(row['loinc_code'], LOINC_SYSTEM, row['name']) for row in biomarkers
+    }
+    interpretations = {
+        flag: [_status_concept("v3-ObservationInterpretation", flag)] for flag in ("H", "L", "HH", "LL", "N")
+    }
+    report_statuses = {"completed": "final", "processing": "partial", "pending": "registered", "failed": "cancelled"}
+    condition_severities = {
+        "mild": _concept("255604002", "http://snomed.info/sct", "Mild"),
+        "moderate": _concept("6736007", "http://snomed.info/sct", "Moderate"),
+        "severe": _concept("24484000", "http://snomed.info/sct", "Severe"),
+    }
+    genders = {"male": "male", "female": "female", "other": "other"}
+
+    def patient(user_id) -> Dict[str, str]:
+        return {"reference": f"Patient/{user_id}"}
+
+    def build_patient(row) -> Dict[str, Any]:
+        given = [row['first_name']] if row['first_name'] else None
+        address_lines = [line for line in (row['address_line1'], row['address_line2']) if line]
+        address = _compact({
+            "line": address_lines, "city": row['city'], "state": row['state'],
+            "postalCode": row['postal_code'], "country": row['country'],
+        })
+        return _compact({
+            "resourceType": "Patient",
+            "id": str(row['id']),
+            "meta": _meta(row),
+            "name": [_compact({"family": row['last_name'], "given": given})] if (given or row['last_name']) else None,
+            "telecom": [
+                contact for contact in (
+                    {"system": "email", "value": row['email']},
+                    {"system": "phone", "value": row['phone']} if row['phone'] else None,
+                ) if contact
+            ],
+            "gender": genders.get((row['gender'] or "").lower(), "unknown") if row['gender'] else None,
+            "birthDate": row['date_of_birth'].isoformat() if row['date_of_birth'] else None,
+            "address": [address] if address else None,
+        })
+
+    def build_observation(row) -> Dict[str, Any]:
+        reference_range = _compact({
+            "low": _quantity(row['lab_reference_low'], row['unit']),
+            "high": _quantity(row['lab_reference_high'], row['unit']),
+        })
+        return _compact({
+            "resourceType": "Observation",
+            "id": str(row['id']),
+            "meta": _meta(row),
+            "status": "final",
+            "category": laboratory,
+            "code": biomarker_codes.get(row['biomarker_id']) or {"text": row['biomarker_id']},
+            "subject": patient(row['user_id']),
+            "effectiveDateTime": _date_time(row['effective_date'], row['effective_time'], zone),
+            "issued": _instant(row['created_at']),
+            "performer": [{"display": row['lab_name']}] if row['lab_name'] else None,
+            "valueQuantity": _quantity(row['value'], row['unit']),
+            "interpretation": interpretations.get(row['lab_flag']),
+            "note": _notes(row['notes']),
+            "referenceRange": [reference_range] if reference_range else None,
+        })
+
+    def build_diagnostic_report(row) -> Dict[str, Any]:
+        return _compact({
+            "resourceType": "DiagnosticReport",
+            "id": str(row['id']),
+            "meta": _meta(row),
+            "status": report_statuses.get(row['processing_status'], "unknown"),
+            "category": lab_report,
+            "code": {"text": row['report_name'] or "Laboratory report"},
+            "subject": patient(row['user_id']),
+            "effectiveDateTime": _date_time(row['report_date']),
+            "issued": _instant(row['created_at']),
+            "performer": [{"display": row['lab_name']}] if row['lab_name'] else None,
+            "resultsInterpreter": [{"display": row['ordering_physician']}] if row['ordering_physician'] else None,
+            "result": [{"reference": f"Observation/{observation_id}"} for observation_id in row['result_ids']],
+        })
+
+    def build_condition(row) -> Dict[str, Any]:
+        return _compact({
+            "resourceType": "Condition",
+            "id": str(row['id']),
+            "meta": _meta(row),
+            "clinicalStatus": _status_concept("condition-clinical", row['clinical_status']),
+            "verificationStatus": _status_concept("condition-ver-status", row['verification_status']),
+            "severity": condition_severities.get(row['severity']),
+            "code": _concept(row['icd10_code'], ICD10_SYSTEM, row['name']),
+            "subject": patient(row['user_id']),
+            "onsetDateTime": _date_time(row['onset_date']),
+            "abatementDateTime": _date_time(row['abatement_date']),
+            "recordedDate": _instant(row['created_at']),
+            "asserter": {"display": row['diagnosed_by']} if row['diagnosed_by'] else None,
+            "note": _notes(row['notes']),
+        })
+
+    def build_allergy(row) -> Dict[str, Any]:
+        reaction = _compact({
+            "description": row['reaction_description'],
+            "severity": row['reaction_severity'] if row['reaction_severity'] in ("mild", "moderate", "severe") else None,
+        })
+        return _compact({
+            "resourceType": "AllergyIntolerance",
+            "id": str(row['id']),
+            "meta": _meta(row),
+            "clinicalStatus": _status_concept("allergyintolerance-clinical", row['clinical_status']),
+            "verificationStatus": _status_concept("allergyintolerance-verification", row['verification_status']),
+            "type": row['allergy_type'] if row['allergy_type'] in ("allergy", "intolerance") else None,
+            "category": [row['category']] if row['category'] in ("food", "medication", "environment", "biologic") else None,
+            "criticality": row['criticality'] if row['criticality'] in ("low", "high", "unable-to-assess") else None,
+            "code": {"text": row['allergen']},
+            "patient": patient(row['user_id']),
+            "onsetDateTime": _date_time(row['onset_date']),
+            "recordedDate": _instant(row['created_at']),
+            "note": _notes(row['notes']),
+            # A reaction needs a substance or manifestation; the description stands in as text
+            "reaction": [{"manifestation": [{"text": reaction.get("description", row['allergen'])}], **reaction}] if reaction else None,
+        })
+
+    def build_immunization(row) -> Dict[str, Any]:
+        protocol = _compact({
+            "doseNumberPositiveInt": row['dose_number'],
+            "seriesDosesPositiveInt": row['series_doses'],
+        }) if row['dose_number'] else None
+        return _compact({
+            "resourceType": "Immunization",
+            "id": str(row['id']),
+            "meta": _meta(row),
+            "status": row['status'] if row['status'] in ("completed", "entered-in-error", "not-done") else "completed",
+            "vaccineCode": _concept(row['vaccine_code'], CVX_SYSTEM, row['vaccine_name']),
+            "patient": patient(row['user_id']),
+            "occurrenceDateTime": _date_time(row['administration_date']),
+            "recorded": _instant(row['created_at']),
+            "location": {"display": row['facility_name']} if row['facility_name'] else None,
+            "manufacturer": {"display": row['manufacturer']} if row['manufacturer'] else None,
+            "lotNumber": row['lot_number'],
+            "site": {"text": row['site']} if row['site'] else None,
+            "route": {"text": row['route']} if row['route'] else None,
+            "performer": [{"actor": {"display": row['administered_by']}}] if row['administered_by'] else None,
+            "note": _notes(row['notes']),
+            "protocolApplied": [protocol] if protocol else None,
+        })
+
+    def build_procedure(row) -> Dict[str, Any]:
+        return _compact({
+            "resourceType": "Procedure",
+            "id": str(row['id']),
+            "meta": _meta(row),
+            "status": "completed",
+            "category": {"text": row['procedure_type']} if row['procedure_type'] else None,
+            "code": _concept(row['cpt_code'], CPT_SYSTEM, row['name']),
+            "subject": patient(row['user_id']),
+            "performedDateTime": _date_time(row['performed_date'], row['performed_time'], zone),
+            "performer": [{"actor": {"display": row['performed_by']}}] if row['performed_by'] else None,
+            "location": {"display": row['facility_name']} if row['facility_name'] else None,
+            "outcome": {"text": row['outcome']} if row['outcome'] else None,
+            "note": _notes(row['findings'], row['notes']),
+        })
+
+    def live(table: str, columns: str = "*", order: str = "created_at, id") -> str:
+        return f"""
+            SELECT {columns} FROM {table}
+            WHERE user_id = $1 AND deleted_at IS NULL AND ($2::timestamptz IS NULL OR updated_at >= $2)
+            ORDER BY {order}
+        """
+
+    serializers = [
+        ResourceSerializer("Patient", """
+            SELECT * FROM users
+            WHERE id = $1 AND ($2::timestamptz IS NULL OR updated_at >= $2)
+        """, build_patient),
+        ResourceSerializer("Observation", live("observations", order="effective_date, created_at, id"), build_observation),
+        ResourceSerializer("DiagnosticReport", live(
+            "diagnostic_reports dr",
+            columns="""dr.*, ARRAY(
+                SELECT o.id FROM observations o
+                WHERE o.lab_report_id = dr.id AND o.user_id = dr.user_id AND o.deleted_at IS NULL
+                ORDER BY o.id
+            ) AS result_ids""",
+            order="report_date, created_at, id"
+        ), build_diagnostic_report),
+        ResourceSerializer("Condition", live("conditions"), build_condition),
+        ResourceSerializer("AllergyIntolerance", live("allergies"), build_allergy),
+        ResourceSerializer("Immunization", live("vaccinations", order="administration_date, created_at, id"), build_immunization),
+        ResourceSerializer("Procedure", live("procedures", order="performed_date, created_at, id"), build_procedure),
+    ]
+    return {serializer.resource_type: serializer for serializer in serializers}
+
+FHIR_RESOURCE_TYPES = list(compile_serializers([]))
+
+# ============================================
+# Bulk Export Job
+# ============================================
+
+def fhir_file_path(result_dir: str, resource_type: str) -> str:
+    return os.path.join(result_dir, f"{resource_type}.ndjson")
+
+def _write_all(file, chunks: List[bytes]):
+    file.writelines(chunks)
+
+@register_export_handler(FHIR_EXPORT_KIND)
+async def export_fhir_bulk(job: ExportJob) -> ExportResult:
+    """
+    Write one NDJSON file per requested resource type into the job's result
+    directory, plus a manifest of file names and resource counts. All types
+    are read in one repeatable-read transaction from server-side cursors,
+    so the files are a consistent snapshot as of the manifest's
+    transactionTime.
+    """
+    types = job.params.get("types") or FHIR_RESOURCE_TYPES
+    since = datetime.fromisoformat(job.params["since"]) if job.params.get("since") else None
+    encode = json.JSONEncoder(ensure_ascii=False, separators=(",", ":")).encode
+
+    os.makedirs(job.result_path, exist_ok=True)
+    output = []
+    async with job.pool.acquire() as conn:
+        async with conn.transaction(readonly=True, isolation="repeatable_read"):
+            transaction_time = await conn.fetchval("SELECT NOW()")
+            # Read here rather than from the catalog, which the standalone export worker does not load
+            biomarkers = await conn.fetch("SELECT id, name, loinc_code FROM biomarker_definitions")
+            zone = user_zone(await conn.fetchval("SELECT timezone FROM users WHERE id = $1", job.user_id))
+            serializers = compile_serializers(biomarkers, zone)
+            for i, resource_type in enumerate(types):
+                await job.progress(5 + 90 * i // len(types), f"Exporting {resource_type}")
+                serializer = serializers[resource_type]
+                count = 0
+                with open(fhir_file_path(job.result_path, resource_type), "wb") as file:
+                    async for batch in iter_cursor(conn, serializer.query, [job.user_id, since]):
+                        build = serializer.build
+                        lines = [(encode(build(row)) + "\n").encode() for row in batch]
+                        await asyncio.to_thread(_write_all, file, lines)
+                        count += len(lines)
+                if count:
+                    output.append({"type": resource_type, "count": count})
+                else:
+                    os.unlink(fhir_file_path(job.result_path, resource_type))
+
+    manifest = {
+        "transactionTime": transaction_time.astimezone(timezone.utc).isoformat(),
+        "types": types,
+        "since": job.params.get("since"),
+        "output": output,
+    }
+    with open(os.path.join(job.result_path, FHIR_MANIFEST_FILENAME), "w") as file:
+        json.dump(manifest, file)
+    return ExportResult(FHIR_MANIFEST_FILENAME, "application/json")
+
+def load_manifest(result_dir: str) -> Dict[str, Any]:
+    with open(os.path.join(result_dir, FHIR_MANIFEST_FILENAME)) as file:
+        return json.load(file)
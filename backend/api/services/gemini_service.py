@@ -5,13 +5,22 @@ Handles OCR (Vision) and LLM (Explanations, Insights) via Google Gemini API
 
 import os
 import json
+import time
 import base64
+import hashlib
 import httpx
-from typing import Optional, List, Dict, Any
-from dataclasses import dataclass
+from collections import OrderedDict
+from decimal import Decimal
+from pathlib import Path
+from typing import Optional, List, Dict, Any, AsyncIterator, Awaitable, Callable, Set, Tuple, Union
+from dataclasses import dataclass, asdict
 from datetime import datetime
 import re
 
+from .metrics import get_latency_histogram
+from .single_flight import SingleFlight
+from .uploads import base64_length, iter_base64
+
 # ============================================
 # Configuration
 # ============================================
@@ -19,7 +28,34 @@ import re
 GEMINI_API_KEY = os.getenv("GEMINI_API_KEY")
 GEMINI_VISION_MODEL = "gemini-1.5-flash"
 GEMINI_TEXT_MODEL = "gemini-1.5-flash"
-GEMINI_BASE_URL = "https://generativelanguage.googleapis.com/v1beta/models"
+GEMINI_BASE_URL = os.getenv("GEMINI_BASE_URL", "https://generativelanguage.googleapis.com/v1beta/models")
+
+# Shared HTTP client (one per process, reused across calls)
+GEMINI_HTTP2 = os.getenv("GEMINI_HTTP2", "true").lower() in ("1", "true", "yes")
+GEMINI_MAX_CONNECTIONS = int(os.getenv("GEMINI_MAX_CONNECTIONS", "20"))
+GEMINI_MAX_KEEPALIVE_CONNECTIONS = int(os.getenv("GEMINI_MAX_KEEPALIVE_CONNECTIONS", "10"))
+GEMINI_KEEPALIVE_EXPIRY_SECONDS = float(os.getenv("GEMINI_KEEPALIVE_EXPIRY_SECONDS", "120"))
+GEMINI_TIMEOUT_SECONDS = float(os.getenv("GEMINI_TIMEOUT_SECONDS", "60"))
+GEMINI_CONNECT_TIMEOUT_SECONDS = float(os.getenv("GEMINI_CONNECT_TIMEOUT_SECONDS", "10"))
+
+try:
+    import h2  # noqa: F401  (required by httpx for HTTP/2)
+    HTTP2_AVAILABLE = True
+except ImportError:
+    HTTP2_AVAILABLE = False
+
+# Response cache (in-memory LRU per process, optionally backed by Postgres)
+AI_CACHE_SIZE = int(os.getenv("AI_CACHE_SIZE", "2000"))
+AI_CACHE_PERSIST = os.getenv("AI_CACHE_PERSIST", "true").lower() in ("1", "true", "yes")
+AI_CACHE_TTL_SECONDS = {
+    "explain": float(os.getenv("AI_CACHE_EXPLAIN_TTL_SECONDS", str(7 * 86400))),
+    "insights": float(os.getenv("AI_CACHE_INSIGHTS_TTL_SECONDS", "86400")),
+    "visit_questions": float(os.getenv("AI_CACHE_VISIT_QUESTIONS_TTL_SECONDS", "86400")),
+    "test_timing": float(os.getenv("AI_CACHE_TEST_TIMING_TTL_SECONDS", str(7 * 86400))),
+}
+
+# Bump when a prompt changes so old answers stop matching
+AI_CACHE_PROMPT_VERSION = 1
 
 # ============================================
 # Data Classes
@@ -44,6 +80,7 @@ class OCRResult:
     extracted_values: List[ExtractedLabValue] = None
     raw_text: Optional[str] = None
     error: Optional[str] = None
+    engine: Optional[str] = None  # gemini or tesseract
 
 @dataclass
 class ExplanationResult:
@@ -65,6 +102,187 @@ class InsightResult:
     lifestyle_suggestions: List[str] = None
     error: Optional[str] = None
 
+# ============================================
+# Response Cache
+# ============================================
+
+def _canonical(value: Any) -> Any:
+    """Normalize prompt inputs so equivalent requests hash the same"""
+    if isinstance(value, bool) or value is None:
+        return value
+    if isinstance(value, (int, float, Decimal)):
+        # 3 significant figures: 95.04 and 95.0 share an answer, 0.012 stays 0.012
+        return float(f"{float(value):.3g}")
+    if isinstance(value, str):
+        return " ".join(value.split()).casefold()
+    if isinstance(value, dict):
+        return {str(k): _canonical(v) for k, v in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [_canonical(v) for v in value]
+    return str(value)
+
+def _name_set(names: Optional[List[str]]) -> List[str]:
+    """Order-insensitive list of names (conditions, medications)"""
+    return sorted({_canonical(n) for n in names or [] if n})
+
+def ai_cache_key(method: str, scope: Optional[str], inputs: Dict[str, Any]) -> str:
+    material = json.dumps(
+        {"method": method, "version": AI_CACHE_PROMPT_VERSION, "scope": scope, "inputs": _canonical(inputs)},
+        sort_keys=True, separators=(",", ":")
+    )
+    return hashlib.sha256(material.encode("utf-8")).hexdigest()
+
+
+class AIResponseCache:
+    """
+    Content-addressed cache for LLM answers.
+
+    Keys are a SHA-256 of the method, prompt version and canonicalized inputs;
+    per-user methods also include the user id as scope so `invalidate_user`
+    can drop them. The memory tier is an LRU per process; the persistent tier
+    (ai_response_cache) is shared across workers and cleared for a user by the
+    observation triggers. Only successful answers are stored.
+    """
+
+    def __init__(self, max_size: int = AI_CACHE_SIZE, ttl_seconds: Dict[str, float] = None):
+        self.max_size = max_size
+        self.ttl_seconds = dict(ttl_seconds or AI_CACHE_TTL_SECONDS)
+        self._entries: "OrderedDict[str, Tuple[float, Optional[str], Any]]" = OrderedDict()
+        self._by_scope: Dict[str, Set[str]] = {}
+        self._pool = None
+        self.counters: Dict[str, Dict[str, int]] = {}
+        self.persist_errors = 0
+        self.invalidations = 0
+
+    def attach(self, pool):
+        """Enable the Postgres tier (no-op when AI_CACHE_PERSIST is off)"""
+        self._pool = pool if AI_CACHE_PERSIST else None
+
+    def detach(self):
+        self._pool = None
+
+    def _count(self, method: str, counter: str):
+        counts = self.counters.setdefault(method, {"memory_hits": 0, "persistent_hits": 0, "misses": 0, "stores": 0})
+        counts[counter] += 1
+
+    # ----- memory tier -----
+
+    def _memory_get(self, key: str) -> Optional[Any]:
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        expires_at, _, value = entry
+        if expires_at < time.monotonic():
+            self._remove(key)
+            return None
+        self._entries.move_to_end(key)
+        return value
+
+    def _memory_put(self, key: str, scope: Optional[str], value: Any, ttl: float):
+        if self.max_size <= 0 or ttl <= 0:
+            return
+        self._entries[key] = (time.monotonic() + ttl, scope, value)
+        self._entries.move_to_end(key)
+        if scope is not None:
+            self._by_scope.setdefault(scope, set()).add(key)
+        while len(self._entries) > self.max_size:
+            self._remove(next(iter(self._entries)))
+
+    def _remove(self, key: str):
+        entry = self._entries.pop(key, None)
+        if entry is not None and entry[1] is not None:
+            keys = self._by_scope.get(entry[1])
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del self._by_scope[entry[1]]
+
+    # ----- public API -----
+
+    async def get(self, method: str, key: str) -> Optional[Any]:
+        value = self._memory_get(key)
+        if value is not None:
+            self._count(method, "memory_hits")
+            return value
+
+        if self._pool is not None:
+            try:
+                async with self._pool.acquire() as conn:
+                    row = await conn.fetchrow(
+                        """
+                        SELECT user_id, response, EXTRACT(EPOCH FROM expires_at - NOW()) AS ttl
+                        FROM ai_response_cache
+                        WHERE cache_key = $1 AND expires_at > NOW()
+                        """,
+                        key
+                    )
+            except Exception as e:
+                self.persist_errors += 1
+                print(f"⚠️ AI cache read failed: {e}")
+                row = None
+            if row is not None:
+                value = json.loads(row['response'])
+                scope = str(row['user_id']) if row['user_id'] else None
+                self._memory_put(key, scope, value, float(row['ttl']))
+                self._count(method, "persistent_hits")
+                return value
+
+        self._count(method, "misses")
+        return None
+
+    async def put(self, method: str, key: str, scope: Optional[str], value: Any):
+        ttl = self.ttl_seconds.get(method, 0)
+        if ttl <= 0:
+            return
+        self._memory_put(key, scope, value, ttl)
+        self._count(method, "stores")
+
+        if self._pool is not None:
+            try:
+                async with self._pool.acquire() as conn:
+                    await conn.execute(
+                        """
+                        INSERT INTO ai_response_cache (cache_key, method, user_id, response, expires_at)
+                        VALUES ($1, $2, $3::uuid, $4::jsonb, NOW() + make_interval(secs => $5))
+                        ON CONFLICT (cache_key) DO UPDATE SET
+                            response = EXCLUDED.response,
+                            created_at = NOW(),
+                            expires_at = EXCLUDED.expires_at
+                        """,
+                        key, method, scope, json.dumps(value), ttl
+                    )
+            except Exception as e:
+                self.persist_errors += 1
+                print(f"⚠️ AI cache write failed: {e}")
+
+    def invalidate_user(self, user_id):
+        """Drop this worker's cached answers for a user (call after observation writes)"""
+        keys = self._by_scope.pop(str(user_id), set())
+        for key in keys:
+            self._entries.pop(key, None)
+        if keys:
+            self.invalidations += 1
+
+    def clear(self):
+        self._entries.clear()
+        self._by_scope.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        methods = {}
+        for method, counts in sorted(self.counters.items()):
+            hits = counts["memory_hits"] + counts["persistent_hits"]
+            lookups = hits + counts["misses"]
+            methods[method] = {**counts, "hit_ratio": round(hits / lookups, 4) if lookups else None}
+        return {
+            "size": len(self._entries),
+            "max_size": self.max_size,
+            "persistent": self._pool is not None,
+            "persist_errors": self.persist_errors,
+            "invalidations": self.invalidations,
+            "methods": methods,
+        }
+
+
 # ============================================
 # Biomarker Mapping
 # ============================================
@@ -127,19 +345,30 @@ BIOMARKER_ALIASES = {
     'testosterone': ['testosterone', 'total testosterone', 'serum testosterone'],
     'estradiol': ['estradiol', 'e2', 'oestradiol'],
     'cortisol': ['cortisol', 'serum cortisol', 'am cortisol', 'morning cortisol'],
-    'dheas': ['dhea-s', 'dheas', 'dehydroepiandrosterone sulfate'],
+    'dheas': ['dhea-s', 'dheas', 'dhea sulfate', 'dehydroepiandrosterone sulfate'],
 }
 
 def map_to_biomarker_id(test_name: str) -> Optional[str]:
-    """Map extracted test name to our biomarker ID"""
-    test_lower = test_name.lower().strip()
-    
-    for biomarker_id, aliases in BIOMARKER_ALIASES.items():
-        for alias in aliases:
-            if alias in test_lower or test_lower in alias:
-                return biomarker_id
-    
-    return None
+    """Map extracted test name to our biomarker ID (see services.alias_index)"""
+    from .alias_index import get_alias_index
+    return get_alias_index().biomarker_id(test_name)
+
+# ============================================
+# Streamed Request Bodies
+# ============================================
+
+INLINE_DATA_PLACEHOLDER = "\u0000inline-data\u0000"
+
+def _split_json(payload: Dict) -> Tuple[bytes, bytes]:
+    """Serialize `payload` into the bytes before and after the placeholder string's contents"""
+    head, tail = json.dumps(payload).split(json.dumps(INLINE_DATA_PLACEHOLDER), 1)
+    return (head + '"').encode(), ('"' + tail).encode()
+
+async def _stream_json(head: bytes, stream_data: AsyncIterator[bytes], tail: bytes) -> AsyncIterator[bytes]:
+    yield head
+    async for chunk in stream_data:  # base64 is already JSON-safe
+        yield chunk
+    yield tail
 
 # ============================================
 # Gemini API Client
@@ -150,32 +379,103 @@ class GeminiService:
         self.api_key = GEMINI_API_KEY
         if not self.api_key:
             raise ValueError("GEMINI_API_KEY environment variable not set")
+        
+        # One pooled client for the life of the service, so calls reuse
+        # warm TCP/TLS connections instead of handshaking every time
+        self.http2 = GEMINI_HTTP2 and HTTP2_AVAILABLE
+        self.client = httpx.AsyncClient(
+            http2=self.http2,
+            timeout=httpx.Timeout(GEMINI_TIMEOUT_SECONDS, connect=GEMINI_CONNECT_TIMEOUT_SECONDS),
+            limits=httpx.Limits(
+                max_connections=GEMINI_MAX_CONNECTIONS,
+                max_keepalive_connections=GEMINI_MAX_KEEPALIVE_CONNECTIONS,
+                keepalive_expiry=GEMINI_KEEPALIVE_EXPIRY_SECONDS,
+            ),
+        )
+        
+        # Identical requests that miss the cache at the same time share one call
+        self.flights = SingleFlight()
+    
+    async def aclose(self):
+        await self.client.aclose()
     
-    async def _call_gemini(self, model: str, contents: List[Dict], generation_config: Dict = None) -> Dict:
-        """Make a call to Gemini API"""
+    async def _call_gemini(self, model: str, contents: List[Dict], generation_config: Dict = None,
+                           operation: str = "generate", stream_data: Optional[AsyncIterator[bytes]] = None,
+                           stream_length: int = 0) -> Dict:
+        """
+        Make a call to Gemini API. With `stream_data` (`stream_length` bytes),
+        the body is sent as it is produced and `stream_data` fills the
+        INLINE_DATA_PLACEHOLDER value, so a large file is never held in memory
+        as one base64 string.
+        """
         url = f"{GEMINI_BASE_URL}/{model}:generateContent?key={self.api_key}"
         
         payload = {"contents": contents}
         if generation_config:
             payload["generationConfig"] = generation_config
         
-        async with httpx.AsyncClient(timeout=60.0) as client:
-            response = await client.post(url, json=payload)
+        with get_latency_histogram(f"gemini.{operation}").time():
+            if stream_data is None:
+                response = await self.client.post(url, json=payload)
+            else:
+                head, tail = _split_json(payload)
+                response = await self.client.post(
+                    url,
+                    content=_stream_json(head, stream_data, tail),
+                    headers={
+                        "Content-Type": "application/json",
+                        "Content-Length": str(len(head) + stream_length + len(tail))
+                    }
+                )
             response.raise_for_status()
             return response.json()
     
+    async def _cached(self, method: str, scope: Optional[str], inputs: Dict[str, Any],
+                      compute: Callable[[], Awaitable[Any]], result_type: type = None) -> Any:
+        """Serve `method` from the response cache, computing and storing successful results"""
+        cache = get_ai_response_cache()
+        key = ai_cache_key(method, scope, inputs)
+        
+        cached = await cache.get(method, key)
+        if cached is not None:
+            return result_type(**cached) if result_type else cached
+        
+        async def compute_and_store():
+            result = await compute()
+            if result_type is None or result.success:
+                await cache.put(method, key, scope, asdict(result) if result_type else result)
+            return result
+        
+        return await self.flights.do(key, compute_and_store)
+    
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "http2": self.http2,
+            "max_connections": GEMINI_MAX_CONNECTIONS,
+            "max_keepalive_connections": GEMINI_MAX_KEEPALIVE_CONNECTIONS,
+            "keepalive_expiry_seconds": GEMINI_KEEPALIVE_EXPIRY_SECONDS,
+            "single_flight": self.flights.stats(),
+        }
+    
     # ============================================
     # OCR - Extract Lab Values from Images/PDFs
     # ============================================
     
-    async def extract_lab_values(self, file_content: bytes, mime_type: str) -> OCRResult:
+    async def extract_lab_values(self, file_content: Union[bytes, Path], mime_type: str) -> OCRResult:
         """
         Extract lab values from an uploaded lab report image or PDF.
-        Uses Gemini Vision to parse the document.
+        Uses Gemini Vision to parse the document. A Path (spooled upload) is
+        base64-encoded and sent in chunks as the request body streams.
         """
         try:
             # Encode file to base64
-            file_base64 = base64.standard_b64encode(file_content).decode('utf-8')
+            if isinstance(file_content, Path):
+                file_base64 = INLINE_DATA_PLACEHOLDER
+                stream_data = iter_base64(file_content)
+                stream_length = base64_length(file_content.stat().st_size)
+            else:
+                file_base64 = base64.standard_b64encode(file_content).decode('utf-8')
+                stream_data, stream_length = None, 0
             
             # Construct the prompt for structured extraction
             extraction_prompt = """Analyze this lab report image and extract all lab test results.
@@ -223,7 +523,10 @@ Rules:
             response = await self._call_gemini(
                 GEMINI_VISION_MODEL,
                 contents,
-                {"temperature": 0.1, "maxOutputTokens": 4096}
+                {"temperature": 0.1, "maxOutputTokens": 4096},
+                operation="ocr",
+                stream_data=stream_data,
+                stream_length=stream_length
             )
             
             # Parse response
@@ -265,7 +568,8 @@ Rules:
                 report_date=parsed.get('report_date'),
                 patient_name=parsed.get('patient_name'),
                 extracted_values=extracted_values,
-                raw_text=response_text
+                raw_text=response_text,
+                engine="gemini"
             )
             
         except json.JSONDecodeError as e:
@@ -281,7 +585,20 @@ Rules:
                                  reference_range: str = None, trend: str = None) -> ExplanationResult:
         """
         Generate a plain-language explanation of a biomarker result.
+        Answers depend only on the inputs, so they are cached across users.
         """
+        inputs = {
+            "marker_name": marker_name, "value": value, "unit": unit, "status": status,
+            "reference_range": reference_range, "trend": trend
+        }
+        return await self._cached(
+            "explain", None, inputs,
+            lambda: self._explain_biomarker(marker_name, value, unit, status, reference_range, trend),
+            ExplanationResult
+        )
+    
+    async def _explain_biomarker(self, marker_name: str, value: float, unit: str, status: str,
+                                 reference_range: str = None, trend: str = None) -> ExplanationResult:
         try:
             prompt = f"""You are a health educator (NOT a doctor). Explain this lab result in simple terms.
 
@@ -315,7 +632,8 @@ Rules:
             response = await self._call_gemini(
                 GEMINI_TEXT_MODEL,
                 contents,
-                {"temperature": 0.3, "maxOutputTokens": 1024}
+                {"temperature": 0.3, "maxOutputTokens": 1024},
+                operation="explain"
             )
             
             response_text = response['candidates'][0]['content']['parts'][0]['text']
@@ -349,10 +667,26 @@ Rules:
     # ============================================
     
     async def generate_insights(self, observations: List[Dict], conditions: List[str] = None,
-                                 medications: List[str] = None) -> InsightResult:
+                                 medications: List[str] = None, user_id: str = None) -> InsightResult:
         """
         Generate AI-powered insights from a collection of lab results.
+        Cached per user (when given) until their observations change.
         """
+        inputs = {
+            "observations": sorted(
+                (_canonical([o['name'], o['value'], o['unit'], o['status']]) for o in observations)
+            ),
+            "conditions": _name_set(conditions),
+            "medications": _name_set(medications)
+        }
+        return await self._cached(
+            "insights", user_id, inputs,
+            lambda: self._generate_insights(observations, conditions, medications),
+            InsightResult
+        )
+    
+    async def _generate_insights(self, observations: List[Dict], conditions: List[str] = None,
+                                 medications: List[str] = None) -> InsightResult:
         try:
             # Format observations for the prompt
             obs_text = "\n".join([
@@ -406,7 +740,8 @@ Rules:
             response = await self._call_gemini(
                 GEMINI_TEXT_MODEL,
                 contents,
-                {"temperature": 0.4, "maxOutputTokens": 2048}
+                {"temperature": 0.4, "maxOutputTokens": 2048},
+                operation="insights"
             )
             
             response_text = response['candidates'][0]['content']['parts'][0]['text']
@@ -439,24 +774,51 @@ Rules:
     
     async def generate_visit_questions(self, flagged_markers: List[Dict], 
                                         recent_changes: List[Dict],
-                                        conditions: List[str] = None) -> List[str]:
+                                        conditions: List[str] = None,
+                                        user_id: str = None) -> List[str]:
         """
         Generate smart, personalized questions for a doctor visit.
         """
+        inputs = {
+            "flagged": sorted(
+                (_canonical([m['name'], m['value'], m['unit'], m['status']]) for m in flagged_markers)
+            ),
+            "changes": sorted(
+                (_canonical([c['name'], c['direction'], c['change']]) for c in recent_changes)
+            ),
+            "conditions": _name_set(conditions)
+        }
         try:
-            flagged_text = "\n".join([
-                f"- {m['name']}: {m['value']} {m['unit']} ({m['status']})"
-                for m in flagged_markers
-            ]) or "None"
-            
-            changes_text = "\n".join([
-                f"- {c['name']}: {c['direction']} by {c['change']}%"
-                for c in recent_changes
-            ]) or "None"
-            
-            conditions_text = ", ".join(conditions) if conditions else "None"
-            
-            prompt = f"""Generate 5 specific questions a patient should ask their doctor based on these lab results.
+            return await self._cached(
+                "visit_questions", user_id, inputs,
+                lambda: self._generate_visit_questions(flagged_markers, recent_changes, conditions)
+            )
+        except Exception as e:
+            # Return default questions on error (never cached)
+            return [
+                "What do my current results indicate about my overall health?",
+                "Are there any concerning trends I should be aware of?",
+                "What lifestyle changes would you recommend based on these results?",
+                "When should I retest these markers?",
+                "Are my current medications affecting any of these results?"
+            ]
+    
+    async def _generate_visit_questions(self, flagged_markers: List[Dict],
+                                        recent_changes: List[Dict],
+                                        conditions: List[str] = None) -> List[str]:
+        flagged_text = "\n".join([
+            f"- {m['name']}: {m['value']} {m['unit']} ({m['status']})"
+            for m in flagged_markers
+        ]) or "None"
+        
+        changes_text = "\n".join([
+            f"- {c['name']}: {c['direction']} by {c['change']}%"
+            for c in recent_changes
+        ]) or "None"
+        
+        conditions_text = ", ".join(conditions) if conditions else "None"
+        
+        prompt = f"""Generate 5 specific questions a patient should ask their doctor based on these lab results.
 
 Flagged Markers (outside normal range):
 {flagged_text}
@@ -476,51 +838,58 @@ Rules:
 4. Questions should be respectful and appropriate for a medical setting
 5. Return ONLY the JSON array, no other text"""
 
-            contents = [{"parts": [{"text": prompt}]}]
-            
-            response = await self._call_gemini(
-                GEMINI_TEXT_MODEL,
-                contents,
-                {"temperature": 0.5, "maxOutputTokens": 512}
-            )
-            
-            response_text = response['candidates'][0]['content']['parts'][0]['text']
-            
-            # Clean up JSON
-            json_match = re.search(r'\[.*\]', response_text, re.DOTALL)
-            if json_match:
-                response_text = json_match.group(0)
-            
-            questions = json.loads(response_text)
-            return questions[:5]
-            
-        except Exception as e:
-            # Return default questions on error
-            return [
-                "What do my current results indicate about my overall health?",
-                "Are there any concerning trends I should be aware of?",
-                "What lifestyle changes would you recommend based on these results?",
-                "When should I retest these markers?",
-                "Are my current medications affecting any of these results?"
-            ]
+        contents = [{"parts": [{"text": prompt}]}]
+        
+        response = await self._call_gemini(
+            GEMINI_TEXT_MODEL,
+            contents,
+            {"temperature": 0.5, "maxOutputTokens": 512},
+            operation="visit_questions"
+        )
+        
+        response_text = response['candidates'][0]['content']['parts'][0]['text']
+        
+        # Clean up JSON
+        json_match = re.search(r'\[.*\]', response_text, re.DOTALL)
+        if json_match:
+            response_text = json_match.group(0)
+        
+        questions = json.loads(response_text)
+        if not isinstance(questions, list):
+            raise ValueError("Expected a JSON array of questions")
+        return questions[:5]
     
     # ============================================
     # Test Timing Optimizer
     # ============================================
     
-    async def optimize_test_timing(self, marker_history: List[Dict]) -> Dict:
+    async def optimize_test_timing(self, marker_history: List[Dict], user_id: str = None) -> Dict:
         """
         Analyze marker history and recommend optimal retest intervals.
         Uses variance analysis to determine if more or less frequent testing is needed.
         """
+        inputs = {
+            "history": sorted(
+                (_canonical([h['name'], h['values'], h.get('variance'), h.get('status')]) for h in marker_history),
+                key=json.dumps
+            )
+        }
         try:
-            history_text = "\n".join([
-                f"- {h['name']}: {len(h['values'])} tests, variance: {h.get('variance', 'unknown')}, "
-                f"last value: {h['values'][-1] if h['values'] else 'N/A'}, status: {h.get('status', 'unknown')}"
-                for h in marker_history
-            ])
-            
-            prompt = f"""Analyze this test history and recommend optimal retest intervals.
+            return await self._cached(
+                "test_timing", user_id, inputs,
+                lambda: self._optimize_test_timing(marker_history)
+            )
+        except Exception as e:
+            return {"error": str(e)}
+    
+    async def _optimize_test_timing(self, marker_history: List[Dict]) -> Dict:
+        history_text = "\n".join([
+            f"- {h['name']}: {len(h['values'])} tests, variance: {h.get('variance', 'unknown')}, "
+            f"last value: {h['values'][-1] if h['values'] else 'N/A'}, status: {h.get('status', 'unknown')}"
+            for h in marker_history
+        ])
+        
+        prompt = f"""Analyze this test history and recommend optimal retest intervals.
 
 Test History:
 {history_text}
@@ -547,28 +916,29 @@ Rules:
 4. Always recommend at least annual testing for key markers
 5. Return ONLY valid JSON"""
 
-            contents = [{"parts": [{"text": prompt}]}]
-            
-            response = await self._call_gemini(
-                GEMINI_TEXT_MODEL,
-                contents,
-                {"temperature": 0.3, "maxOutputTokens": 1024}
-            )
-            
-            response_text = response['candidates'][0]['content']['parts'][0]['text']
-            
-            json_match = re.search(r'```json\s*(.*?)\s*```', response_text, re.DOTALL)
+        contents = [{"parts": [{"text": prompt}]}]
+        
+        response = await self._call_gemini(
+            GEMINI_TEXT_MODEL,
+            contents,
+            {"temperature": 0.3, "maxOutputTokens": 1024},
+            operation="test_timing"
+        )
+        
+        response_text = response['candidates'][0]['content']['parts'][0]['text']
+        
+        json_match = re.search(r'```json\s*(.*?)\s*```', response_text, re.DOTALL)
+        if json_match:
+            response_text = json_match.group(1)
+        else:
+            json_match = re.search(r'\{.*\}', response_text, re.DOTALL)
             if json_match:
-                response_text = json_match.group(1)
-            else:
-                json_match = re.search(r'\{.*\}', response_text, re.DOTALL)
-                if json_match:
-                    response_text = json_match.group(0)
-            
-            return json.loads(response_text)
-            
-        except Exception as e:
-            return {"error": str(e)}
+                response_text = json_match.group(0)
+        
+        parsed = json.loads(response_text)
+        if not isinstance(parsed, dict):
+            raise ValueError("Expected a JSON object")
+        return parsed
 
 
 # ============================================
@@ -583,3 +953,23 @@ def get_gemini_service() -> GeminiService:
     if _gemini_service is None:
         _gemini_service = GeminiService()
     return _gemini_service
+
+_ai_response_cache = None
+
+def get_ai_response_cache() -> AIResponseCache:
+    """Get or create the AI response cache singleton"""
+    global _ai_response_cache
+    if _ai_response_cache is None:
+        _ai_response_cache = AIResponseCache()
+    return _ai_response_cache
+
+def gemini_service_stats() -> Optional[Dict[str, Any]]:
+    """Client settings if the service has been created (without creating it)"""
+    return _gemini_service.stats() if _gemini_service is not None else None
+
+async def close_gemini_service():
+    """Close the shared HTTP client (called from the app lifespan)"""
+    global _gemini_service
+    if _gemini_service is not None:
+        await _gemini_service.aclose()
+        _gemini_service = None
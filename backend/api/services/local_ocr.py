@@ -0,0 +1,340 @@
+"""
+HealthCanvas - Local Lab Report OCR
+Tesseract in a process pool with a rule-based lab table parser; Gemini Vision as fallback
+"""
+
+import io
+import os
+import re
+import shutil
+import asyncio
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from dataclasses import dataclass, field
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple, Union
+
+from .alias_index import get_alias_index, normalize_test_name
+from .gemini_service import ExtractedLabValue, OCRResult
+from .metrics import get_latency_histogram
+from .worker_pool import BoundedWorkerPool, WorkerPoolSaturated
+
+# Tesseract needs both pytesseract and the tesseract binary (tesseract-ocr in the Dockerfile)
+try:
+    import pytesseract
+    from PIL import Image
+    TESSERACT_AVAILABLE = shutil.which(pytesseract.pytesseract.tesseract_cmd) is not None
+except ImportError:
+    TESSERACT_AVAILABLE = False
+
+try:
+    from pdf2image import convert_from_bytes, convert_from_path, pdfinfo_from_bytes, pdfinfo_from_path
+    PDF2IMAGE_AVAILABLE = True
+except ImportError:
+    PDF2IMAGE_AVAILABLE = False
+
+# ============================================
+# Configuration
+# ============================================
+
+LOCAL_OCR_ENABLED = os.getenv("LOCAL_OCR_ENABLED", "true").lower() in ("1", "true", "yes")
+LOCAL_OCR_WORKERS = int(os.getenv("LOCAL_OCR_WORKERS", str(min(2, os.cpu_count() or 1))))
+LOCAL_OCR_MAX_PENDING = int(os.getenv("LOCAL_OCR_MAX_PENDING", "16"))
+LOCAL_OCR_TIMEOUT_SECONDS = float(os.getenv("LOCAL_OCR_TIMEOUT_SECONDS", "30"))
+# Escalate to Gemini below this mean Tesseract word confidence (0-1) ...
+LOCAL_OCR_MIN_CONFIDENCE = float(os.getenv("LOCAL_OCR_MIN_CONFIDENCE", "0.80"))
+# ... or when fewer known biomarkers than this were recognised
+LOCAL_OCR_MIN_VALUES = int(os.getenv("LOCAL_OCR_MIN_VALUES", "3"))
+LOCAL_OCR_DPI = 300
+LOCAL_OCR_MAX_PAGES = 10
+# Assume a uniform block of text: keeps each table row on one line
+TESSERACT_CONFIG = "--oem 1 --psm 6"
+
+# ============================================
+# Rule-Based Lab Table Parser
+# ============================================
+
+_VALUE_TOKEN = re.compile(r"^(?P<value>-?\d+(?:[.,]\d+)?)(?P<flag>\*?[HL])?\*?$")
+_RANGE = re.compile(r"(?P<low>\d+(?:\.\d+)?)\s*(?:-|–|to)\s*(?P<high>\d+(?:\.\d+)?)|(?P<bound>[<>≤≥]=?\s*\d+(?:\.\d+)?)")
+_FLAG_TOKENS = {"h": "H", "l": "L", "high": "H", "low": "L", "*h": "H", "*l": "L"}
+_UNIT_TOKEN = re.compile(r"^(?:[%µμa-zA-Z][\w/%µμ^.*\-]*|10\^\d+/\w+)$")
+# Formats apply to the matched groups joined with '-'; slashed dates are day first
+_DATE_PATTERNS = (
+    (re.compile(r"\b(\d{4})-(\d{2})-(\d{2})\b"), "%Y-%m-%d"),
+    (re.compile(r"\b(\d{1,2})/(\d{1,2})/(\d{4})\b"), "%d-%m-%Y"),
+    (re.compile(r"\b(\d{1,2})[- ]([A-Za-z]{3})[- ](\d{4})\b"), "%d-%b-%Y"),
+)
+
+
+@dataclass
+class LocalExtraction:
+    """Parsed Tesseract output for one document (returned from the worker processes)"""
+    values: List[ExtractedLabValue] = field(default_factory=list)
+    report_date: Optional[str] = None
+    ocr_confidence: float = 0.0
+    raw_text: str = ""
+
+    @property
+    def mapped_count(self) -> int:
+        return sum(1 for value in self.values if value.mapped_biomarker_id)
+
+    def to_result(self) -> OCRResult:
+        return OCRResult(
+            success=True,
+            report_date=self.report_date,
+            extracted_values=self.values,
+            raw_text=self.raw_text,
+            engine="tesseract"
+        )
+
+
+def _to_float(text: str) -> float:
+    # '250,000' is a thousands separator, '5,4' a decimal comma
+    whole, _, fraction = text.partition(",")
+    if fraction and len(fraction) == 3:
+        return float(whole + fraction)
+    return float(text.replace(",", "."))
+
+def parse_lab_row(line: str, line_confidence: float = 1.0) -> Optional[ExtractedLabValue]:
+    """
+    Parse one table row: `<test name> <value>[H|L] [unit] [flag] [range]`.
+    The value is the first standalone number after some text, so names with
+    digits (HbA1c, Vitamin B12) stay intact. Unknown tests are kept only when
+    a unit or range shows they are results rather than header text.
+    """
+    tokens = line.replace("|", " ").split()
+    for index, token in enumerate(tokens):
+        value_match = _VALUE_TOKEN.match(token.lstrip("<>"))
+        if value_match and index > 0:
+            break
+    else:
+        return None
+
+    name = " ".join(tokens[:index]).strip(" :.-")
+    # A name needs words, unless it is a short alias like 'E2' or 'B12'
+    if not re.search(r"[A-Za-z]{2}", name) and normalize_test_name(name) not in get_alias_index().exact:
+        return None
+    rest = tokens[index + 1:]
+
+    flag = _FLAG_TOKENS.get((value_match.group("flag") or "").lower())
+    unit = None
+    if rest and _UNIT_TOKEN.match(rest[0]) and rest[0].lower() not in _FLAG_TOKENS:
+        unit = rest.pop(0)
+    for token in rest:
+        flag = flag or _FLAG_TOKENS.get(token.lower())
+
+    range_match = _RANGE.search(" ".join(rest))
+    reference_range = None
+    if range_match:
+        reference_range = range_match.group("bound") or f"{range_match.group('low')}-{range_match.group('high')}"
+
+    biomarker_id = get_alias_index().biomarker_id(name)
+    if biomarker_id is None and unit is None and reference_range is None:
+        return None
+
+    # Missing columns make a misread row more likely
+    completeness = 1.0 if unit and reference_range else 0.9 if unit or reference_range else 0.75
+    return ExtractedLabValue(
+        test_name=name,
+        value=_to_float(value_match.group("value")),
+        unit=unit or "",
+        reference_range=reference_range,
+        flag=flag,
+        confidence=round(line_confidence * completeness, 3),
+        mapped_biomarker_id=biomarker_id
+    )
+
+def _find_report_date(text: str) -> Optional[str]:
+    for pattern, date_format in _DATE_PATTERNS:
+        match = pattern.search(text)
+        if match:
+            try:
+                return datetime.strptime("-".join(match.groups()), date_format).date().isoformat()
+            except ValueError:
+                continue
+    return None
+
+def parse_lab_text(lines: List[Tuple[str, float]]) -> LocalExtraction:
+    """Turn OCR lines (text, confidence 0-1) into extracted values"""
+    values = []
+    for line, confidence in lines:
+        value = parse_lab_row(line, confidence)
+        if value is not None:
+            values.append(value)
+    raw_text = "\n".join(line for line, _ in lines)
+    ocr_confidence = sum(confidence for _, confidence in lines) / len(lines) if lines else 0.0
+    return LocalExtraction(values, _find_report_date(raw_text), round(ocr_confidence, 3), raw_text)
+
+# ============================================
+# Tesseract Workers
+# ============================================
+
+# Entry points run inside the worker processes (module-level so they pickle)
+
+def _ocr_lines(image) -> List[Tuple[str, float]]:
+    data = pytesseract.image_to_data(image.convert("L"), config=TESSERACT_CONFIG, output_type=pytesseract.Output.DICT)
+    rows: Dict[Tuple[int, int, int], List[Tuple[int, str, float]]] = {}
+    for i, word in enumerate(data["text"]):
+        confidence = float(data["conf"][i])
+        if confidence < 0 or not word.strip():
+            continue
+        key = (data["block_num"][i], data["par_num"][i], data["line_num"][i])
+        rows.setdefault(key, []).append((data["left"][i], word, confidence))
+
+    lines = []
+    for key in sorted(rows):
+        words = sorted(rows[key])
+        lines.append((" ".join(word for _, word, _ in words), sum(c for *_, c in words) / len(words) / 100))
+    return lines
+
+def _extract_document(content: Union[bytes, Path], mime_type: str) -> LocalExtraction:
+    # A Path (spooled upload) is read by the worker itself instead of being pickled over
+    lines: List[Tuple[str, float]] = []
+    if mime_type == "application/pdf":
+        if not PDF2IMAGE_AVAILABLE:
+            return LocalExtraction()
+        if isinstance(content, Path):
+            info, convert = pdfinfo_from_path(str(content)), convert_from_path
+            source = str(content)
+        else:
+            info, convert, source = pdfinfo_from_bytes(content), convert_from_bytes, content
+        pages = min(int(info["Pages"]), LOCAL_OCR_MAX_PAGES)
+        for page in range(1, pages + 1):
+            image = convert(source, dpi=LOCAL_OCR_DPI, first_page=page, last_page=page)[0]
+            lines.extend(_ocr_lines(image))
+    else:
+        lines = _ocr_lines(Image.open(content if isinstance(content, Path) else io.BytesIO(content)))
+    return parse_lab_text(lines)
+
+# ============================================
+# Local-First Extraction
+# ============================================
+
+# Content is the bytes, or the Path of a spooled upload
+Extractor = Callable[[Union[bytes, Path], str], Awaitable[OCRResult]]
+
+
+class LocalOCR:
+    """
+    Reads lab reports with Tesseract in a process pool and hands the document
+    to a fallback extractor (Gemini Vision) when the local reading is not
+    trustworthy: low OCR confidence, too few recognised biomarkers, a busy
+    or failing pool, or Tesseract not being installed.
+    """
+
+    def __init__(self, workers: int = LOCAL_OCR_WORKERS, max_pending: int = LOCAL_OCR_MAX_PENDING,
+                 timeout: float = LOCAL_OCR_TIMEOUT_SECONDS):
+        self.workers = workers
+        self.timeout = timeout
+        self.available = LOCAL_OCR_ENABLED and TESSERACT_AVAILABLE
+        self.pool = BoundedWorkerPool("local-ocr", self._new_executor(), max_pending) if self.available else None
+        self.local_results = 0
+        self.escalations: Dict[str, int] = {}
+        self.latency = get_latency_histogram("ocr.local")
+
+    def _new_executor(self) -> ProcessPoolExecutor:
+        return ProcessPoolExecutor(max_workers=self.workers, mp_context=multiprocessing.get_context("spawn"))
+
+    async def _read(self, content: Union[bytes, Path], mime_type: str) -> Tuple[Optional[LocalExtraction], Optional[str]]:
+        """Return (extraction, None) or (None, reason it could not be read)"""
+        if not self.available:
+            return None, "unavailable"
+        try:
+            with self.latency.time():
+                return await self.pool.submit(_extract_document, content, mime_type, timeout=self.timeout), None
+        except WorkerPoolSaturated:
+            return None, "busy"
+        except asyncio.TimeoutError:
+            return None, "timeout"
+        except BrokenProcessPool:
+            self.pool.executor.shutdown(wait=False, cancel_futures=True)
+            self.pool.executor = self._new_executor()
+            return None, "error"
+        except Exception as e:
+            print(f"⚠️ Local OCR failed: {e}")
+            return None, "error"
+
+    @staticmethod
+    def escalation_reason(extraction: LocalExtraction) -> Optional[str]:
+        if extraction.ocr_confidence < LOCAL_OCR_MIN_CONFIDENCE:
+            return "low_confidence"
+        if extraction.mapped_count < LOCAL_OCR_MIN_VALUES:
+            return "few_values"
+        return None
+
+    async def extract(self, content: Union[bytes, Path], mime_type: str, fallback: Optional[Extractor] = None) -> OCRResult:
+        extraction, reason = await self._read(content, mime_type)
+        if extraction is not None:
+            reason = self.escalation_reason(extraction)
+            if reason is None:
+                self.local_results += 1
+                return extraction.to_result()
+
+        if fallback is None:
+            # Nothing better available: return what Tesseract found, if anything
+            if extraction is not None and extraction.values:
+                self.local_results += 1
+                return extraction.to_result()
+            return OCRResult(success=False, error="Could not read the lab report", extracted_values=[])
+
+        self.escalations[reason] = self.escalations.get(reason, 0) + 1
+        return await fallback(content, mime_type)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "available": self.available,
+            "workers": self.workers if self.available else 0,
+            "local_results": self.local_results,
+            "escalations": dict(self.escalations),
+            **(self.pool.stats() if self.pool else {}),
+        }
+
+    def close(self):
+        if self.pool:
+            self.pool.shutdown()
+
+
+# ============================================
+# Singleton Instance
+# ============================================
+
+_local_ocr = None
+
+def get_local_ocr() -> LocalOCR:
+    """Get or create the local OCR singleton"""
+    global _local_ocr
+    if _local_ocr is None:
+        _local_ocr = LocalOCR()
+    return _local_ocr
+
+def local_ocr_stats() -> Optional[Dict[str, Any]]:
+    """Counters if local OCR has been used (without starting its pool)"""
+    return _local_ocr.stats() if _local_ocr is not None else None
+
+def close_local_ocr():
+    """Shut down the OCR processes (called from the app lifespan)"""
+    global _local_ocr
+    if _local_ocr is not None:
+        _local_ocr.close()
+        _local_ocr = None
+
+def lab_value_extractor() -> Extractor:
+    """
+    Extractor for the OCR endpoints: Tesseract first, Gemini Vision when the
+    local reading is not confident. Raises ValueError when neither is available.
+    """
+    from .gemini_service import get_gemini_service
+
+    local_ocr = get_local_ocr()
+    try:
+        fallback = get_gemini_service().extract_lab_values
+    except ValueError:
+        if not local_ocr.available:
+            raise
+        fallback = None
+
+    async def extract(content: Union[bytes, Path], mime_type: str) -> OCRResult:
+        return await local_ocr.extract(content, mime_type, fallback)
+    return extract
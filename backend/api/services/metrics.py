@@ -0,0 +1,100 @@
+"""
+HealthCanvas - In-Process Metrics
+Fixed-bucket latency histograms for outbound calls and background work
+"""
+
+import bisect
+import time
+from contextlib import contextmanager
+from typing import Any, Dict, Optional, Sequence
+
+# ============================================
+# Configuration
+# ============================================
+
+# Upper bounds in milliseconds; anything slower lands in the overflow bucket
+DEFAULT_LATENCY_BUCKETS_MS = (5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000, 30000, 60000)
+
+# ============================================
+# Histogram
+# ============================================
+
+class LatencyHistogram:
+    """
+    Cumulative latency histogram with fixed bucket bounds.
+
+    Counts are only ever incremented from the event loop thread, so no locking.
+    Percentiles are estimated as the upper bound of the bucket they fall in.
+    """
+
+    def __init__(self, name: str, buckets_ms: Sequence[float] = DEFAULT_LATENCY_BUCKETS_MS):
+        self.name = name
+        self.bounds = tuple(sorted(buckets_ms))
+        self.counts = [0] * (len(self.bounds) + 1)
+        self.count = 0
+        self.errors = 0
+        self.total_ms = 0.0
+        self.max_ms = 0.0
+
+    def observe(self, elapsed_ms: float, error: bool = False):
+        self.counts[bisect.bisect_left(self.bounds, elapsed_ms)] += 1
+        self.count += 1
+        self.total_ms += elapsed_ms
+        self.max_ms = max(self.max_ms, elapsed_ms)
+        if error:
+            self.errors += 1
+
+    @contextmanager
+    def time(self):
+        """Time the enclosed block; exceptions are counted as errors and re-raised"""
+        started = time.perf_counter()
+        failed = False
+        try:
+            yield
+        except BaseException:
+            failed = True
+            raise
+        finally:
+            self.observe((time.perf_counter() - started) * 1000, error=failed)
+
+    def percentile(self, q: float) -> Optional[float]:
+        if not self.count:
+            return None
+        rank = q * self.count
+        seen = 0
+        for bound, bucket_count in zip(self.bounds, self.counts):
+            seen += bucket_count
+            if seen >= rank:
+                return bound
+        return round(self.max_ms, 1)
+
+    def stats(self) -> Dict[str, Any]:
+        buckets = {f"le_{bound:g}": count for bound, count in zip(self.bounds, self.counts)}
+        buckets["overflow"] = self.counts[-1]
+        return {
+            "count": self.count,
+            "errors": self.errors,
+            "mean_ms": round(self.total_ms / self.count, 1) if self.count else None,
+            "p50_ms": self.percentile(0.50),
+            "p95_ms": self.percentile(0.95),
+            "p99_ms": self.percentile(0.99),
+            "max_ms": round(self.max_ms, 1),
+            "buckets": buckets,
+        }
+
+
+# ============================================
+# Registry
+# ============================================
+
+_histograms: Dict[str, LatencyHistogram] = {}
+
+def get_latency_histogram(name: str) -> LatencyHistogram:
+    """Get or create the named histogram (e.g. 'gemini.explain')"""
+    histogram = _histograms.get(name)
+    if histogram is None:
+        histogram = _histograms[name] = LatencyHistogram(name)
+    return histogram
+
+def latency_stats() -> Dict[str, Dict[str, Any]]:
+    return {name: histogram.stats() for name, histogram in sorted(_histograms.items())}
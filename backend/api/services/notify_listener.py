@@ -0,0 +1,128 @@
+"""
+HealthCanvas - Supervised LISTEN Connection
+A dedicated Postgres connection for NOTIFY channels that reconnects when it drops
+"""
+
+import os
+import asyncio
+from typing import Any, Awaitable, Callable, Dict, Optional
+
+# ============================================
+# Configuration
+# ============================================
+
+# Reconnect backoff doubles from the first delay up to the cap
+LISTEN_RECONNECT_INITIAL_SECONDS = float(os.getenv("LISTEN_RECONNECT_INITIAL_SECONDS", "1"))
+LISTEN_RECONNECT_MAX_SECONDS = float(os.getenv("LISTEN_RECONNECT_MAX_SECONDS", "60"))
+# A silently dead connection (no FIN from a NAT or pooler) is only noticed when used
+LISTEN_HEALTHCHECK_SECONDS = float(os.getenv("LISTEN_HEALTHCHECK_SECONDS", "30"))
+
+NotifyCallback = Callable[[Any, int, str, str], None]
+
+# ============================================
+# Listener
+# ============================================
+
+class NotifyListener:
+    """
+    Holds one LISTEN connection for a set of channels. When the connection
+    terminates (server restart, idle timeout, failed health check) it is
+    re-established with exponential backoff and every channel is listened
+    to again. Notifications sent while disconnected are lost, so
+    `on_reconnect` is called after each reconnect to let the owner resync
+    (drop a cache, reload a snapshot).
+    """
+
+    def __init__(self, name: str, channels: Dict[str, NotifyCallback],
+                 on_reconnect: Optional[Callable[[], Awaitable[None]]] = None):
+        self.name = name
+        self.channels = channels
+        self.on_reconnect = on_reconnect
+        self._connect: Optional[Callable[[], Awaitable[Any]]] = None
+        self._conn = None
+        self._supervisor: Optional[asyncio.Task] = None
+        self._lost = asyncio.Event()
+        self.reconnects = 0
+        self.disconnects = 0
+
+    @property
+    def listening(self) -> bool:
+        return self._conn is not None and not self._conn.is_closed()
+
+    async def start(self, connect: Callable[[], Awaitable[Any]]):
+        """Connect now if possible, then keep the connection up in the background"""
+        self._connect = connect
+        try:
+            await self._open()
+        except Exception as e:
+            print(f"⚠️ {self.name} LISTEN unavailable, retrying in the background: {e}")
+            self._lost.set()
+        self._supervisor = asyncio.create_task(self._supervise())
+
+    async def stop(self):
+        if self._supervisor is not None:
+            self._supervisor.cancel()
+            await asyncio.gather(self._supervisor, return_exceptions=True)
+            self._supervisor = None
+        conn, self._conn = self._conn, None
+        if conn is not None:
+            conn.remove_termination_listener(self._on_terminated)
+            await conn.close()
+
+    async def _open(self):
+        conn = await self._connect()
+        try:
+            for channel, callback in self.channels.items():
+                await conn.add_listener(channel, callback)
+        except BaseException:
+            await conn.close()
+            raise
+        conn.add_termination_listener(self._on_terminated)
+        self._conn = conn
+        self._lost.clear()
+
+    def _on_terminated(self, connection):
+        if connection is self._conn:
+            self._conn = None
+            self.disconnects += 1
+            self._lost.set()
+
+    async def _supervise(self):
+        while True:
+            try:
+                await asyncio.wait_for(self._lost.wait(), LISTEN_HEALTHCHECK_SECONDS)
+            except asyncio.TimeoutError:
+                await self._healthcheck()
+                continue
+            await self._reconnect()
+
+    async def _healthcheck(self):
+        conn = self._conn
+        if conn is None:
+            return
+        try:
+            await asyncio.wait_for(conn.execute("SELECT 1"), LISTEN_HEALTHCHECK_SECONDS)
+        except Exception:
+            # Fires the termination listener, which starts a reconnect
+            conn.terminate()
+
+    async def _reconnect(self):
+        delay = LISTEN_RECONNECT_INITIAL_SECONDS
+        while True:
+            try:
+                await self._open()
+                break
+            except Exception as e:
+                print(f"⚠️ {self.name} LISTEN reconnect failed, retrying in {delay:.0f}s: {e}")
+                await asyncio.sleep(delay)
+                delay = min(delay * 2, LISTEN_RECONNECT_MAX_SECONDS)
+        self.reconnects += 1
+        print(f"✅ {self.name} LISTEN reconnected")
+        if self.on_reconnect is not None:
+            try:
+                await self.on_reconnect()
+            except Exception as e:
+                print(f"⚠️ {self.name} resync after reconnect failed: {e}")
+
+    def stats(self) -> Dict[str, Any]:
+        return {"listening": self.listening, "disconnects": self.disconnects, "reconnects": self.reconnects}
@@ -0,0 +1,209 @@
+"""
+HealthCanvas - Lab Report OCR Pipeline
+Splits multi-file, multi-page uploads into pages and extracts them concurrently
+"""
+
+import io
+import os
+import re
+import asyncio
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, List, Optional, Tuple, Union
+
+from .gemini_service import ExtractedLabValue, OCRResult
+
+# pdf2image (with poppler) splits PDFs into page images; without it a PDF is sent whole
+try:
+    from pdf2image import convert_from_path, pdfinfo_from_path
+    PDF2IMAGE_AVAILABLE = True
+except ImportError:
+    PDF2IMAGE_AVAILABLE = False
+
+# ============================================
+# Configuration
+# ============================================
+
+OCR_ALLOWED_TYPES = ('application/pdf', 'image/jpeg', 'image/png', 'image/webp')
+OCR_MAX_FILE_BYTES = 10 * 1024 * 1024
+OCR_MAX_FILES = int(os.getenv("OCR_MAX_FILES", "10"))
+OCR_PAGE_CONCURRENCY = int(os.getenv("OCR_PAGE_CONCURRENCY", "4"))
+OCR_MAX_PAGES = int(os.getenv("OCR_MAX_PAGES", "30"))
+OCR_PDF_DPI = int(os.getenv("OCR_PDF_DPI", "200"))
+OCR_PAGE_JPEG_QUALITY = 85
+
+# ============================================
+# Pages
+# ============================================
+
+@dataclass
+class PageSource:
+    """One page to extract; PDF pages are rasterised lazily, inside a concurrency slot"""
+    file_index: int
+    filename: str
+    page: int  # 1-based within its file
+    mime_type: str
+    content: Path  # the spooled upload: the whole file for PDF pages, else the image itself
+    rasterize: bool = False
+
+    async def load(self) -> Tuple[Union[bytes, Path], str]:
+        if not self.rasterize:
+            return self.content, self.mime_type
+        return await asyncio.to_thread(_render_pdf_page, self.content, self.page), "image/jpeg"
+
+
+def _render_pdf_page(content: Path, page: int) -> bytes:
+    images = convert_from_path(str(content), dpi=OCR_PDF_DPI, first_page=page, last_page=page)
+    buffer = io.BytesIO()
+    images[0].convert("RGB").save(buffer, format="JPEG", quality=OCR_PAGE_JPEG_QUALITY)
+    return buffer.getvalue()
+
+def _pdf_page_count(content: Path) -> int:
+    return int(pdfinfo_from_path(str(content))["Pages"])
+
+async def split_pages(files: List[Tuple[str, str, Path]], max_pages: int = OCR_MAX_PAGES) -> List[PageSource]:
+    """
+    Expand (filename, mime_type, spooled path) uploads into pages. Raises
+    ValueError when the upload has more than max_pages pages in total.
+    """
+    pages: List[PageSource] = []
+    for file_index, (filename, mime_type, content) in enumerate(files):
+        if mime_type == "application/pdf" and PDF2IMAGE_AVAILABLE:
+            page_count = await asyncio.to_thread(_pdf_page_count, content)
+            pages.extend(
+                PageSource(file_index, filename, page, mime_type, content, rasterize=True)
+                for page in range(1, page_count + 1)
+            )
+        else:
+            pages.append(PageSource(file_index, filename, 1, mime_type, content))
+
+        if len(pages) > max_pages:
+            raise ValueError(f"Too many pages (max {max_pages})")
+    return pages
+
+# ============================================
+# Merging
+# ============================================
+
+def _normalize(text: Optional[str]) -> str:
+    return re.sub(r"\s+", " ", (text or "")).strip().casefold()
+
+def extracted_value_dict(value: ExtractedLabValue) -> Dict[str, Any]:
+    return {
+        "test_name": value.test_name,
+        "value": value.value,
+        "unit": value.unit,
+        "reference_range": value.reference_range,
+        "flag": value.flag,
+        "confidence": value.confidence,
+        "mapped_biomarker_id": value.mapped_biomarker_id
+    }
+
+
+@dataclass
+class MergedValue:
+    value: ExtractedLabValue
+    sources: List[Dict[str, int]] = field(default_factory=list)
+
+
+class ExtractionMerger:
+    """
+    Combines page results in page order, whatever order they finished in.
+    The same test with the same value and unit on several pages (repeated
+    summary tables, overlapping scans) is kept once, taking the most confident
+    reading and filling in a missing range or flag from the others.
+    """
+
+    def __init__(self):
+        self._pages: Dict[Tuple[int, int], OCRResult] = {}
+
+    def add(self, page: PageSource, result: OCRResult):
+        self._pages[(page.file_index, page.page)] = result
+
+    def merge(self) -> Dict[str, Any]:
+        merged: Dict[tuple, MergedValue] = {}
+        lab_name = report_date = None
+        for (file_index, page), result in sorted(self._pages.items()):
+            if not result.success:
+                continue
+            lab_name = lab_name or result.lab_name
+            report_date = report_date or result.report_date
+            for value in result.extracted_values or []:
+                key = (
+                    value.mapped_biomarker_id or _normalize(value.test_name),
+                    _normalize(value.unit),
+                    round(value.value, 6)
+                )
+                entry = merged.get(key)
+                if entry is None:
+                    entry = merged[key] = MergedValue(value)
+                else:
+                    kept = entry.value
+                    if value.confidence > kept.confidence:
+                        value.reference_range = value.reference_range or kept.reference_range
+                        value.flag = value.flag or kept.flag
+                        entry.value = value
+                    else:
+                        kept.reference_range = kept.reference_range or value.reference_range
+                        kept.flag = kept.flag or value.flag
+                entry.sources.append({"file": file_index, "page": page})
+
+        values = [
+            {**extracted_value_dict(entry.value), "sources": entry.sources}
+            for entry in merged.values()
+        ]
+        return {
+            "lab_name": lab_name,
+            "report_date": report_date,
+            "extracted_values": values,
+            "unmapped_count": sum(1 for v in values if not v["mapped_biomarker_id"]),
+        }
+
+# ============================================
+# Pipeline
+# ============================================
+
+Extractor = Callable[[Union[bytes, Path], str], Awaitable[OCRResult]]
+
+async def extract_pages(pages: List[PageSource], extract: Extractor,
+                        concurrency: int = OCR_PAGE_CONCURRENCY) -> AsyncIterator[Dict[str, Any]]:
+    """
+    Extract every page with at most `concurrency` in flight. Yields a `start`
+    event, a `page` event per page as it finishes, and a final `summary`
+    event with the merged values. Closing the iterator early cancels
+    unfinished pages.
+    """
+    semaphore = asyncio.Semaphore(max(1, concurrency))
+    merger = ExtractionMerger()
+
+    async def run(page: PageSource) -> Tuple[PageSource, OCRResult]:
+        async with semaphore:
+            try:
+                content, mime_type = await page.load()
+                result = await extract(content, mime_type)
+            except Exception as e:
+                result = OCRResult(success=False, error=str(e))
+        return page, result
+
+    yield {"type": "start", "pages": len(pages)}
+    tasks = [asyncio.ensure_future(run(page)) for page in pages]
+    failed = 0
+    try:
+        for next_done in asyncio.as_completed(tasks):
+            page, result = await next_done
+            merger.add(page, result)
+            failed += not result.success
+            yield {
+                "type": "page",
+                "file": page.file_index,
+                "filename": page.filename,
+                "page": page.page,
+                "success": result.success,
+                "error": result.error,
+                "extracted_values": [extracted_value_dict(v) for v in result.extracted_values or []],
+            }
+    finally:
+        for task in tasks:
+            task.cancel()
+
+    yield {"type": "summary", "pages": len(pages), "failed_pages": failed, **merger.merge()}
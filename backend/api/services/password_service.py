@@ -0,0 +1,130 @@
+"""
+HealthCanvas - Password Hashing Service
+Salted, self-describing PBKDF2 hashes computed in a bounded worker pool
+"""
+
+import os
+import base64
+import hashlib
+import hmac
+import secrets
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from typing import Dict
+
+from .worker_pool import BoundedWorkerPool
+
+# ============================================
+# Configuration
+# ============================================
+
+PASSWORD_HASH_SCHEME = "pbkdf2_sha256"
+PASSWORD_HASH_ITERATIONS = int(os.getenv("PASSWORD_HASH_ITERATIONS", "100000"))
+PASSWORD_SALT_BYTES = 16
+PASSWORD_HASH_WORKERS = int(os.getenv("PASSWORD_HASH_WORKERS", str(min(4, os.cpu_count() or 1))))
+PASSWORD_HASH_MAX_PENDING = int(os.getenv("PASSWORD_HASH_MAX_PENDING", "64"))
+
+# Hashes written before per-user salts: hex digest with a shared static salt
+LEGACY_SALT = b'healthcanvas_salt'
+LEGACY_ITERATIONS = 100000
+
+# ============================================
+# Hash Format
+# ============================================
+
+@dataclass
+class PasswordCheck:
+    valid: bool
+    needs_rehash: bool = False
+
+
+def _b64encode(data: bytes) -> str:
+    return base64.b64encode(data).decode('ascii').rstrip('=')
+
+
+def _b64decode(data: str) -> bytes:
+    return base64.b64decode(data + '=' * (-len(data) % 4))
+
+
+def _pbkdf2(password: str, salt: bytes, iterations: int) -> bytes:
+    return hashlib.pbkdf2_hmac('sha256', password.encode(), salt, iterations)
+
+
+def hash_password_sync(password: str, iterations: int = PASSWORD_HASH_ITERATIONS) -> str:
+    """
+    Hash a password with a fresh random salt.
+
+    Format: pbkdf2_sha256$<iterations>$<salt>$<digest> (base64, unpadded)
+    """
+    salt = secrets.token_bytes(PASSWORD_SALT_BYTES)
+    digest = _pbkdf2(password, salt, iterations)
+    return f"{PASSWORD_HASH_SCHEME}${iterations}${_b64encode(salt)}${_b64encode(digest)}"
+
+
+def verify_password_sync(password: str, stored_hash: str) -> PasswordCheck:
+    """Check a password and report whether the stored hash should be upgraded"""
+    if not stored_hash:
+        return PasswordCheck(valid=False)
+
+    if stored_hash.startswith(PASSWORD_HASH_SCHEME + "$"):
+        try:
+            _, iterations, salt, digest = stored_hash.split("$")
+            iterations = int(iterations)
+            salt = _b64decode(salt)
+            expected = _b64decode(digest)
+        except (ValueError, TypeError):
+            return PasswordCheck(valid=False)
+
+        valid = hmac.compare_digest(_pbkdf2(password, salt, iterations), expected)
+        needs_rehash = iterations != PASSWORD_HASH_ITERATIONS or len(salt) < PASSWORD_SALT_BYTES
+        return PasswordCheck(valid=valid, needs_rehash=valid and needs_rehash)
+
+    # Legacy static-salt hex digest
+    computed = _pbkdf2(password, LEGACY_SALT, LEGACY_ITERATIONS).hex()
+    valid = hmac.compare_digest(computed, stored_hash)
+    return PasswordCheck(valid=valid, needs_rehash=valid)
+
+# ============================================
+# Async Hasher
+# ============================================
+
+class PasswordHasher:
+    """Runs KDF work in a dedicated, size-limited thread pool"""
+
+    def __init__(self, workers: int = PASSWORD_HASH_WORKERS, max_pending: int = PASSWORD_HASH_MAX_PENDING):
+        # hashlib.pbkdf2_hmac releases the GIL, so threads give real parallelism
+        executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="password-hash")
+        self.pool = BoundedWorkerPool("password-hash", executor, max_pending)
+
+    async def hash(self, password: str) -> str:
+        return await self.pool.submit(hash_password_sync, password)
+
+    async def verify(self, password: str, stored_hash: str) -> PasswordCheck:
+        return await self.pool.submit(verify_password_sync, password, stored_hash)
+
+    def stats(self) -> Dict[str, int]:
+        return self.pool.stats()
+
+    def close(self):
+        self.pool.shutdown()
+
+
+# ============================================
+# Singleton Instance
+# ============================================
+
+_password_hasher = None
+
+def get_password_hasher() -> PasswordHasher:
+    """Get or create the password hasher singleton"""
+    global _password_hasher
+    if _password_hasher is None:
+        _password_hasher = PasswordHasher()
+    return _password_hasher
+
+def close_password_hasher():
+    """Shut down the hashing pool (called from the app lifespan)"""
+    global _password_hasher
+    if _password_hasher is not None:
+        _password_hasher.close()
+        _password_hasher = None
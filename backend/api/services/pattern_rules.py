@@ -0,0 +1,405 @@
+"""
+HealthCanvas - Pattern Rules
+Compiles pattern_rules into a vectorized evaluator over a users x biomarkers matrix
+"""
+
+import os
+import json
+import asyncio
+import hashlib
+import time
+import uuid
+from dataclasses import dataclass
+from datetime import timedelta
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+# ============================================
+# Configuration
+# ============================================
+
+PATTERN_RULES_REFRESH_SECONDS = float(os.getenv("PATTERN_RULES_REFRESH_SECONDS", "300"))
+# Users fetched, evaluated and committed per sweep batch
+PATTERN_BATCH_USERS = int(os.getenv("PATTERN_BATCH_USERS", "2000"))
+# How often users whose data changed are re-evaluated (0 = only via maintenance.py)
+PATTERN_SWEEP_SECONDS = float(os.getenv("PATTERN_SWEEP_SECONDS", "60"))
+# Resolved alerts are kept this long, then deleted by the sweep
+PATTERN_ALERT_RETENTION_DAYS = int(os.getenv("PATTERN_ALERT_RETENTION_DAYS", "90"))
+# Re-sweep this far behind the watermark so versions committed late are not skipped
+PATTERN_SWEEP_OVERLAP = timedelta(seconds=10)
+# Session advisory lock held by whichever process is sweeping
+PATTERN_SWEEP_LOCK = "pattern_sweep"
+
+_RULE_COLUMNS = ("id", "name", "description", "severity", "conditions", "min_matches", "markers")
+_OPERATORS = {">": np.greater, ">=": np.greater_equal, "<": np.less, "<=": np.less_equal}
+# Keyset start for sweep pages; sorts before every user id
+_FIRST_USER_ID = uuid.UUID(int=0)
+
+# ============================================
+# Rules
+# ============================================
+
+@dataclass(frozen=True)
+class PatternRule:
+    id: str
+    name: str
+    description: Optional[str]
+    severity: str
+    conditions: Tuple[Tuple[str, str, float], ...]  # (biomarker, op, threshold)
+    min_matches: int
+    markers: Tuple[str, ...]
+
+    @classmethod
+    def from_row(cls, row) -> "PatternRule":
+        conditions = row['conditions']
+        if isinstance(conditions, str):
+            conditions = json.loads(conditions)
+        parsed = []
+        for condition in conditions:
+            if condition['op'] not in _OPERATORS:
+                raise ValueError(f"unknown operator {condition['op']!r}")
+            parsed.append((condition['biomarker'], condition['op'], float(condition['value'])))
+        if not parsed:
+            raise ValueError("no conditions")
+        return cls(
+            id=row['id'],
+            name=row['name'],
+            description=row['description'],
+            severity=row['severity'],
+            conditions=tuple(parsed),
+            min_matches=min(row['min_matches'] or len(parsed), len(parsed)),
+            markers=tuple(row['markers'] or dict.fromkeys(b for b, _, _ in parsed)),
+        )
+
+    def alert(self) -> Dict[str, Any]:
+        """The dashboard's pattern alert shape"""
+        return {
+            'type': self.severity,
+            'name': self.name,
+            'description': self.description,
+            'markers': list(self.markers),
+        }
+
+
+class CompiledRules:
+    """
+    Rules flattened into arrays once: every condition becomes a (column,
+    threshold) pair, grouped by operator into contiguous slices, and an
+    incidence matrix maps conditions to rules. Evaluating a matrix of latest
+    values (NaN where a user has none) is then one comparison per operator
+    and one matrix product, for one user or a whole batch alike. NaN never
+    compares true, so a missing value never satisfies a condition.
+    """
+
+    def __init__(self, rules: Sequence[PatternRule]):
+        self.rules = list(rules)
+        biomarkers = sorted({b for rule in self.rules for b, _, _ in rule.conditions})
+        self.columns: Dict[str, int] = {b: i for i, b in enumerate(biomarkers)}
+
+        conditions = sorted(
+            (op, self.columns[b], threshold, r)
+            for r, rule in enumerate(self.rules)
+            for b, op, threshold in rule.conditions
+        )
+        self.incidence = np.zeros((len(conditions), len(self.rules)), dtype=np.int32)
+        for i, (_, _, _, r) in enumerate(conditions):
+            self.incidence[i, r] = 1
+        self.required = np.array([rule.min_matches for rule in self.rules], dtype=np.int32)
+
+        # (comparison, condition slice, value columns, thresholds) per operator
+        self._groups = []
+        start = 0
+        for op in sorted({c[0] for c in conditions}):
+            end = start + sum(1 for c in conditions if c[0] == op)
+            group = conditions[start:end]
+            self._groups.append((
+                _OPERATORS[op],
+                slice(start, end),
+                np.array([c[1] for c in group], dtype=np.intp),
+                np.array([c[2] for c in group], dtype=np.float64),
+            ))
+            start = end
+
+    def empty_matrix(self, users: int) -> np.ndarray:
+        return np.full((users, len(self.columns)), np.nan)
+
+    def evaluate_matrix(self, values: np.ndarray) -> np.ndarray:
+        """Boolean users x rules matrix of matching rules"""
+        hits = np.empty((values.shape[0], self.incidence.shape[0]), dtype=np.int32)
+        for compare, conditions, columns, thresholds in self._groups:
+            hits[:, conditions] = compare(values[:, columns], thresholds)
+        return hits @ self.incidence >= self.required
+
+# ============================================
+# Engine
+# ============================================
+
+class PatternEngine:
+    """
+    Holds the compiled active rules, reloaded from pattern_rules at startup
+    and periodically (recompiled only when the rules changed), and keeps
+    pattern_alerts current with a background sweep.
+
+    Each sweep re-evaluates the users whose user_data_versions row changed
+    since the watermark stored in pattern_sweep_state, in keyset-paginated
+    batches that each commit on their own. Every user is re-evaluated when
+    the rules differ from the ones the last sweep used; rules are reloaded
+    before comparing, so a process that has not picked up a change yet
+    cannot mistake it for a revert. The sweeper holds a session advisory
+    lock, so with several API workers one sweeps and the others skip that
+    round.
+    """
+
+    def __init__(self):
+        self.compiled = CompiledRules([])
+        self._rows: List[Tuple] = []
+        self._pool = None
+        self._refresh_task: Optional[asyncio.Task] = None
+        self._sweep_task: Optional[asyncio.Task] = None
+        self.rules_hash = ""
+        self.compiles = 0
+        self.sweeps = 0
+        self.last_sweep: Optional[Dict[str, Any]] = None
+        self.users_evaluated = 0
+        self.alerts_opened = 0
+        self.alerts_resolved = 0
+        self.skipped_rules: List[str] = []
+
+    # ----- loading -----
+
+    def load(self, rows: Iterable[Any]):
+        rows = [tuple(row[column] for column in _RULE_COLUMNS) for row in rows]
+        if rows == self._rows and self.compiles:
+            return
+        rules, skipped = [], []
+        for row in rows:
+            try:
+                rules.append(PatternRule.from_row(dict(zip(_RULE_COLUMNS, row))))
+            except (KeyError, TypeError, ValueError) as e:
+                print(f"⚠️ Skipping pattern rule {row[0]}: {e}")
+                skipped.append(row[0])
+        self.compiled = CompiledRules(rules)
+        self._rows, self.skipped_rules = rows, skipped
+        self.rules_hash = hashlib.sha1(repr(rows).encode()).hexdigest()[:20]
+        self.compiles += 1
+
+    async def reload(self):
+        async with self._pool.acquire() as conn:
+            rows = await conn.fetch(
+                f"SELECT {', '.join(_RULE_COLUMNS)} FROM pattern_rules WHERE is_active = TRUE ORDER BY id"
+            )
+        self.load(rows)
+
+    async def start(self, pool, sweep: bool = True):
+        self._pool = pool
+        await self.reload()
+        if PATTERN_RULES_REFRESH_SECONDS > 0:
+            self._refresh_task = asyncio.create_task(self._periodic_refresh())
+        if sweep and PATTERN_SWEEP_SECONDS > 0:
+            self._sweep_task = asyncio.create_task(self._periodic_sweep())
+
+    async def stop(self):
+        for task in (self._refresh_task, self._sweep_task):
+            if task:
+                task.cancel()
+        self._refresh_task = self._sweep_task = None
+
+    async def _periodic_refresh(self):
+        while True:
+            await asyncio.sleep(PATTERN_RULES_REFRESH_SECONDS)
+            try:
+                await self.reload()
+            except Exception as e:
+                print(f"⚠️ Pattern rule reload failed: {e}")
+
+    # ----- persisting -----
+
+    async def evaluate_users(self, conn, user_ids: Sequence) -> Tuple[int, int]:
+        """
+        Evaluate the given users in one pass and bring their pattern_alerts
+        up to date: new matches open an alert (open alerts take the rule's
+        current wording), alerts whose rule no longer matches are resolved
+        and expire after the retention period. Returns (opened, resolved).
+        """
+        compiled = self.compiled
+        if not user_ids:
+            return 0, 0
+
+        values = compiled.empty_matrix(len(user_ids))
+        if compiled.columns:
+            rows = await conn.fetch(
+                """
+                SELECT user_id, biomarker_id, value
+                FROM latest_observations
+                WHERE user_id = ANY($1::uuid[]) AND biomarker_id = ANY($2::varchar[])
+                """,
+                list(user_ids), list(compiled.columns)
+            )
+            if rows:
+                user_index = {user_id: i for i, user_id in enumerate(user_ids)}
+                values[
+                    np.fromiter((user_index[row['user_id']] for row in rows), dtype=np.intp, count=len(rows)),
+                    np.fromiter((compiled.columns[row['biomarker_id']] for row in rows), dtype=np.intp, count=len(rows)),
+                ] = np.fromiter((row['value'] for row in rows), dtype=np.float64, count=len(rows))
+
+        matches = compiled.evaluate_matrix(values) if compiled.rules else np.zeros((len(user_ids), 0), dtype=bool)
+        users, rules = np.nonzero(matches)
+
+        async with conn.transaction():
+            resolved = await conn.fetchval(
+                """
+                WITH resolved AS (
+                    UPDATE pattern_alerts a
+                    SET status = 'resolved', resolved_at = NOW(), expires_at = NOW() + $4 * INTERVAL '1 day'
+                    WHERE a.user_id = ANY($1::uuid[])
+                      AND a.status IN ('active', 'dismissed')
+                      AND NOT EXISTS (
+                          SELECT 1 FROM unnest($2::uuid[], $3::varchar[]) AS m(user_id, alert_type)
+                          WHERE m.user_id = a.user_id AND m.alert_type = a.alert_type
+                      )
+                    RETURNING 1
+                )
+                SELECT COUNT(*) FROM resolved
+                """,
+                list(user_ids), [user_ids[u] for u in users], [compiled.rules[r].id for r in rules],
+                PATTERN_ALERT_RETENTION_DAYS
+            )
+            opened = 0
+            for r in np.flatnonzero(matches.any(axis=0)):
+                rule = compiled.rules[r]
+                opened += await conn.fetchval(
+                    """
+                    WITH upserted AS (
+                        INSERT INTO pattern_alerts (user_id, alert_type, severity, title, description, related_markers)
+                        SELECT u, $2, $3, $4, $5, $6 FROM unnest($1::uuid[]) AS u
+                        ON CONFLICT (user_id, alert_type) WHERE status IN ('active', 'dismissed') DO UPDATE
+                        SET severity = EXCLUDED.severity, title = EXCLUDED.title,
+                            description = EXCLUDED.description, related_markers = EXCLUDED.related_markers
+                        WHERE (pattern_alerts.severity, pattern_alerts.title, pattern_alerts.description, pattern_alerts.related_markers)
+                              IS DISTINCT FROM (EXCLUDED.severity, EXCLUDED.title, EXCLUDED.description, EXCLUDED.related_markers)
+                        RETURNING xmax = 0 AS inserted
+                    )
+                    SELECT COUNT(*) FILTER (WHERE inserted) FROM upserted
+                    """,
+                    [user_ids[u] for u in np.flatnonzero(matches[:, r])],
+                    rule.id, rule.severity, rule.name, rule.description, list(rule.markers)
+                )
+
+        self.users_evaluated += len(user_ids)
+        self.alerts_opened += opened
+        self.alerts_resolved += resolved
+        return opened, resolved
+
+    async def _evaluate_pages(self, conn, query: str, *args) -> Dict[str, int]:
+        """
+        Evaluate the user ids a keyset query returns ($1 = last id seen,
+        $2 = page size, ordered by id). Each page is written in its own
+        transaction, so no snapshot or lock is held from one batch to the next.
+        """
+        totals = {"users": 0, "opened": 0, "resolved": 0}
+        after = _FIRST_USER_ID
+        while rows := await conn.fetch(query, after, PATTERN_BATCH_USERS, *args):
+            opened, resolved = await self.evaluate_users(conn, [row[0] for row in rows])
+            totals["users"] += len(rows)
+            totals["opened"] += opened
+            totals["resolved"] += resolved
+            after = rows[-1][0]
+        return totals
+
+    async def sweep(self, full: bool = False) -> Optional[Dict[str, Any]]:
+        """
+        Re-evaluate users whose data changed since the last sweep (every
+        user when `full` or the rules changed) and delete expired alerts.
+        Returns the sweep's counts and throughput, or None when another
+        process is sweeping.
+        """
+        started = time.perf_counter()
+        await self.reload()
+        # Batches may pick up a later reload; storing this hash re-sweeps in full if so
+        rules_hash = self.rules_hash
+        async with self._pool.acquire() as conn:
+            if not await conn.fetchval("SELECT pg_try_advisory_lock(hashtext($1))", PATTERN_SWEEP_LOCK):
+                return None
+            try:
+                state = await conn.fetchrow("SELECT watermark, rules_hash FROM pattern_sweep_state")
+                full = full or state['watermark'] is None or state['rules_hash'] != rules_hash
+                upto = await conn.fetchval("SELECT MAX(updated_at) FROM user_data_versions")
+                if full:
+                    totals = await self._evaluate_pages(
+                        conn,
+                        "SELECT id FROM users WHERE deleted_at IS NULL AND id > $1 ORDER BY id LIMIT $2"
+                    )
+                else:
+                    totals = await self._evaluate_pages(
+                        conn,
+                        """
+                        SELECT v.user_id FROM user_data_versions v
+                        JOIN users u ON u.id = v.user_id AND u.deleted_at IS NULL
+                        WHERE v.user_id > $1 AND v.updated_at > $3 AND v.updated_at <= $4
+                        ORDER BY v.user_id
+                        LIMIT $2
+                        """,
+                        state['watermark'] - PATTERN_SWEEP_OVERLAP, upto
+                    )
+                totals["expired"] = await conn.fetchval(
+                    """
+                    WITH expired AS (DELETE FROM pattern_alerts WHERE expires_at < NOW() RETURNING 1)
+                    SELECT COUNT(*) FROM expired
+                    """
+                )
+                # Only advanced once every batch is in; an interrupted sweep is redone
+                await conn.execute(
+                    """
+                    UPDATE pattern_sweep_state
+                    SET watermark = COALESCE($1, watermark, NOW()), rules_hash = $2, swept_at = NOW()
+                    """,
+                    upto, rules_hash
+                )
+            finally:
+                await conn.execute("SELECT pg_advisory_unlock(hashtext($1))", PATTERN_SWEEP_LOCK)
+
+        elapsed = time.perf_counter() - started
+        self.sweeps += 1
+        self.last_sweep = {
+            **totals,
+            "full": full,
+            "seconds": round(elapsed, 3),
+            "users_per_second": round(totals["users"] / elapsed, 1) if elapsed > 0 else None,
+        }
+        return self.last_sweep
+
+    async def _periodic_sweep(self):
+        while True:
+            try:
+                await self.sweep()
+            except Exception as e:
+                print(f"⚠️ Pattern alert sweep failed: {e}")
+            await asyncio.sleep(PATTERN_SWEEP_SECONDS)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "rules": len(self.compiled.rules),
+            "conditions": int(self.compiled.incidence.shape[0]),
+            "biomarkers": len(self.compiled.columns),
+            "skipped_rules": self.skipped_rules,
+            "compiles": self.compiles,
+            "users_evaluated": self.users_evaluated,
+            "alerts_opened": self.alerts_opened,
+            "alerts_resolved": self.alerts_resolved,
+            "sweeps": self.sweeps,
+            "last_sweep": self.last_sweep,
+        }
+
+# ============================================
+# Singleton Instance
+# ============================================
+
+_pattern_engine = None
+
+def get_pattern_engine() -> PatternEngine:
+    """Get or create the pattern engine singleton"""
+    global _pattern_engine
+    if _pattern_engine is None:
+        _pattern_engine = PatternEngine()
+    return _pattern_engine
@@ -0,0 +1,201 @@
+"""
+HealthCanvas - PDF Artifact Cache
+Rendered reports on disk, keyed by (user, data version, template version)
+"""
+
+import os
+import time
+import shutil
+import hashlib
+import tempfile
+from typing import Any, BinaryIO, Dict, Iterator, Optional
+
+from .pdf_service import PDF_RENDER_DIR, PDF_STREAM_CHUNK_SIZE, TEMPLATE_VERSION
+
+# ============================================
+# Configuration
+# ============================================
+
+PDF_CACHE_DIR = os.getenv("PDF_CACHE_DIR") or os.path.join(PDF_RENDER_DIR, "healthcanvas-pdf-cache")
+# 0 disables the cache
+PDF_CACHE_MAX_AGE_SECONDS = float(os.getenv("PDF_CACHE_MAX_AGE_SECONDS", str(7 * 24 * 3600)))
+
+# ============================================
+# Cache Entries
+# ============================================
+
+class CachedPDF:
+    """
+    An open cache entry. The handle stays readable if the entry is replaced
+    or pruned while it streams.
+    """
+
+    def __init__(self, file: BinaryIO, etag: str):
+        self.file = file
+        self.etag = etag
+        self.size = os.fstat(file.fileno()).st_size
+
+    def iter_range(self, start: int = 0, end: Optional[int] = None,
+                   chunk_size: int = PDF_STREAM_CHUNK_SIZE) -> Iterator[bytes]:
+        """Yield bytes start..end (inclusive), then close the file"""
+        remaining = (self.size if end is None else end + 1) - start
+        try:
+            self.file.seek(start)
+            while remaining > 0:
+                chunk = self.file.read(min(chunk_size, remaining))
+                if not chunk:
+                    break
+                remaining -= len(chunk)
+                yield chunk
+        finally:
+            self.file.close()
+
+    def close(self):
+        self.file.close()
+
+
+def _remove(path: str):
+    try:
+        os.unlink(path)
+    except FileNotFoundError:
+        pass
+
+# ============================================
+# PDF Artifact Cache
+# ============================================
+
+class PDFArtifactCache:
+    """
+    One file per (user, report kind): `<dir>/<user_id>/<kind>-<key>.pdf`.
+
+    The key hashes the template version, the user's data version (bumped by
+    triggers on every write to observations, medications, conditions and
+    allergies) and anything else printed in the report, so an entry never
+    goes stale - a data change simply produces a new key, and storing it
+    prunes the user's previous file of that kind. The key doubles as a strong
+    ETag since a given key always maps to the same bytes.
+
+    The directory may be shared by every API worker on a host: entries are
+    written to a temp file and renamed into place.
+    """
+
+    def __init__(self, directory: str = PDF_CACHE_DIR, max_age: float = PDF_CACHE_MAX_AGE_SECONDS):
+        self.directory = directory
+        self.max_age = max_age
+        self.hits = 0
+        self.misses = 0
+        self.stores = 0
+        self.errors = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_age > 0
+
+    @staticmethod
+    def key(kind: str, user_id, data_version: int, *parts: Any) -> str:
+        material = "\x1f".join(str(part) for part in (kind, TEMPLATE_VERSION, user_id, data_version, *parts))
+        return hashlib.sha256(material.encode("utf-8")).hexdigest()
+
+    @staticmethod
+    def etag(key: str) -> str:
+        return f'"{key[:32]}"'
+
+    def _path(self, user_id, kind: str, key: str) -> str:
+        return os.path.join(self.directory, str(user_id), f"{kind}-{key}.pdf")
+
+    def open(self, user_id, kind: str, key: str) -> Optional[CachedPDF]:
+        """Open a cached report, or None on a miss"""
+        if not self.enabled:
+            return None
+        path = self._path(user_id, kind, key)
+        try:
+            file = open(path, "rb")
+        except FileNotFoundError:
+            self.misses += 1
+            return None
+
+        if time.time() - os.fstat(file.fileno()).st_mtime > self.max_age:
+            # Reports print their generation date; don't serve very old ones
+            file.close()
+            _remove(path)
+            self.misses += 1
+            return None
+
+        self.hits += 1
+        return CachedPDF(file, self.etag(key))
+
+    def put(self, user_id, kind: str, key: str, source: BinaryIO):
+        """
+        Copy a rendered report into the cache and prune the user's older
+        entries of the same kind. Failures are logged; the caller still has
+        its own copy to serve. `source` is rewound afterwards.
+        """
+        if not self.enabled:
+            return
+        path = self._path(user_id, kind, key)
+        user_dir = os.path.dirname(path)
+        try:
+            os.makedirs(user_dir, exist_ok=True)
+            fd, tmp_path = tempfile.mkstemp(dir=user_dir, suffix=".tmp")
+            try:
+                with os.fdopen(fd, "wb") as out:
+                    shutil.copyfileobj(source, out)
+                os.replace(tmp_path, path)
+            except BaseException:
+                _remove(tmp_path)
+                raise
+            finally:
+                source.seek(0)
+            self.stores += 1
+
+            current = os.path.basename(path)
+            for name in os.listdir(user_dir):
+                if name.startswith(f"{kind}-") and name.endswith(".pdf") and name != current:
+                    _remove(os.path.join(user_dir, name))
+        except OSError as e:
+            self.errors += 1
+            print(f"⚠️ PDF cache write failed: {e}")
+
+    def purge(self, max_age: Optional[float] = None) -> int:
+        """Delete entries older than max_age (default: the configured age); returns files removed"""
+        max_age = self.max_age if max_age is None else max_age
+        cutoff = time.time() - max_age
+        removed = 0
+        if not os.path.isdir(self.directory):
+            return 0
+        for user_entry in os.scandir(self.directory):
+            if not user_entry.is_dir():
+                continue
+            for entry in os.scandir(user_entry.path):
+                # Also sweeps temp files left behind by a crashed writer
+                if entry.stat().st_mtime < cutoff:
+                    _remove(entry.path)
+                    removed += 1
+            try:
+                os.rmdir(user_entry.path)
+            except OSError:
+                pass  # Not empty
+        return removed
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "enabled": self.enabled,
+            "hits": self.hits,
+            "misses": self.misses,
+            "stores": self.stores,
+            "errors": self.errors,
+        }
+
+
+# ============================================
+# Singleton Instance
+# ============================================
+
+_pdf_artifact_cache = None
+
+def get_pdf_artifact_cache() -> PDFArtifactCache:
+    """Get or create the PDF artifact cache singleton"""
+    global _pdf_artifact_cache
+    if _pdf_artifact_cache is None:
+        _pdf_artifact_cache = PDFArtifactCache()
+    return _pdf_artifact_cache
@@ -4,107 +4,255 @@ Generates professional PDF reports for visit summaries and health exports
 """
 
 import io
+import os
+import copy
+import uuid
+import tempfile
+import threading
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
 from datetime import datetime
-from typing import List, Dict, Optional
+from typing import Any, BinaryIO, Callable, Iterator, List, Dict, Optional, Union
 from reportlab.lib import colors
 from reportlab.lib.pagesizes import A4, letter
-from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
+from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle, StyleSheet1
 from reportlab.lib.units import inch, mm
 from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer, Table, TableStyle, Image, HRFlowable
 from reportlab.lib.enums import TA_CENTER, TA_LEFT, TA_RIGHT
 
+from .worker_pool import BoundedWorkerPool
+
+# ============================================
+# Configuration
+# ============================================
+
+PDF_RENDER_WORKERS = int(os.getenv("PDF_RENDER_WORKERS", str(min(2, os.cpu_count() or 1))))
+PDF_RENDER_MAX_PENDING = int(os.getenv("PDF_RENDER_MAX_PENDING", "8"))
+PDF_RENDER_TIMEOUT_SECONDS = float(os.getenv("PDF_RENDER_TIMEOUT_SECONDS", "30"))
+PDF_RENDER_RETRY_AFTER = int(os.getenv("PDF_RENDER_RETRY_AFTER", "5"))
+PDF_RENDER_DIR = os.getenv("PDF_RENDER_DIR") or tempfile.gettempdir()
+PDF_STREAM_CHUNK_SIZE = 64 * 1024
+
+# Bump whenever the layout or wording of a generated report changes;
+# cached PDFs are keyed by it
+TEMPLATE_VERSION = 1
+
+
+# ============================================
+# Compiled Templates
+# ============================================
+# Static document parts are built once per process at import time (each
+# render worker compiles its own). Styles and TableStyles are only read
+# during a build, so renders in any thread share them.
+
+def _add_style(sheet: StyleSheet1, style: ParagraphStyle):
+    # 'Title' and 'BodyText' already exist in the sample sheet; ours replace them
+    if style.name in sheet:
+        sheet.byName[style.name] = style
+    else:
+        sheet.add(style)
+
+def _compile_stylesheet() -> StyleSheet1:
+    sheet = getSampleStyleSheet()
+    
+    _add_style(sheet, ParagraphStyle(
+        name='Title',
+        parent=sheet['Heading1'],
+        fontSize=24,
+        spaceAfter=30,
+        textColor=colors.HexColor('#0EA5E9'),
+        alignment=TA_CENTER
+    ))
+    
+    _add_style(sheet, ParagraphStyle(
+        name='SectionHeader',
+        parent=sheet['Heading2'],
+        fontSize=14,
+        spaceBefore=20,
+        spaceAfter=10,
+        textColor=colors.HexColor('#1E293B'),
+        borderColor=colors.HexColor('#E2E8F0'),
+        borderWidth=1,
+        borderPadding=5
+    ))
+    
+    _add_style(sheet, ParagraphStyle(
+        name='SubHeader',
+        parent=sheet['Heading3'],
+        fontSize=12,
+        spaceBefore=15,
+        spaceAfter=8,
+        textColor=colors.HexColor('#64748B')
+    ))
+    
+    _add_style(sheet, ParagraphStyle(
+        name='BodyText',
+        parent=sheet['Normal'],
+        fontSize=10,
+        spaceAfter=8,
+        textColor=colors.HexColor('#1E293B')
+    ))
+    
+    _add_style(sheet, ParagraphStyle(
+        name='SmallText',
+        parent=sheet['Normal'],
+        fontSize=8,
+        textColor=colors.HexColor('#94A3B8')
+    ))
+    
+    _add_style(sheet, ParagraphStyle(
+        name='Warning',
+        parent=sheet['Normal'],
+        fontSize=9,
+        textColor=colors.HexColor('#F59E0B'),
+        backColor=colors.HexColor('#FEF3C7'),
+        borderColor=colors.HexColor('#F59E0B'),
+        borderWidth=1,
+        borderPadding=8,
+        spaceBefore=10,
+        spaceAfter=10
+    ))
+    
+    _add_style(sheet, ParagraphStyle(
+        name='Critical',
+        parent=sheet['Normal'],
+        fontSize=10,
+        textColor=colors.HexColor('#EF4444'),
+        fontName='Helvetica-Bold'
+    ))
+    
+    _add_style(sheet, ParagraphStyle(
+        name='Optimal',
+        parent=sheet['Normal'],
+        fontSize=10,
+        textColor=colors.HexColor('#10B981')
+    ))
+    
+    return sheet
+
+STYLES = _compile_stylesheet()
+
+PAGE_LAYOUT = dict(
+    pagesize=A4,
+    rightMargin=20*mm,
+    leftMargin=20*mm,
+    topMargin=20*mm,
+    bottomMargin=20*mm
+)
+
+STATUS_COLORS = {
+    'optimal': colors.HexColor('#10B981'),
+    'normal': colors.HexColor('#3B82F6'),
+    'attention': colors.HexColor('#F59E0B'),
+    'critical': colors.HexColor('#EF4444')
+}
+DEFAULT_STATUS_COLOR = colors.HexColor('#64748B')
+RULE_COLOR = colors.HexColor('#E2E8F0')
+
+INFO_TABLE_STYLE = TableStyle([
+    ('FONTNAME', (0, 0), (0, -1), 'Helvetica-Bold'),
+    ('FONTSIZE', (0, 0), (-1, -1), 10),
+    ('TEXTCOLOR', (0, 0), (0, -1), colors.HexColor('#64748B')),
+    ('TEXTCOLOR', (1, 0), (1, -1), colors.HexColor('#1E293B')),
+    ('VALIGN', (0, 0), (-1, -1), 'TOP'),
+    ('BOTTOMPADDING', (0, 0), (-1, -1), 5),
+])
+
+SCORE_TABLE_STYLE = TableStyle([
+    ('BACKGROUND', (0, 0), (-1, 0), colors.HexColor('#F1F5F9')),
+    ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
+    ('FONTSIZE', (0, 0), (-1, -1), 9),
+    ('GRID', (0, 0), (-1, -1), 0.5, RULE_COLOR),
+    ('VALIGN', (0, 0), (-1, -1), 'MIDDLE'),
+    ('PADDING', (0, 0), (-1, -1), 6),
+])
+
+FLAGGED_TABLE_STYLE = TableStyle([
+    ('BACKGROUND', (0, 0), (-1, 0), colors.HexColor('#FEE2E2')),
+    ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
+    ('FONTSIZE', (0, 0), (-1, -1), 9),
+    ('GRID', (0, 0), (-1, -1), 0.5, RULE_COLOR),
+    ('VALIGN', (0, 0), (-1, -1), 'MIDDLE'),
+    ('PADDING', (0, 0), (-1, -1), 6),
+    ('TEXTCOLOR', (3, 1), (3, -1), colors.HexColor('#EF4444')),
+])
+
+LAB_TABLE_STYLE = TableStyle([
+    ('BACKGROUND', (0, 0), (-1, 0), colors.HexColor('#F1F5F9')),
+    ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
+    ('FONTSIZE', (0, 0), (-1, -1), 8),
+    ('GRID', (0, 0), (-1, -1), 0.5, RULE_COLOR),
+    ('VALIGN', (0, 0), (-1, -1), 'MIDDLE'),
+    ('PADDING', (0, 0), (-1, -1), 4),
+])
+
+VISIT_DISCLAIMER = (
+    "<b>DISCLAIMER:</b> This report is for informational purposes only and does not constitute medical advice. "
+    "Always consult with a qualified healthcare provider for diagnosis and treatment decisions. "
+    "The AI-generated insights are educational and should not replace professional medical judgment."
+)
+LAB_DISCLAIMER = (
+    "<b>DISCLAIMER:</b> This report is for informational purposes only. "
+    "Consult your healthcare provider for interpretation of results."
+)
+
+# Fixed paragraphs (text, style name); markup is parsed once per thread
+STATIC_PARAGRAPHS = {
+    'brand': ("HealthCanvas", 'Title'),
+    'visit_title': ("Visit Preparation Summary", 'Heading2'),
+    'lab_title': ("Lab Results Summary", 'Heading2'),
+    'health_overview': ("Health Overview", 'SectionHeader'),
+    'flagged_header': ("⚠️ Flagged Markers", 'SectionHeader'),
+    'flagged_note': (
+        "The following markers are outside the normal reference range and should be discussed with your healthcare provider.",
+        'SmallText'
+    ),
+    'changes_header': ("📈 Significant Changes", 'SectionHeader'),
+    'changes_note': ("These markers have changed by more than 15% since your last test.", 'SmallText'),
+    'medications_header': ("💊 Current Medications", 'SectionHeader'),
+    'no_medications': ("No medications reported", 'SmallText'),
+    'conditions_header': ("📋 Active Conditions", 'SectionHeader'),
+    'no_conditions': ("No active conditions reported", 'SmallText'),
+    'allergies_header': ("⚠️ Allergies", 'SectionHeader'),
+    'no_allergies': ("No allergies reported", 'SmallText'),
+    'insights_header': ("🤖 AI Health Insights", 'SectionHeader'),
+    'lifestyle_header': ("Lifestyle Considerations:", 'SubHeader'),
+    'questions_header': ("❓ Questions for Your Doctor", 'SectionHeader'),
+    'visit_disclaimer': (VISIT_DISCLAIMER, 'Warning'),
+    'lab_disclaimer': (LAB_DISCLAIMER, 'Warning'),
+}
+
+_static = threading.local()
+
+def _static_paragraph(key: str) -> Paragraph:
+    """
+    Copy of a pre-parsed paragraph. Flowables pick up layout state while a
+    document is built, so each render gets its own shallow copy; the parsed
+    fragments are shared.
+    """
+    prototypes = getattr(_static, 'paragraphs', None)
+    if prototypes is None:
+        prototypes = _static.paragraphs = {}
+    prototype = prototypes.get(key)
+    if prototype is None:
+        text, style_name = STATIC_PARAGRAPHS[key]
+        prototype = prototypes[key] = Paragraph(text, STYLES[style_name])
+    return copy.copy(prototype)
+
+def _rule() -> HRFlowable:
+    return HRFlowable(width="100%", thickness=1, color=RULE_COLOR)
+
 
 class PDFService:
     """Service for generating PDF reports"""
     
     def __init__(self):
-        self.styles = getSampleStyleSheet()
-        self._setup_custom_styles()
-    
-    def _setup_custom_styles(self):
-        """Setup custom paragraph styles"""
-        self.styles.add(ParagraphStyle(
-            name='Title',
-            parent=self.styles['Heading1'],
-            fontSize=24,
-            spaceAfter=30,
-            textColor=colors.HexColor('#0EA5E9'),
-            alignment=TA_CENTER
-        ))
-        
-        self.styles.add(ParagraphStyle(
-            name='SectionHeader',
-            parent=self.styles['Heading2'],
-            fontSize=14,
-            spaceBefore=20,
-            spaceAfter=10,
-            textColor=colors.HexColor('#1E293B'),
-            borderColor=colors.HexColor('#E2E8F0'),
-            borderWidth=1,
-            borderPadding=5
-        ))
-        
-        self.styles.add(ParagraphStyle(
-            name='SubHeader',
-            parent=self.styles['Heading3'],
-            fontSize=12,
-            spaceBefore=15,
-            spaceAfter=8,
-            textColor=colors.HexColor('#64748B')
-        ))
-        
-        self.styles.add(ParagraphStyle(
-            name='BodyText',
-            parent=self.styles['Normal'],
-            fontSize=10,
-            spaceAfter=8,
-            textColor=colors.HexColor('#1E293B')
-        ))
-        
-        self.styles.add(ParagraphStyle(
-            name='SmallText',
-            parent=self.styles['Normal'],
-            fontSize=8,
-            textColor=colors.HexColor('#94A3B8')
-        ))
-        
-        self.styles.add(ParagraphStyle(
-            name='Warning',
-            parent=self.styles['Normal'],
-            fontSize=9,
-            textColor=colors.HexColor('#F59E0B'),
-            backColor=colors.HexColor('#FEF3C7'),
-            borderColor=colors.HexColor('#F59E0B'),
-            borderWidth=1,
-            borderPadding=8,
-            spaceBefore=10,
-            spaceAfter=10
-        ))
-        
-        self.styles.add(ParagraphStyle(
-            name='Critical',
-            parent=self.styles['Normal'],
-            fontSize=10,
-            textColor=colors.HexColor('#EF4444'),
-            fontName='Helvetica-Bold'
-        ))
-        
-        self.styles.add(ParagraphStyle(
-            name='Optimal',
-            parent=self.styles['Normal'],
-            fontSize=10,
-            textColor=colors.HexColor('#10B981')
-        ))
+        self.styles = STYLES
     
     def _get_status_color(self, status: str) -> colors.Color:
         """Get color for status"""
-        status_colors = {
-            'optimal': colors.HexColor('#10B981'),
-            'normal': colors.HexColor('#3B82F6'),
-            'attention': colors.HexColor('#F59E0B'),
-            'critical': colors.HexColor('#EF4444')
-        }
-        return status_colors.get(status, colors.HexColor('#64748B'))
+        return STATUS_COLORS.get(status, DEFAULT_STATUS_COLOR)
     
     def generate_visit_summary(
         self,
@@ -117,28 +265,23 @@ class PDFService:
         allergies: List[Dict],
         questions: List[str],
         health_scores: Dict = None,
-        ai_insights: Dict = None
-    ) -> bytes:
+        ai_insights: Dict = None,
+        output: Union[str, BinaryIO] = None
+    ) -> Optional[bytes]:
         """
         Generate a comprehensive visit summary PDF.
         
-        Returns PDF as bytes.
+        Writes to `output` (path or binary file) when given, otherwise
+        returns PDF as bytes.
         """
-        buffer = io.BytesIO()
-        doc = SimpleDocTemplate(
-            buffer,
-            pagesize=A4,
-            rightMargin=20*mm,
-            leftMargin=20*mm,
-            topMargin=20*mm,
-            bottomMargin=20*mm
-        )
+        buffer = output if output is not None else io.BytesIO()
+        doc = SimpleDocTemplate(buffer, **PAGE_LAYOUT)
         
         story = []
         
         # Header
-        story.append(Paragraph("HealthCanvas", self.styles['Title']))
-        story.append(Paragraph("Visit Preparation Summary", self.styles['Heading2']))
+        story.append(_static_paragraph('brand'))
+        story.append(_static_paragraph('visit_title'))
         story.append(Spacer(1, 10))
         
         # Patient Info
@@ -148,24 +291,17 @@ class PDFService:
             ['Generated:', datetime.now().strftime('%B %d, %Y at %I:%M %p')]
         ]
         info_table = Table(info_data, colWidths=[80, 300])
-        info_table.setStyle(TableStyle([
-            ('FONTNAME', (0, 0), (0, -1), 'Helvetica-Bold'),
-            ('FONTSIZE', (0, 0), (-1, -1), 10),
-            ('TEXTCOLOR', (0, 0), (0, -1), colors.HexColor('#64748B')),
-            ('TEXTCOLOR', (1, 0), (1, -1), colors.HexColor('#1E293B')),
-            ('VALIGN', (0, 0), (-1, -1), 'TOP'),
-            ('BOTTOMPADDING', (0, 0), (-1, -1), 5),
-        ]))
+        info_table.setStyle(INFO_TABLE_STYLE)
         story.append(info_table)
         story.append(Spacer(1, 15))
         
         # Horizontal line
-        story.append(HRFlowable(width="100%", thickness=1, color=colors.HexColor('#E2E8F0')))
+        story.append(_rule())
         story.append(Spacer(1, 15))
         
         # Health Scores (if available)
         if health_scores:
-            story.append(Paragraph("Health Overview", self.styles['SectionHeader']))
+            story.append(_static_paragraph('health_overview'))
             overall = health_scores.get('overall', 'N/A')
             story.append(Paragraph(f"Overall Health Score: <b>{overall}</b>", self.styles['BodyText']))
             
@@ -179,24 +315,14 @@ class PDFService:
                     ])
                 
                 score_table = Table(score_data, colWidths=[150, 80, 100])
-                score_table.setStyle(TableStyle([
-                    ('BACKGROUND', (0, 0), (-1, 0), colors.HexColor('#F1F5F9')),
-                    ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
-                    ('FONTSIZE', (0, 0), (-1, -1), 9),
-                    ('GRID', (0, 0), (-1, -1), 0.5, colors.HexColor('#E2E8F0')),
-                    ('VALIGN', (0, 0), (-1, -1), 'MIDDLE'),
-                    ('PADDING', (0, 0), (-1, -1), 6),
-                ]))
+                score_table.setStyle(SCORE_TABLE_STYLE)
                 story.append(score_table)
             story.append(Spacer(1, 15))
         
         # Flagged Markers
         if flagged_markers:
-            story.append(Paragraph("⚠️ Flagged Markers", self.styles['SectionHeader']))
-            story.append(Paragraph(
-                "The following markers are outside the normal reference range and should be discussed with your healthcare provider.",
-                self.styles['SmallText']
-            ))
+            story.append(_static_paragraph('flagged_header'))
+            story.append(_static_paragraph('flagged_note'))
             story.append(Spacer(1, 8))
             
             marker_data = [['Marker', 'Value', 'Unit', 'Status']]
@@ -209,25 +335,14 @@ class PDFService:
                 ])
             
             marker_table = Table(marker_data, colWidths=[150, 80, 60, 80])
-            marker_table.setStyle(TableStyle([
-                ('BACKGROUND', (0, 0), (-1, 0), colors.HexColor('#FEE2E2')),
-                ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
-                ('FONTSIZE', (0, 0), (-1, -1), 9),
-                ('GRID', (0, 0), (-1, -1), 0.5, colors.HexColor('#E2E8F0')),
-                ('VALIGN', (0, 0), (-1, -1), 'MIDDLE'),
-                ('PADDING', (0, 0), (-1, -1), 6),
-                ('TEXTCOLOR', (3, 1), (3, -1), colors.HexColor('#EF4444')),
-            ]))
+            marker_table.setStyle(FLAGGED_TABLE_STYLE)
             story.append(marker_table)
             story.append(Spacer(1, 15))
         
         # Significant Changes
         if significant_changes:
-            story.append(Paragraph("📈 Significant Changes", self.styles['SectionHeader']))
-            story.append(Paragraph(
-                "These markers have changed by more than 15% since your last test.",
-                self.styles['SmallText']
-            ))
+            story.append(_static_paragraph('changes_header'))
+            story.append(_static_paragraph('changes_note'))
             story.append(Spacer(1, 8))
             
             for change in significant_changes:
@@ -240,7 +355,7 @@ class PDFService:
             story.append(Spacer(1, 15))
         
         # Current Medications
-        story.append(Paragraph("💊 Current Medications", self.styles['SectionHeader']))
+        story.append(_static_paragraph('medications_header'))
         if medications:
             for med in medications:
                 if med.get('active', True):
@@ -249,21 +364,21 @@ class PDFService:
                         self.styles['BodyText']
                     ))
         else:
-            story.append(Paragraph("No medications reported", self.styles['SmallText']))
+            story.append(_static_paragraph('no_medications'))
         story.append(Spacer(1, 15))
         
         # Conditions
-        story.append(Paragraph("📋 Active Conditions", self.styles['SectionHeader']))
+        story.append(_static_paragraph('conditions_header'))
         if conditions:
             for cond in conditions:
                 if cond.get('status') == 'active':
                     story.append(Paragraph(f"• {cond.get('name', 'Unknown')}", self.styles['BodyText']))
         else:
-            story.append(Paragraph("No active conditions reported", self.styles['SmallText']))
+            story.append(_static_paragraph('no_conditions'))
         story.append(Spacer(1, 15))
         
         # Allergies
-        story.append(Paragraph("⚠️ Allergies", self.styles['SectionHeader']))
+        story.append(_static_paragraph('allergies_header'))
         if allergies:
             for allergy in allergies:
                 severity = allergy.get('severity', 'unknown')
@@ -273,36 +388,31 @@ class PDFService:
                     style
                 ))
         else:
-            story.append(Paragraph("No allergies reported", self.styles['SmallText']))
+            story.append(_static_paragraph('no_allergies'))
         story.append(Spacer(1, 15))
         
         # AI Insights (if available)
         if ai_insights and ai_insights.get('summary'):
-            story.append(Paragraph("🤖 AI Health Insights", self.styles['SectionHeader']))
+            story.append(_static_paragraph('insights_header'))
             story.append(Paragraph(ai_insights['summary'], self.styles['BodyText']))
             
             if ai_insights.get('lifestyle_suggestions'):
-                story.append(Paragraph("Lifestyle Considerations:", self.styles['SubHeader']))
+                story.append(_static_paragraph('lifestyle_header'))
                 for suggestion in ai_insights['lifestyle_suggestions']:
                     story.append(Paragraph(f"• {suggestion}", self.styles['BodyText']))
             story.append(Spacer(1, 15))
         
         # Questions for Doctor
-        story.append(Paragraph("❓ Questions for Your Doctor", self.styles['SectionHeader']))
+        story.append(_static_paragraph('questions_header'))
         if questions:
             for i, q in enumerate(questions, 1):
                 story.append(Paragraph(f"{i}. {q}", self.styles['BodyText']))
         story.append(Spacer(1, 20))
         
         # Disclaimer
-        story.append(HRFlowable(width="100%", thickness=1, color=colors.HexColor('#E2E8F0')))
+        story.append(_rule())
         story.append(Spacer(1, 10))
-        story.append(Paragraph(
-            "<b>DISCLAIMER:</b> This report is for informational purposes only and does not constitute medical advice. "
-            "Always consult with a qualified healthcare provider for diagnosis and treatment decisions. "
-            "The AI-generated insights are educational and should not replace professional medical judgment.",
-            self.styles['Warning']
-        ))
+        story.append(_static_paragraph('visit_disclaimer'))
         
         # Footer
         story.append(Spacer(1, 20))
@@ -313,40 +423,34 @@ class PDFService:
         
         # Build PDF
         doc.build(story)
-        buffer.seek(0)
-        return buffer.getvalue()
+        return buffer.getvalue() if output is None else None
     
     def generate_lab_report_summary(
         self,
         patient_name: str,
         observations: List[Dict],
-        report_date: datetime = None
-    ) -> bytes:
+        report_date: datetime = None,
+        output: Union[str, BinaryIO] = None
+    ) -> Optional[bytes]:
         """
         Generate a summary of all lab results.
+        Observations with an `effective_date` get a Date column (history reports).
         """
-        buffer = io.BytesIO()
-        doc = SimpleDocTemplate(
-            buffer,
-            pagesize=A4,
-            rightMargin=20*mm,
-            leftMargin=20*mm,
-            topMargin=20*mm,
-            bottomMargin=20*mm
-        )
+        buffer = output if output is not None else io.BytesIO()
+        doc = SimpleDocTemplate(buffer, **PAGE_LAYOUT)
         
         story = []
         
         # Header
-        story.append(Paragraph("HealthCanvas", self.styles['Title']))
-        story.append(Paragraph("Lab Results Summary", self.styles['Heading2']))
+        story.append(_static_paragraph('brand'))
+        story.append(_static_paragraph('lab_title'))
         story.append(Spacer(1, 10))
         
         # Info
         story.append(Paragraph(f"Patient: {patient_name or 'Not specified'}", self.styles['BodyText']))
         story.append(Paragraph(f"Generated: {datetime.now().strftime('%B %d, %Y')}", self.styles['BodyText']))
         story.append(Spacer(1, 15))
-        story.append(HRFlowable(width="100%", thickness=1, color=colors.HexColor('#E2E8F0')))
+        story.append(_rule())
         story.append(Spacer(1, 15))
         
         # Group by category
@@ -361,38 +465,32 @@ class PDFService:
         for category, obs_list in categories.items():
             story.append(Paragraph(category, self.styles['SectionHeader']))
             
-            table_data = [['Test', 'Value', 'Unit', 'Range', 'Status']]
+            dated = any(obs.get('effective_date') for obs in obs_list)
+            table_data = [(['Date'] if dated else []) + ['Test', 'Value', 'Unit', 'Range', 'Status']]
             for obs in obs_list:
-                table_data.append([
+                row = [
                     obs.get('name', 'Unknown'),
                     str(obs.get('value', 'N/A')),
                     obs.get('unit', ''),
                     obs.get('reference_range', 'N/A'),
                     obs.get('status', 'N/A')
-                ])
+                ]
+                if dated:
+                    effective_date = obs.get('effective_date')
+                    row.insert(0, effective_date.strftime('%Y-%m-%d') if effective_date else '')
+                table_data.append(row)
             
-            table = Table(table_data, colWidths=[120, 60, 50, 80, 60])
-            table.setStyle(TableStyle([
-                ('BACKGROUND', (0, 0), (-1, 0), colors.HexColor('#F1F5F9')),
-                ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
-                ('FONTSIZE', (0, 0), (-1, -1), 8),
-                ('GRID', (0, 0), (-1, -1), 0.5, colors.HexColor('#E2E8F0')),
-                ('VALIGN', (0, 0), (-1, -1), 'MIDDLE'),
-                ('PADDING', (0, 0), (-1, -1), 4),
-            ]))
+            col_widths = [120, 60, 50, 80, 60]
+            table = Table(table_data, colWidths=([65] + col_widths) if dated else col_widths, repeatRows=1)
+            table.setStyle(LAB_TABLE_STYLE)
             story.append(table)
             story.append(Spacer(1, 15))
         
         # Disclaimer
-        story.append(Paragraph(
-            "<b>DISCLAIMER:</b> This report is for informational purposes only. "
-            "Consult your healthcare provider for interpretation of results.",
-            self.styles['Warning']
-        ))
+        story.append(_static_paragraph('lab_disclaimer'))
         
         doc.build(story)
-        buffer.seek(0)
-        return buffer.getvalue()
+        return buffer.getvalue() if output is None else None
 
 
 # Singleton instance
@@ -404,3 +502,157 @@ def get_pdf_service() -> PDFService:
     if _pdf_service is None:
         _pdf_service = PDFService()
     return _pdf_service
+
+
+# ============================================
+# Render Pool
+# ============================================
+
+# Entry points run inside the worker processes (module-level so they pickle).
+# They write straight to a file so the document never crosses the process
+# boundary or gets copied into the API process's memory.
+
+def _init_render_worker():
+    get_pdf_service()
+
+def _write_pdf(render: Callable[[BinaryIO], Any], path: str):
+    """
+    Render into `path`.part and rename it into place, so `path` only ever
+    holds a finished PDF. The part file is created exclusively and readable
+    only by its owner, as tempfile would create it.
+    """
+    part = path + ".part"
+    fd = os.open(part, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o600)
+    try:
+        with os.fdopen(fd, "wb") as out:
+            render(out)
+        os.replace(part, path)
+    except BaseException:
+        _discard(part)
+        raise
+
+def _render_visit_summary(kwargs: Dict[str, Any], path: str):
+    _write_pdf(lambda out: get_pdf_service().generate_visit_summary(output=out, **kwargs), path)
+
+def _render_lab_report_summary(kwargs: Dict[str, Any], path: str):
+    _write_pdf(lambda out: get_pdf_service().generate_lab_report_summary(output=out, **kwargs), path)
+
+
+class RenderedPDF:
+    """
+    A finished PDF on disk, already unlinked: the open handle is the only
+    reference, so the file disappears once streaming finishes or the client
+    goes away.
+    """
+    
+    def __init__(self, file: BinaryIO):
+        self.file = file
+        self.size = os.fstat(file.fileno()).st_size
+    
+    @classmethod
+    def claim(cls, path: str) -> "RenderedPDF":
+        file = open(path, "rb")
+        os.unlink(path)
+        return cls(file)
+    
+    def iter_chunks(self, chunk_size: int = PDF_STREAM_CHUNK_SIZE) -> Iterator[bytes]:
+        try:
+            while True:
+                chunk = self.file.read(chunk_size)
+                if not chunk:
+                    break
+                yield chunk
+        finally:
+            self.file.close()
+
+
+class PDFRenderer:
+    """
+    Renders PDFs in a process pool so ReportLab's CPU-bound `doc.build` never
+    blocks the event loop or contends for the API process's GIL.
+
+    At most PDF_RENDER_MAX_PENDING renders are queued or running; beyond that
+    `WorkerPoolSaturated` is raised (map it to 503 + Retry-After). A render
+    that exceeds the timeout raises `asyncio.TimeoutError` but keeps its slot
+    until the worker actually finishes.
+    """
+    
+    def __init__(self, workers: int = PDF_RENDER_WORKERS, max_pending: int = PDF_RENDER_MAX_PENDING,
+                 timeout: float = PDF_RENDER_TIMEOUT_SECONDS):
+        self.workers = workers
+        self.timeout = timeout
+        self.pool = BoundedWorkerPool("pdf-render", self._new_executor(), max_pending, PDF_RENDER_RETRY_AFTER)
+    
+    def _new_executor(self) -> ProcessPoolExecutor:
+        # spawn: forking a process that runs an event loop and threads is unsafe
+        return ProcessPoolExecutor(
+            max_workers=self.workers,
+            mp_context=multiprocessing.get_context("spawn"),
+            initializer=_init_render_worker
+        )
+    
+    async def _render(self, fn, kwargs: Dict[str, Any]) -> RenderedPDF:
+        # The worker creates the file; nothing exists here until it runs
+        path = os.path.join(PDF_RENDER_DIR, f"healthcanvas-{uuid.uuid4().hex}.pdf")
+        state = {"settled": False, "abandoned": False}
+
+        def settled(future):
+            # After a timeout or cancellation the worker carries on and still
+            # writes its file, so whatever it left is removed once it is done
+            state["settled"] = True
+            if state["abandoned"] or future.cancelled() or future.exception() is not None:
+                _discard(path)
+                _discard(path + ".part")
+
+        try:
+            await self.pool.submit(fn, kwargs, path, timeout=self.timeout, on_settled=settled)
+            return RenderedPDF.claim(path)
+        except BaseException as e:
+            if isinstance(e, BrokenProcessPool):
+                # A worker died (e.g. OOM-killed); start a fresh pool for later requests
+                self.pool.executor.shutdown(wait=False, cancel_futures=True)
+                self.pool.executor = self._new_executor()
+            state["abandoned"] = True
+            if state["settled"]:
+                _discard(path)
+            raise
+    
+    async def visit_summary(self, **kwargs) -> RenderedPDF:
+        return await self._render(_render_visit_summary, kwargs)
+    
+    async def lab_report_summary(self, **kwargs) -> RenderedPDF:
+        return await self._render(_render_lab_report_summary, kwargs)
+    
+    def stats(self) -> Dict[str, int]:
+        return {"workers": self.workers, **self.pool.stats()}
+    
+    def close(self):
+        self.pool.shutdown()
+
+
+def _discard(path: str):
+    try:
+        os.unlink(path)
+    except FileNotFoundError:
+        pass
+
+
+_pdf_renderer = None
+
+def get_pdf_renderer() -> PDFRenderer:
+    """Get or create the PDF render pool singleton"""
+    global _pdf_renderer
+    if _pdf_renderer is None:
+        _pdf_renderer = PDFRenderer()
+    return _pdf_renderer
+
+def pdf_renderer_stats() -> Optional[Dict[str, int]]:
+    """Pool counters if the renderer has been started (without starting it)"""
+    return _pdf_renderer.stats() if _pdf_renderer is not None else None
+
+def close_pdf_renderer():
+    """Shut down the render processes (called from the app lifespan)"""
+    global _pdf_renderer
+    if _pdf_renderer is not None:
+        _pdf_renderer.close()
+        _pdf_renderer = None
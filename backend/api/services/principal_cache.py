@@ -0,0 +1,144 @@
+"""
+HealthCanvas - Authenticated Principal Cache
+TTL + LRU cache of user identities so protected endpoints can skip the users lookup
+"""
+
+import os
+import time
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, Hashable, Optional, Set, Tuple
+
+from services.notify_listener import NotifyListener
+
+# ============================================
+# Configuration
+# ============================================
+
+PRINCIPAL_CACHE_SIZE = int(os.getenv("PRINCIPAL_CACHE_SIZE", "10000"))
+PRINCIPAL_CACHE_TTL_SECONDS = float(os.getenv("PRINCIPAL_CACHE_TTL_SECONDS", "300"))
+# Fired with the user id by a trigger on users when an identity changes or is soft-deleted
+PRINCIPAL_NOTIFY_CHANNEL = "principal_changed"
+
+# ============================================
+# Cache
+# ============================================
+
+class PrincipalCache:
+    """
+    Maps (user_id, token iat) -> user dict.
+
+    Keying on `iat` means a freshly issued token always takes one DB round trip,
+    and a per-user index lets updates or soft deletes drop every entry for that
+    user at once. Those arrive as a NOTIFY on `principal_changed` from a
+    trigger on users, so every worker drops the user however the row was
+    changed. Notifications missed while the LISTEN connection was down are
+    unrecoverable, so the cache is cleared on reconnect; the TTL only bounds
+    staleness while LISTEN is unavailable.
+    All access happens on the event loop thread, so no locking.
+    """
+
+    def __init__(self, max_size: int = PRINCIPAL_CACHE_SIZE, ttl_seconds: float = PRINCIPAL_CACHE_TTL_SECONDS):
+        self.max_size = max_size
+        self.ttl_seconds = ttl_seconds
+        self._entries: "OrderedDict[Tuple[str, Hashable], Tuple[float, Dict[str, Any]]]" = OrderedDict()
+        self._by_user: Dict[str, Set[Tuple[str, Hashable]]] = {}
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+        self._listener = NotifyListener(
+            "Principal cache",
+            {PRINCIPAL_NOTIFY_CHANNEL: self._on_notify},
+            on_reconnect=self._on_reconnect,
+        )
+
+    def get(self, user_id: str, issued_at: Hashable) -> Optional[Dict[str, Any]]:
+        key = (user_id, issued_at)
+        entry = self._entries.get(key)
+        if entry is None:
+            self.misses += 1
+            return None
+
+        expires_at, principal = entry
+        if expires_at < time.monotonic():
+            self._remove(key)
+            self.misses += 1
+            return None
+
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return dict(principal)
+
+    def put(self, user_id: str, issued_at: Hashable, principal: Dict[str, Any]):
+        if self.max_size <= 0:
+            return
+        key = (user_id, issued_at)
+        self._entries[key] = (time.monotonic() + self.ttl_seconds, dict(principal))
+        self._entries.move_to_end(key)
+        self._by_user.setdefault(user_id, set()).add(key)
+
+        while len(self._entries) > self.max_size:
+            oldest, _ = next(iter(self._entries.items()))
+            self._remove(oldest)
+            self.evictions += 1
+
+    def invalidate_user(self, user_id: str):
+        """Drop every cached token for a user (call after profile updates or soft deletes)"""
+        keys = self._by_user.pop(str(user_id), set())
+        for key in keys:
+            self._entries.pop(key, None)
+        if keys:
+            self.invalidations += 1
+
+    async def start(self, connect: Callable[[], Awaitable[Any]]):
+        """Subscribe to identity change notifications"""
+        await self._listener.start(connect)
+
+    async def stop(self):
+        await self._listener.stop()
+
+    def _on_notify(self, connection, pid, channel, payload):
+        self.invalidate_user(payload)
+
+    async def _on_reconnect(self):
+        self.clear()
+
+    def clear(self):
+        self._entries.clear()
+        self._by_user.clear()
+
+    def _remove(self, key: Tuple[str, Hashable]):
+        self._entries.pop(key, None)
+        keys = self._by_user.get(key[0])
+        if keys is not None:
+            keys.discard(key)
+            if not keys:
+                del self._by_user[key[0]]
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.misses
+        return {
+            "size": len(self._entries),
+            "max_size": self.max_size,
+            "ttl_seconds": self.ttl_seconds,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": round(self.hits / lookups, 4) if lookups else None,
+            "evictions": self.evictions,
+            "invalidations": self.invalidations,
+            **self._listener.stats(),
+        }
+
+
+# ============================================
+# Singleton Instance
+# ============================================
+
+_principal_cache = None
+
+def get_principal_cache() -> PrincipalCache:
+    """Get or create the principal cache singleton"""
+    global _principal_cache
+    if _principal_cache is None:
+        _principal_cache = PrincipalCache()
+    return _principal_cache
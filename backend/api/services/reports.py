@@ -0,0 +1,192 @@
+"""
+HealthCanvas - Report Data
+Loads the inputs of exported reports for the export endpoints and export jobs
+"""
+
+import os
+import asyncio
+from datetime import datetime
+from typing import Any, Dict, Tuple
+
+from .gemini_service import get_gemini_service
+
+# ============================================
+# Configuration
+# ============================================
+
+# Longest a report waits for AI insights before it is rendered without them
+REPORT_INSIGHTS_TIMEOUT_SECONDS = float(os.getenv("REPORT_INSIGHTS_TIMEOUT_SECONDS", "20"))
+
+VISIT_QUESTIONS = [
+    "What do my flagged markers indicate about my health?",
+    "Should I be concerned about the significant changes in my results?",
+    "Are my current medications affecting any of these results?",
+    "What lifestyle changes would you recommend?",
+    "When should I retest these markers?"
+]
+
+# ============================================
+# Report Header
+# ============================================
+
+async def load_report_header(conn, user_id) -> Tuple[str, int]:
+    """
+    Return (patient name, data version). Read it before the report data, so
+    a concurrent write can only make a cached report newer than its key.
+    """
+    user_info = await conn.fetchrow(
+        """
+        SELECT u.first_name, u.last_name, COALESCE(v.version, 0) AS data_version
+        FROM users u
+        LEFT JOIN user_data_versions v ON v.user_id = u.id
+        WHERE u.id = $1
+        """,
+        user_id
+    )
+    patient_name = f"{user_info['first_name'] or ''} {user_info['last_name'] or ''}".strip() or "Patient"
+    return patient_name, user_info['data_version']
+
+# ============================================
+# Visit Summary
+# ============================================
+
+async def load_visit_summary(pool, user_id, patient_name: str) -> Tuple[Dict[str, Any], bool]:
+    """
+    Return (PDF renderer kwargs, cacheable). The report is not cacheable when
+    AI insights failed or timed out; it is still complete without them.
+    """
+    async with pool.acquire() as conn:
+        # Get flagged markers
+        flagged = await conn.fetch(
+            """
+            SELECT b.name, lo.value, b.unit, lo.status
+            FROM latest_observations lo
+            JOIN biomarker_definitions b ON lo.biomarker_id = b.id
+            WHERE lo.user_id = $1 AND lo.status IN ('attention', 'critical')
+            ORDER BY lo.biomarker_id
+            """,
+            user_id
+        )
+
+        # Get significant changes
+        changes = await conn.fetch(
+            """
+            WITH ordered AS (
+                SELECT biomarker_id, value, effective_date,
+                       LAG(value) OVER (PARTITION BY biomarker_id ORDER BY effective_date) as prev
+                FROM observations WHERE user_id = $1 AND deleted_at IS NULL
+            )
+            SELECT b.name,
+                   CASE WHEN o.prev > 0 THEN ((o.value - o.prev) / o.prev * 100) ELSE 0 END as change
+            FROM ordered o
+            JOIN biomarker_definitions b ON o.biomarker_id = b.id
+            WHERE o.prev IS NOT NULL AND ABS((o.value - o.prev) / NULLIF(o.prev, 0) * 100) > 15
+            """,
+            user_id
+        )
+
+        # Get medications, conditions, allergies
+        medications = await conn.fetch(
+            "SELECT name, dosage, frequency, is_active AS active FROM medications WHERE user_id = $1 AND deleted_at IS NULL",
+            user_id
+        )
+        conditions = await conn.fetch(
+            "SELECT name, clinical_status as status FROM conditions WHERE user_id = $1 AND deleted_at IS NULL",
+            user_id
+        )
+        allergies = await conn.fetch(
+            "SELECT allergen as name, criticality as severity FROM allergies WHERE user_id = $1 AND deleted_at IS NULL",
+            user_id
+        )
+
+    # Format data
+    flagged_data = [{"name": f['name'], "value": float(f['value']), "unit": f['unit'], "status": f['status']} for f in flagged]
+    changes_data = [{"name": c['name'], "change": float(c['change']), "direction": "increased" if c['change'] > 0 else "decreased"} for c in changes]
+
+    condition_names = [c['name'] for c in conditions if c['status'] == 'active']
+    med_names = [m['name'] for m in medications if m['active']]
+    ai_insights, cacheable = await _load_insights(pool, user_id, condition_names, med_names)
+
+    kwargs = dict(
+        patient_name=patient_name,
+        report_date=datetime.now(),
+        flagged_markers=flagged_data,
+        significant_changes=changes_data,
+        medications=[dict(m) for m in medications],
+        conditions=[dict(c) for c in conditions],
+        allergies=[dict(a) for a in allergies],
+        questions=VISIT_QUESTIONS,
+        ai_insights=ai_insights
+    )
+    return kwargs, cacheable
+
+async def _load_insights(pool, user_id, condition_names, med_names):
+    """Return (insights or None, complete); AI insights are optional"""
+    try:
+        gemini = get_gemini_service()
+    except ValueError:
+        return None, True  # Gemini not configured
+
+    try:
+        async with pool.acquire() as conn:
+            obs = await conn.fetch(
+                """
+                SELECT b.name, lo.value, b.unit, lo.status
+                FROM latest_observations lo
+                JOIN biomarker_definitions b ON lo.biomarker_id = b.id
+                WHERE lo.user_id = $1
+                ORDER BY lo.biomarker_id
+                """,
+                user_id
+            )
+        obs_data = [{"name": o['name'], "value": float(o['value']), "unit": o['unit'], "status": o['status']} for o in obs]
+
+        insight_result = await asyncio.wait_for(
+            gemini.generate_insights(obs_data, condition_names, med_names, user_id=str(user_id)),
+            REPORT_INSIGHTS_TIMEOUT_SECONDS
+        )
+    except Exception:
+        return None, False
+
+    if not insight_result.success:
+        return None, False
+    return {
+        "summary": insight_result.summary,
+        "lifestyle_suggestions": insight_result.lifestyle_suggestions
+    }, True
+
+# ============================================
+# Lab History
+# ============================================
+
+async def load_lab_history(conn, user_id, patient_name: str) -> Dict[str, Any]:
+    """Return PDF renderer kwargs for the full lab history"""
+    rows = await conn.fetch(
+        """
+        SELECT b.name, b.category, o.value, o.unit, o.status, o.effective_date,
+               COALESCE(o.lab_reference_low, b.normal_range_low) AS range_low,
+               COALESCE(o.lab_reference_high, b.normal_range_high) AS range_high
+        FROM observations o
+        JOIN biomarker_definitions b ON o.biomarker_id = b.id
+        WHERE o.user_id = $1 AND o.deleted_at IS NULL
+        ORDER BY b.category, b.name, o.effective_date DESC
+        """,
+        user_id
+    )
+
+    observations = [
+        {
+            "name": r['name'],
+            "category": r['category'],
+            "value": float(r['value']),
+            "unit": r['unit'],
+            "status": r['status'],
+            "effective_date": r['effective_date'],
+            "reference_range": (
+                f"{float(r['range_low']):g}-{float(r['range_high']):g}"
+                if r['range_low'] is not None and r['range_high'] is not None else "N/A"
+            )
+        }
+        for r in rows
+    ]
+    return dict(patient_name=patient_name, observations=observations, report_date=datetime.now())
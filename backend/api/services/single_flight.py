@@ -0,0 +1,70 @@
+"""
+HealthCanvas - Single-Flight Request Coalescing
+Concurrent callers asking for the same key share one in-flight call
+"""
+
+import asyncio
+from typing import Any, Awaitable, Callable, Dict, Hashable
+
+# ============================================
+# Single Flight
+# ============================================
+
+class _Flight:
+    __slots__ = ("task", "waiters")
+
+    def __init__(self, task: asyncio.Task):
+        self.task = task
+        self.waiters = 0
+
+
+class SingleFlight:
+    """
+    The first caller for a key starts the call as a task; callers arriving
+    while it runs await the same task instead of starting their own.
+
+    - Results and exceptions are delivered to every waiter.
+    - A cancelled waiter only stops waiting (the task is shielded), unless it
+      was the last one, in which case the upstream call is cancelled too.
+    - The key is released as soon as the call finishes, so later callers
+      start a fresh call (put a cache in front to reuse results).
+    """
+
+    def __init__(self):
+        self._flights: Dict[Hashable, _Flight] = {}
+        self.started = 0
+        self.coalesced = 0
+        self.abandoned = 0
+
+    async def do(self, key: Hashable, fn: Callable[[], Awaitable[Any]]) -> Any:
+        flight = self._flights.get(key)
+        if flight is None:
+            flight = _Flight(asyncio.ensure_future(fn()))
+            self._flights[key] = flight
+            flight.task.add_done_callback(lambda task, key=key, flight=flight: self._release(key, flight))
+            self.started += 1
+        else:
+            self.coalesced += 1
+
+        flight.waiters += 1
+        try:
+            return await asyncio.shield(flight.task)
+        finally:
+            flight.waiters -= 1
+            if flight.waiters == 0 and not flight.task.done():
+                # Nobody is left to receive the result
+                self._release(key, flight)
+                flight.task.cancel()
+                self.abandoned += 1
+
+    def _release(self, key: Hashable, flight: _Flight):
+        if self._flights.get(key) is flight:
+            del self._flights[key]
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "in_flight": len(self._flights),
+            "started": self.started,
+            "coalesced": self.coalesced,
+            "abandoned": self.abandoned,
+        }
@@ -0,0 +1,106 @@
+"""
+HealthCanvas - Upload Spooling
+Copies uploaded files to disk in fixed-size chunks and streams them back out as base64
+"""
+
+import os
+import base64
+import asyncio
+import tempfile
+from pathlib import Path
+from typing import AsyncIterator, BinaryIO, Optional
+
+# ============================================
+# Configuration
+# ============================================
+
+# Read/write block size; peak memory per upload stays around this much
+UPLOAD_CHUNK_BYTES = 256 * 1024
+# Multiple of 3 so base64 chunks concatenate without padding in between
+UPLOAD_BASE64_CHUNK_BYTES = 3 * 64 * 1024
+UPLOAD_SPOOL_DIR = os.getenv("UPLOAD_SPOOL_DIR") or None  # system temp dir by default
+# Multipart boundaries and part headers on top of the file bytes themselves
+MULTIPART_OVERHEAD_BYTES = 64 * 1024
+
+# ============================================
+# Spooled Uploads
+# ============================================
+
+class UploadTooLarge(Exception):
+    """Raised when an upload is bigger than its limit"""
+
+    def __init__(self, max_bytes: int):
+        super().__init__(f"File too large (max {max_bytes // (1024 * 1024)}MB)")
+        self.max_bytes = max_bytes
+
+
+class SpooledUpload:
+    """
+    An uploaded file copied to a temporary file. Consumers take `path` (PDF
+    rasterising, OCR worker processes, streamed Gemini requests) rather than
+    the bytes; close() removes the file.
+    """
+
+    def __init__(self, filename: Optional[str], mime_type: str, path: Path, size: int):
+        self.filename = filename
+        self.mime_type = mime_type
+        self.path = path
+        self.size = size
+
+    def close(self):
+        try:
+            os.unlink(self.path)
+        except FileNotFoundError:
+            pass
+
+    def __enter__(self) -> "SpooledUpload":
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def _copy_limited(source: BinaryIO, max_bytes: int) -> Path:
+    fd, path = tempfile.mkstemp(prefix="hc-upload-", dir=UPLOAD_SPOOL_DIR)
+    try:
+        size = 0
+        with os.fdopen(fd, "wb") as target:
+            while chunk := source.read(UPLOAD_CHUNK_BYTES):
+                size += len(chunk)
+                if size > max_bytes:
+                    raise UploadTooLarge(max_bytes)
+                target.write(chunk)
+    except BaseException:
+        os.unlink(path)
+        raise
+    return Path(path)
+
+async def spool_upload(file, max_bytes: int) -> SpooledUpload:
+    """
+    Copy a FastAPI UploadFile to a temporary file in chunks. Raises
+    UploadTooLarge before copying anything when the parsed size is already
+    known to be over the limit, or as soon as the copy passes it.
+    """
+    if file.size is not None and file.size > max_bytes:
+        raise UploadTooLarge(max_bytes)
+    await file.seek(0)
+    path = await asyncio.to_thread(_copy_limited, file.file, max_bytes)
+    return SpooledUpload(file.filename, file.content_type, path, path.stat().st_size)
+
+def close_uploads(*uploads: SpooledUpload):
+    for upload in uploads:
+        upload.close()
+
+# ============================================
+# Streaming Base64
+# ============================================
+
+def base64_length(size: int) -> int:
+    return 4 * ((size + 2) // 3)
+
+async def iter_base64(path: Path, chunk_bytes: int = UPLOAD_BASE64_CHUNK_BYTES) -> AsyncIterator[bytes]:
+    """Base64 of a file, one chunk at a time, without loading the file"""
+    chunk_bytes -= chunk_bytes % 3
+    with open(path, "rb") as source:
+        while chunk := await asyncio.to_thread(source.read, chunk_bytes):
+            yield base64.standard_b64encode(chunk)
@@ -0,0 +1,94 @@
+"""
+HealthCanvas - Bounded Worker Pools
+Runs blocking or CPU-bound work off the event loop with queue-depth backpressure
+"""
+
+import asyncio
+from concurrent.futures import Executor
+from typing import Any, Callable, Dict, Optional
+
+
+class WorkerPoolSaturated(Exception):
+    """Raised when a pool already holds its maximum number of pending jobs"""
+
+    def __init__(self, pool_name: str, retry_after: int = 1):
+        super().__init__(f"{pool_name} pool is saturated, retry later")
+        self.pool_name = pool_name
+        self.retry_after = retry_after
+
+
+class BoundedWorkerPool:
+    """
+    Wraps an executor and refuses new work once `max_pending` jobs are queued
+    or running, so a burst turns into fast 503s instead of an unbounded backlog.
+
+    The pending counter is only touched from the event loop thread.
+    """
+
+    def __init__(self, name: str, executor: Executor, max_pending: int, retry_after: int = 1):
+        self.name = name
+        self.executor = executor
+        self.max_pending = max_pending
+        self.retry_after = retry_after
+        self._pending = 0
+        self.completed = 0
+        self.failed = 0
+        self.rejected = 0
+        self.timed_out = 0
+
+    @property
+    def pending(self) -> int:
+        return self._pending
+
+    def _release(self, future: asyncio.Future):
+        self._pending -= 1
+        if future.cancelled() or future.exception() is not None:
+            self.failed += 1
+        else:
+            self.completed += 1
+
+    async def submit(self, fn: Callable[..., Any], *args, timeout: Optional[float] = None,
+                     on_settled: Optional[Callable[[asyncio.Future], None]] = None) -> Any:
+        """
+        Run `fn(*args)` in the executor.
+
+        The slot is released only when the job itself finishes, so callers that
+        time out or are cancelled cannot push the pool past its bound.
+        `on_settled` is called with the job's future at that point too, on the
+        event loop, even if the caller has stopped waiting.
+        """
+        if self._pending >= self.max_pending:
+            self.rejected += 1
+            raise WorkerPoolSaturated(self.name, self.retry_after)
+
+        self._pending += 1
+        loop = asyncio.get_running_loop()
+        try:
+            future = loop.run_in_executor(self.executor, fn, *args)
+        except Exception:
+            self._pending -= 1
+            raise
+        future.add_done_callback(self._release)
+        if on_settled is not None:
+            future.add_done_callback(on_settled)
+
+        try:
+            if timeout is not None:
+                return await asyncio.wait_for(asyncio.shield(future), timeout)
+            return await asyncio.shield(future)
+        except asyncio.TimeoutError:
+            self.timed_out += 1
+            raise
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "pending": self._pending,
+            "max_pending": self.max_pending,
+            "completed": self.completed,
+            "failed": self.failed,
+            "rejected": self.rejected,
+            "timed_out": self.timed_out,
+        }
+
+    def shutdown(self):
+        self.executor.shutdown(wait=False, cancel_futures=True)
@@ -0,0 +1,10 @@
+"""
+HealthCanvas - Test configuration
+Run from backend/api: python -m pytest tests
+"""
+
+import os
+import sys
+
+# Services are imported as a top-level package, as main.py does
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
@@ -0,0 +1,153 @@
+"""
+HealthCanvas - Pooled Gemini client tests
+Calls reuse warm connections to a local stub that charges for every new one
+"""
+
+import asyncio
+import json
+import time
+
+import httpx
+import pytest
+
+from services import gemini_service
+from services.gemini_service import GEMINI_TEXT_MODEL, GeminiService
+from services.metrics import get_latency_histogram
+
+# Stand-in for a TCP + TLS handshake to the Gemini endpoint
+HANDSHAKE_SECONDS = 0.05
+CALLS = 10
+
+# ============================================
+# Stub Server
+# ============================================
+
+class StubGeminiServer:
+    """
+    Minimal HTTP/1.1 keep-alive server answering generateContent. Every new
+    connection waits HANDSHAKE_SECONDS before its first response is read,
+    and connections and requests are counted.
+    """
+
+    BODY = json.dumps({"candidates": [{"content": {"parts": [{"text": "ok"}]}}]}).encode()
+
+    def __init__(self, response_delay: float = 0.0):
+        self.response_delay = response_delay
+        self.connections = 0
+        self.requests = 0
+        self.server = None
+
+    async def __aenter__(self) -> "StubGeminiServer":
+        self.server = await asyncio.start_server(self._handle, "127.0.0.1", 0)
+        self.url = f"http://127.0.0.1:{self.server.sockets[0].getsockname()[1]}/models"
+        return self
+
+    async def __aexit__(self, *exc):
+        self.server.close()
+        await self.server.wait_closed()
+
+    async def _handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        self.connections += 1
+        await asyncio.sleep(HANDSHAKE_SECONDS)
+        try:
+            while True:
+                head = await reader.readuntil(b"\r\n\r\n")
+                length = 0
+                for line in head.split(b"\r\n"):
+                    name, _, value = line.partition(b":")
+                    if name.strip().lower() == b"content-length":
+                        length = int(value)
+                await reader.readexactly(length)
+                self.requests += 1
+                await asyncio.sleep(self.response_delay)
+                writer.write(
+                    b"HTTP/1.1 200 OK\r\nContent-Type: application/json\r\n"
+                    b"Content-Length: %d\r\n\r\n%s" % (len(self.BODY), self.BODY)
+                )
+                await writer.drain()
+        except (asyncio.IncompleteReadError, ConnectionError):
+            pass
+        finally:
+            writer.close()
+
+
+@pytest.fixture
+def service_for(monkeypatch):
+    """Build a GeminiService pointed at a stub server"""
+    monkeypatch.setattr(gemini_service, "GEMINI_API_KEY", "test-key")
+
+    def build(stub: StubGeminiServer) -> GeminiService:
+        monkeypatch.setattr(gemini_service, "GEMINI_BASE_URL", stub.url)
+        return GeminiService()
+    return build
+
+
+async def call(service: GeminiService, operation: str = "test"):
+    return await service._call_gemini(GEMINI_TEXT_MODEL, [{"parts": [{"text": "hi"}]}], operation=operation)
+
+# ============================================
+# Tests
+# ============================================
+
+@pytest.mark.asyncio
+async def test_sequential_calls_reuse_one_connection(service_for):
+    async with StubGeminiServer() as stub:
+        service = service_for(stub)
+        try:
+            started = time.perf_counter()
+            for _ in range(CALLS):
+                await call(service)
+            elapsed = time.perf_counter() - started
+        finally:
+            await service.aclose()
+
+    assert stub.requests == CALLS
+    assert stub.connections == 1
+    # One handshake paid, not one per call
+    assert elapsed < HANDSHAKE_SECONDS * CALLS / 2
+
+
+@pytest.mark.asyncio
+async def test_client_per_call_pays_every_handshake():
+    """The behaviour the pooled client replaced: a fresh AsyncClient per request"""
+    async with StubGeminiServer() as stub:
+        started = time.perf_counter()
+        for _ in range(CALLS):
+            async with httpx.AsyncClient() as client:
+                (await client.post(f"{stub.url}/{GEMINI_TEXT_MODEL}:generateContent", json={})).raise_for_status()
+        elapsed = time.perf_counter() - started
+
+    assert stub.connections == CALLS
+    assert elapsed >= HANDSHAKE_SECONDS * CALLS
+
+
+@pytest.mark.asyncio
+async def test_concurrent_calls_are_capped_by_pool_limits(service_for, monkeypatch):
+    monkeypatch.setattr(gemini_service, "GEMINI_MAX_CONNECTIONS", 2)
+    monkeypatch.setattr(gemini_service, "GEMINI_MAX_KEEPALIVE_CONNECTIONS", 2)
+    async with StubGeminiServer(response_delay=0.02) as stub:
+        service = service_for(stub)
+        try:
+            await asyncio.gather(*(call(service) for _ in range(CALLS)))
+        finally:
+            await service.aclose()
+
+    assert stub.requests == CALLS
+    assert stub.connections == 2
+
+
+@pytest.mark.asyncio
+async def test_calls_are_recorded_in_latency_histogram(service_for):
+    histogram = get_latency_histogram("gemini.client_test")
+    before = histogram.count
+    async with StubGeminiServer() as stub:
+        service = service_for(stub)
+        try:
+            for _ in range(3):
+                await call(service, operation="client_test")
+        finally:
+            await service.aclose()
+
+    assert histogram.count == before + 3
+    # The first call includes the handshake
+    assert histogram.max_ms >= HANDSHAKE_SECONDS * 1000
@@ -0,0 +1,160 @@
+"""
+HealthCanvas - Supervised LISTEN tests
+Dropped listener connections are re-established and the owner resyncs
+"""
+
+import asyncio
+
+import pytest
+
+from services import notify_listener
+from services.notify_listener import NotifyListener
+from services.principal_cache import PRINCIPAL_NOTIFY_CHANNEL, PrincipalCache
+
+# ============================================
+# Fakes
+# ============================================
+
+class FakeConnection:
+    """Enough of asyncpg.Connection for LISTEN: listeners, termination, ping"""
+
+    def __init__(self):
+        self.listeners = {}
+        self.termination_listeners = []
+        self.closed = False
+
+    async def add_listener(self, channel, callback):
+        self.listeners[channel] = callback
+
+    def add_termination_listener(self, callback):
+        self.termination_listeners.append(callback)
+
+    def remove_termination_listener(self, callback):
+        self.termination_listeners.remove(callback)
+
+    async def execute(self, query):
+        if self.closed:
+            raise ConnectionError("connection is closed")
+
+    def is_closed(self):
+        return self.closed
+
+    def notify(self, channel, payload):
+        self.listeners[channel](self, 1234, channel, payload)
+
+    def terminate(self):
+        self.closed = True
+        for callback in list(self.termination_listeners):
+            callback(self)
+
+    async def close(self):
+        self.closed = True
+
+
+class FakeServer:
+    """Hands out connections, failing the next `failures` attempts"""
+
+    def __init__(self, failures: int = 0):
+        self.failures = failures
+        self.connections = []
+
+    async def connect(self):
+        if self.failures:
+            self.failures -= 1
+            raise OSError("connection refused")
+        conn = FakeConnection()
+        self.connections.append(conn)
+        return conn
+
+
+@pytest.fixture(autouse=True)
+def fast_backoff(monkeypatch):
+    monkeypatch.setattr(notify_listener, "LISTEN_RECONNECT_INITIAL_SECONDS", 0.01)
+    monkeypatch.setattr(notify_listener, "LISTEN_RECONNECT_MAX_SECONDS", 0.02)
+
+
+async def wait_for(predicate, timeout: float = 2.0):
+    async def poll():
+        while not predicate():
+            await asyncio.sleep(0.005)
+    await asyncio.wait_for(poll(), timeout)
+
+# ============================================
+# NotifyListener
+# ============================================
+
+@pytest.mark.asyncio
+async def test_reconnects_and_resyncs_after_termination():
+    server = FakeServer()
+    received, resyncs = [], []
+
+    async def resync():
+        resyncs.append(True)
+
+    listener = NotifyListener("test", {"chan": lambda c, p, ch, payload: received.append(payload)},
+                              on_reconnect=resync)
+    await listener.start(server.connect)
+    assert listener.listening
+
+    server.connections[0].terminate()
+    assert not listener.listening
+
+    await wait_for(lambda: listener.listening)
+    assert listener.stats() == {"listening": True, "disconnects": 1, "reconnects": 1}
+    assert resyncs == [True]
+
+    server.connections[1].notify("chan", "after")
+    assert received == ["after"]
+    await listener.stop()
+    assert not listener.listening
+
+
+@pytest.mark.asyncio
+async def test_keeps_retrying_when_database_is_down_at_start():
+    server = FakeServer(failures=3)
+    listener = NotifyListener("test", {"chan": lambda *args: None})
+
+    await listener.start(server.connect)
+    assert not listener.listening
+
+    await wait_for(lambda: listener.listening)
+    assert server.failures == 0
+    await listener.stop()
+
+
+@pytest.mark.asyncio
+async def test_failed_healthcheck_forces_reconnect(monkeypatch):
+    monkeypatch.setattr(notify_listener, "LISTEN_HEALTHCHECK_SECONDS", 0.01)
+    server = FakeServer()
+    listener = NotifyListener("test", {"chan": lambda *args: None})
+    await listener.start(server.connect)
+
+    # Dead socket that never reported termination
+    server.connections[0].closed = True
+
+    await wait_for(lambda: len(server.connections) == 2 and listener.listening)
+    assert listener.reconnects == 1
+    await listener.stop()
+
+# ============================================
+# PrincipalCache
+# ============================================
+
+@pytest.mark.asyncio
+async def test_principal_cache_clears_on_reconnect():
+    server = FakeServer()
+    cache = PrincipalCache()
+    await cache.start(server.connect)
+
+    cache.put("u1", 1, {"id": "u1"})
+    cache.put("u2", 1, {"id": "u2"})
+    server.connections[0].notify(PRINCIPAL_NOTIFY_CHANNEL, "u1")
+    assert cache.get("u1", 1) is None
+    assert cache.get("u2", 1) == {"id": "u2"}
+
+    # An update to u2 while disconnected would be missed, so nothing cached survives
+    server.connections[0].terminate()
+    await wait_for(lambda: cache.stats()["listening"])
+    assert cache.get("u2", 1) is None
+    assert cache.stats()["reconnects"] == 1
+    await cache.stop()
@@ -0,0 +1,147 @@
+"""
+HealthCanvas - Pattern rule evaluation tests
+The compiled matrix evaluator agrees with the dashboard's original hard-coded checks
+"""
+
+import math
+import os
+import re
+
+import numpy as np
+import pytest
+
+from services.pattern_rules import PatternEngine
+
+SCHEMA = os.path.join(os.path.dirname(__file__), "..", "..", "database", "schema.sql")
+
+# Exactly at, just past and well past each threshold, plus missing
+THRESHOLDS = {
+    "glucose": 100, "triglycerides": 150, "hdl": 40, "hba1c": 5.6,
+    "hemoglobin": 12, "ferritin": 30, "creatinine": 1.3, "egfr": 60,
+}
+EPSILON = 1e-9
+
+
+def seeded_rules():
+    """The pattern_rules rows schema.sql seeds, as asyncpg would return them"""
+    with open(SCHEMA, encoding="utf-8") as f:
+        schema = f.read()
+    insert = schema[schema.index("INSERT INTO pattern_rules"):]
+    insert = insert[:insert.index(";\n")]
+    rows = []
+    for match in re.finditer(
+        r"\('(\w+)', '([^']*)', '([^']*)', '(\w+)',\s*'(\[.*?\])',\s*(\w+), ARRAY\[([^\]]*)\]\)", insert
+    ):
+        rule_id, name, description, severity, conditions, min_matches, markers = match.groups()
+        rows.append({
+            "id": rule_id,
+            "name": name,
+            "description": description,
+            "severity": severity,
+            "conditions": conditions,
+            "min_matches": None if min_matches == "NULL" else int(min_matches),
+            "markers": re.findall(r"'(\w+)'", markers),
+        })
+    return sorted(rows, key=lambda row: row["id"])
+
+
+def legacy_patterns(latest):
+    """The dashboard's checks before rules moved into pattern_rules (missing values never match)"""
+    patterns = []
+    metabolic_flags = sum([
+        latest.get('glucose', {}).get('value', 0) > 100,
+        latest.get('triglycerides', {}).get('value', 0) > 150,
+        latest.get('hdl', {}).get('value', 100) < 40,
+        latest.get('hba1c', {}).get('value', 0) > 5.6
+    ])
+    if metabolic_flags >= 3:
+        patterns.append({
+            'type': 'warning',
+            'name': 'Metabolic Syndrome Risk',
+            'description': 'Multiple markers suggest metabolic syndrome risk. Discuss with your doctor.',
+            'markers': ['glucose', 'triglycerides', 'hdl', 'hba1c']
+        })
+    if latest.get('hemoglobin', {}).get('value', 100) < 12 and latest.get('ferritin', {}).get('value', 100) < 30:
+        patterns.append({
+            'type': 'attention',
+            'name': 'Possible Iron Deficiency',
+            'description': 'Low hemoglobin with low ferritin may indicate iron deficiency.',
+            'markers': ['hemoglobin', 'ferritin']
+        })
+    if latest.get('creatinine', {}).get('value', 0) > 1.3 and latest.get('egfr', {}).get('value', 100) < 60:
+        patterns.append({
+            'type': 'warning',
+            'name': 'Reduced Kidney Function',
+            'description': 'Elevated creatinine with low eGFR suggests reduced kidney function.',
+            'markers': ['creatinine', 'egfr']
+        })
+    return patterns
+
+
+@pytest.fixture(scope="module")
+def engine():
+    engine = PatternEngine()
+    engine.load(seeded_rules())
+    assert not engine.skipped_rules
+    return engine
+
+
+def matrix_alerts(engine, users):
+    """Alerts per user from evaluate_matrix, for a list of {biomarker: value} dicts"""
+    compiled = engine.compiled
+    values = compiled.empty_matrix(len(users))
+    for i, user in enumerate(users):
+        for biomarker, value in user.items():
+            values[i, compiled.columns[biomarker]] = value
+    matches = compiled.evaluate_matrix(values)
+    return [
+        sorted((compiled.rules[r].alert() for r in np.flatnonzero(row)), key=lambda a: a['name'])
+        for row in matches
+    ]
+
+
+def expected_alerts(user):
+    latest = {b: {'value': v} for b, v in user.items() if not math.isnan(v)}
+    return sorted(legacy_patterns(latest), key=lambda a: a['name'])
+
+
+def test_seed_has_the_three_dashboard_rules(engine):
+    assert [rule.id for rule in engine.compiled.rules] == ["iron_deficiency", "kidney_function", "metabolic_syndrome"]
+    assert set(engine.compiled.columns) == set(THRESHOLDS)
+
+
+@pytest.mark.parametrize("user,names", [
+    ({}, []),
+    # Exactly at a threshold is never a match (every seeded operator is strict)
+    (dict(THRESHOLDS), []),
+    ({"glucose": 100 + EPSILON, "triglycerides": 150 + EPSILON, "hdl": 40 - EPSILON, "hba1c": 5.6},
+     ["Metabolic Syndrome Risk"]),
+    ({"glucose": 100, "triglycerides": 151, "hdl": 39, "hba1c": 5.6}, []),
+    # Three of four is enough even when the fourth marker was never measured
+    ({"glucose": 130, "triglycerides": 200, "hdl": 35, "hba1c": math.nan}, ["Metabolic Syndrome Risk"]),
+    ({"glucose": 130, "triglycerides": math.nan, "hdl": math.nan, "hba1c": 6.5}, []),
+    ({"hemoglobin": 11.9, "ferritin": 29.9}, ["Possible Iron Deficiency"]),
+    ({"hemoglobin": 11.9, "ferritin": math.nan}, []),
+    ({"hemoglobin": 12, "ferritin": 5}, []),
+    ({"creatinine": 1.3 + EPSILON, "egfr": 60 - EPSILON}, ["Reduced Kidney Function"]),
+    ({"creatinine": 2.0, "egfr": 60}, []),
+    ({"creatinine": math.nan, "egfr": 30}, []),
+])
+def test_edge_values(engine, user, names):
+    [alerts] = matrix_alerts(engine, [user])
+    assert alerts == expected_alerts(user)
+    assert sorted(alert['name'] for alert in alerts) == sorted(names)
+
+
+def test_matrix_matches_legacy_checks_on_grid(engine):
+    rng = np.random.default_rng(21)
+    offsets = np.array([-10, -EPSILON, 0, EPSILON, 10])
+    users = []
+    for _ in range(5000):
+        user = {}
+        for biomarker, threshold in THRESHOLDS.items():
+            pick = rng.integers(len(offsets) + 1)
+            user[biomarker] = math.nan if pick == len(offsets) else threshold + offsets[pick] * max(threshold, 1) / 100
+        users.append(user)
+
+    assert matrix_alerts(engine, users) == [expected_alerts(user) for user in users]
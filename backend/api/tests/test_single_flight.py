@@ -0,0 +1,215 @@
+"""
+HealthCanvas - Single-flight coalescing tests
+Concurrent identical requests share one upstream call
+"""
+
+import asyncio
+import json
+
+import httpx
+import pytest
+
+from services import gemini_service
+from services.gemini_service import AIResponseCache, GeminiService
+from services.single_flight import SingleFlight
+
+CALLERS = 20
+
+# ============================================
+# SingleFlight
+# ============================================
+
+class SlowCall:
+    """Counts invocations and holds each one open until released"""
+
+    def __init__(self, result="done", error: Exception = None):
+        self.result = result
+        self.error = error
+        self.calls = 0
+        self.cancelled = False
+        self.started = asyncio.Event()
+        self.release = asyncio.Event()
+
+    async def __call__(self):
+        self.calls += 1
+        self.started.set()
+        try:
+            await self.release.wait()
+        except asyncio.CancelledError:
+            self.cancelled = True
+            raise
+        if self.error is not None:
+            raise self.error
+        return self.result
+
+
+@pytest.mark.asyncio
+async def test_concurrent_callers_share_one_call():
+    flights = SingleFlight()
+    call = SlowCall()
+
+    waiters = [asyncio.create_task(flights.do("key", call)) for _ in range(CALLERS)]
+    await call.started.wait()
+    call.release.set()
+
+    assert await asyncio.gather(*waiters) == ["done"] * CALLERS
+    assert call.calls == 1
+    assert flights.stats() == {"in_flight": 0, "started": 1, "coalesced": CALLERS - 1, "abandoned": 0}
+
+
+@pytest.mark.asyncio
+async def test_different_keys_do_not_coalesce():
+    flights = SingleFlight()
+    call = SlowCall()
+
+    waiters = [asyncio.create_task(flights.do(key, call)) for key in ("a", "b")]
+    await call.started.wait()
+    call.release.set()
+
+    await asyncio.gather(*waiters)
+    assert call.calls == 2
+
+
+@pytest.mark.asyncio
+async def test_error_reaches_every_waiter_and_releases_key():
+    flights = SingleFlight()
+    failing = SlowCall(error=RuntimeError("upstream down"))
+
+    waiters = [asyncio.create_task(flights.do("key", failing)) for _ in range(CALLERS)]
+    await failing.started.wait()
+    failing.release.set()
+
+    results = await asyncio.gather(*waiters, return_exceptions=True)
+    assert all(isinstance(r, RuntimeError) and str(r) == "upstream down" for r in results)
+    assert failing.calls == 1
+
+    # A failure is not remembered: the next caller starts a fresh call
+    retry = SlowCall(result="recovered")
+    retry.release.set()
+    assert await flights.do("key", retry) == "recovered"
+    assert retry.calls == 1
+
+
+@pytest.mark.asyncio
+async def test_cancelled_waiter_leaves_call_running_for_others():
+    flights = SingleFlight()
+    call = SlowCall()
+
+    leaving = asyncio.create_task(flights.do("key", call))
+    staying = asyncio.create_task(flights.do("key", call))
+    await call.started.wait()
+
+    leaving.cancel()
+    with pytest.raises(asyncio.CancelledError):
+        await leaving
+
+    call.release.set()
+    assert await staying == "done"
+    assert call.calls == 1
+    assert not call.cancelled
+    assert flights.stats()["abandoned"] == 0
+
+
+@pytest.mark.asyncio
+async def test_last_waiter_cancelling_cancels_the_call():
+    flights = SingleFlight()
+    call = SlowCall()
+
+    waiters = [asyncio.create_task(flights.do("key", call)) for _ in range(3)]
+    await call.started.wait()
+    for waiter in waiters:
+        waiter.cancel()
+    await asyncio.gather(*waiters, return_exceptions=True)
+    await asyncio.sleep(0)
+
+    assert call.cancelled
+    assert flights.stats() == {"in_flight": 0, "started": 1, "coalesced": 2, "abandoned": 1}
+
+    # The key is free again
+    fresh = SlowCall(result="again")
+    fresh.release.set()
+    assert await flights.do("key", fresh) == "again"
+
+
+# ============================================
+# GeminiService with a slow fake backend
+# ============================================
+
+EXPLANATION = {
+    "plain_explanation": "Glucose is the sugar in your blood.",
+    "what_it_measures": "Blood sugar after fasting.",
+    "why_it_matters": "It reflects how your body handles sugar.",
+    "factors_that_affect": ["diet", "sleep"],
+    "questions_for_doctor": ["Should I retest?"],
+}
+
+
+class FakeGemini:
+    """generateContent stand-in that answers after a delay"""
+
+    def __init__(self, delay: float = 0.1, status_code: int = 200):
+        self.delay = delay
+        self.status_code = status_code
+        self.calls = 0
+
+    async def handle(self, request: httpx.Request) -> httpx.Response:
+        self.calls += 1
+        await asyncio.sleep(self.delay)
+        if self.status_code != 200:
+            return httpx.Response(self.status_code, json={"error": {"message": "unavailable"}})
+        text = json.dumps(EXPLANATION)
+        return httpx.Response(200, json={"candidates": [{"content": {"parts": [{"text": text}]}}]})
+
+
+@pytest.fixture
+def gemini(monkeypatch):
+    """A GeminiService whose HTTP client talks to a FakeGemini, with an empty memory-only cache"""
+    monkeypatch.setattr(gemini_service, "GEMINI_API_KEY", "test-key")
+    monkeypatch.setattr(gemini_service, "_ai_response_cache", AIResponseCache())
+
+    def build(backend: FakeGemini) -> GeminiService:
+        service = GeminiService()
+        service.client = httpx.AsyncClient(transport=httpx.MockTransport(backend.handle))
+        return service
+    return build
+
+
+async def explain_concurrently(service: GeminiService):
+    return await asyncio.gather(*(
+        service.explain_biomarker("Fasting Glucose", 92.0, "mg/dL", "normal", "70-99")
+        for _ in range(CALLERS)
+    ))
+
+
+@pytest.mark.asyncio
+async def test_concurrent_explanations_make_one_upstream_call(gemini):
+    backend = FakeGemini()
+    service = gemini(backend)
+    try:
+        results = await explain_concurrently(service)
+        assert backend.calls == 1
+        assert all(r.success and r.plain_explanation == EXPLANATION["plain_explanation"] for r in results)
+        assert service.flights.stats()["coalesced"] == CALLERS - 1
+
+        # Later identical requests are answered from the response cache
+        await service.explain_biomarker("Fasting Glucose", 92.0, "mg/dL", "normal", "70-99")
+        assert backend.calls == 1
+    finally:
+        await service.aclose()
+
+
+@pytest.mark.asyncio
+async def test_failed_explanation_is_shared_but_not_cached(gemini):
+    backend = FakeGemini(status_code=503)
+    service = gemini(backend)
+    try:
+        results = await explain_concurrently(service)
+        assert backend.calls == 1
+        assert all(not r.success for r in results)
+
+        backend.status_code = 200
+        result = await service.explain_biomarker("Fasting Glucose", 92.0, "mg/dL", "normal", "70-99")
+        assert result.success
+        assert backend.calls == 2
+    finally:
+        await service.aclose()
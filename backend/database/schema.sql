@@ -140,7 +140,10 @@ CREATE TABLE observations (
     deleted_at TIMESTAMP WITH TIME ZONE
 );
 
-CREATE INDEX idx_observations_user_date ON observations(user_id, effective_date DESC);
+-- Listing order of live rows; keyset pages seek on (effective_date, created_at, id)
+CREATE INDEX idx_observations_user_keyset
+    ON observations(user_id, effective_date DESC, created_at DESC, id DESC)
+    WHERE deleted_at IS NULL;
 CREATE INDEX idx_observations_user_biomarker ON observations(user_id, biomarker_id);
 CREATE INDEX idx_observations_biomarker ON observations(biomarker_id);
 
@@ -453,8 +456,8 @@ CREATE TABLE pattern_alerts (
     user_id UUID NOT NULL REFERENCES users(id) ON DELETE CASCADE,
     
     -- Alert details
-    alert_type VARCHAR(50) NOT NULL, -- metabolic_syndrome, anemia, thyroid, kidney, etc.
-    severity VARCHAR(20) NOT NULL, -- info, warning, critical
+    alert_type VARCHAR(50) NOT NULL, -- pattern_rules.id: metabolic_syndrome, iron_deficiency, kidney_function, etc.
+    severity VARCHAR(20) NOT NULL, -- attention, warning, critical
     title VARCHAR(200) NOT NULL,
     description TEXT,
     
@@ -464,12 +467,60 @@ CREATE TABLE pattern_alerts (
     -- Status
     status VARCHAR(20) DEFAULT 'active', -- active, dismissed, resolved
     dismissed_at TIMESTAMP WITH TIME ZONE,
+    resolved_at TIMESTAMP WITH TIME ZONE, -- the rule stopped matching
     
     -- Metadata
     detected_at TIMESTAMP WITH TIME ZONE DEFAULT NOW(),
     expires_at TIMESTAMP WITH TIME ZONE
 );
 
+-- One open (active or dismissed) alert per user and rule; resolved ones are history
+CREATE UNIQUE INDEX idx_pattern_alerts_open
+    ON pattern_alerts(user_id, alert_type)
+    WHERE status IN ('active', 'dismissed');
+
+-- Dashboard read: a user's active alerts in detection order
+CREATE INDEX idx_pattern_alerts_user_active
+    ON pattern_alerts(user_id, detected_at)
+    WHERE status = 'active';
+
+-- Resolved alerts past their retention, deleted by the sweep
+CREATE INDEX idx_pattern_alerts_expires
+    ON pattern_alerts(expires_at)
+    WHERE expires_at IS NOT NULL;
+
+-- ============================================
+-- PATTERN RULES
+-- ============================================
+
+-- Declarative rules behind pattern_alerts. Each condition compares the user's
+-- latest value of a biomarker with a threshold; a rule matches when at least
+-- min_matches conditions hold (all of them when NULL). A missing value never
+-- satisfies a condition.
+CREATE TABLE pattern_rules (
+    id VARCHAR(50) PRIMARY KEY, -- becomes pattern_alerts.alert_type
+    name VARCHAR(200) NOT NULL,
+    description TEXT,
+    severity VARCHAR(20) NOT NULL CHECK (severity IN ('attention', 'warning', 'critical')),
+    conditions JSONB NOT NULL, -- [{"biomarker": "glucose", "op": ">", "value": 100}, ...]
+    min_matches INTEGER CHECK (min_matches > 0),
+    markers TEXT[], -- shown with the alert; defaults to the condition biomarkers
+    is_active BOOLEAN DEFAULT TRUE,
+    created_at TIMESTAMP WITH TIME ZONE DEFAULT NOW(),
+    updated_at TIMESTAMP WITH TIME ZONE DEFAULT NOW()
+);
+
+INSERT INTO pattern_rules (id, name, description, severity, conditions, min_matches, markers) VALUES
+('metabolic_syndrome', 'Metabolic Syndrome Risk', 'Multiple markers suggest metabolic syndrome risk. Discuss with your doctor.', 'warning',
+ '[{"biomarker": "glucose", "op": ">", "value": 100}, {"biomarker": "triglycerides", "op": ">", "value": 150}, {"biomarker": "hdl", "op": "<", "value": 40}, {"biomarker": "hba1c", "op": ">", "value": 5.6}]',
+ 3, ARRAY['glucose', 'triglycerides', 'hdl', 'hba1c']),
+('iron_deficiency', 'Possible Iron Deficiency', 'Low hemoglobin with low ferritin may indicate iron deficiency.', 'attention',
+ '[{"biomarker": "hemoglobin", "op": "<", "value": 12}, {"biomarker": "ferritin", "op": "<", "value": 30}]',
+ NULL, ARRAY['hemoglobin', 'ferritin']),
+('kidney_function', 'Reduced Kidney Function', 'Elevated creatinine with low eGFR suggests reduced kidney function.', 'warning',
+ '[{"biomarker": "creatinine", "op": ">", "value": 1.3}, {"biomarker": "egfr", "op": "<", "value": 60}]',
+ NULL, ARRAY['creatinine', 'egfr']);
+
 -- ============================================
 -- WATCH LIST
 -- ============================================
@@ -556,6 +607,44 @@ CREATE TABLE audit_log (
 
 CREATE INDEX idx_audit_user ON audit_log(user_id, created_at DESC);
 
+-- ============================================
+-- AI RESPONSE CACHE
+-- ============================================
+
+-- Persistent tier of the LLM answer cache, keyed by a hash of the prompt inputs.
+-- user_id is set for per-user answers (insights, visit questions, test timing)
+-- so the observation triggers can drop them when that user's data changes.
+CREATE TABLE ai_response_cache (
+    cache_key CHAR(64) PRIMARY KEY, -- sha256 hex
+    method VARCHAR(50) NOT NULL,
+    user_id UUID REFERENCES users(id) ON DELETE CASCADE,
+    response JSONB NOT NULL,
+    created_at TIMESTAMP WITH TIME ZONE DEFAULT NOW(),
+    expires_at TIMESTAMP WITH TIME ZONE NOT NULL
+);
+
+CREATE INDEX idx_ai_response_cache_user ON ai_response_cache(user_id) WHERE user_id IS NOT NULL;
+CREATE INDEX idx_ai_response_cache_expires ON ai_response_cache(expires_at);
+
+-- ============================================
+-- BIOMARKER ALIAS MAPPINGS
+-- ============================================
+
+-- Lab report test names users confirmed for a biomarker, one vote per user and
+-- name. A name confirmed by enough users resolves for everyone. API workers
+-- keep these in memory and re-read rows newer than their updated_at watermark.
+CREATE TABLE biomarker_alias_mappings (
+    normalized_name VARCHAR(200) NOT NULL, -- lower-case words joined by spaces
+    user_id UUID NOT NULL REFERENCES users(id) ON DELETE CASCADE,
+    biomarker_id VARCHAR(50) NOT NULL REFERENCES biomarker_definitions(id),
+    test_name VARCHAR(200) NOT NULL, -- as printed on the report
+    created_at TIMESTAMP WITH TIME ZONE DEFAULT NOW(),
+    updated_at TIMESTAMP WITH TIME ZONE DEFAULT NOW(),
+    PRIMARY KEY (normalized_name, user_id)
+);
+
+CREATE INDEX idx_alias_mappings_updated ON biomarker_alias_mappings(updated_at);
+
 -- ============================================
 -- FUNCTIONS & TRIGGERS
 -- ============================================
@@ -619,6 +708,33 @@ CREATE TRIGGER trg_conditions_updated_at BEFORE UPDATE ON conditions FOR EACH RO
 CREATE TRIGGER trg_procedures_updated_at BEFORE UPDATE ON procedures FOR EACH ROW EXECUTE FUNCTION update_updated_at();
 CREATE TRIGGER trg_allergies_updated_at BEFORE UPDATE ON allergies FOR EACH ROW EXECUTE FUNCTION update_updated_at();
 CREATE TRIGGER trg_vaccinations_updated_at BEFORE UPDATE ON vaccinations FOR EACH ROW EXECUTE FUNCTION update_updated_at();
+CREATE TRIGGER trg_biomarker_definitions_updated_at BEFORE UPDATE ON biomarker_definitions FOR EACH ROW EXECUTE FUNCTION update_updated_at();
+
+-- API workers keep the biomarker catalog in memory and LISTEN on this channel
+CREATE OR REPLACE FUNCTION notify_biomarker_catalog_changed()
+RETURNS TRIGGER AS $$
+BEGIN
+    PERFORM pg_notify('biomarker_catalog', TG_OP);
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE TRIGGER trg_biomarker_definitions_notify
+    AFTER INSERT OR UPDATE OR DELETE OR TRUNCATE ON biomarker_definitions
+    FOR EACH STATEMENT EXECUTE FUNCTION notify_biomarker_catalog_changed();
+
+-- API workers cache authenticated users and LISTEN on this channel to drop changed ones
+CREATE OR REPLACE FUNCTION notify_principal_changed()
+RETURNS TRIGGER AS $$
+BEGIN
+    PERFORM pg_notify('principal_changed', OLD.id::text);
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE TRIGGER trg_users_principal_notify
+    AFTER UPDATE OF id, email, first_name, last_name, deleted_at OR DELETE ON users
+    FOR EACH ROW EXECUTE FUNCTION notify_principal_changed();
 
 -- ============================================
 -- SEED DATA: Biomarker Definitions
@@ -667,43 +783,481 @@ INSERT INTO biomarker_definitions (id, name, category, unit, normal_range_low, n
 ('potassium', 'Potassium', 'Electrolytes', 'mEq/L', 3.5, 5.0, 4.0, 4.5, 3.0, 5.5, 'Critical for heart rhythm', ARRAY['Diet', 'Kidney function'], ARRAY['sodium', 'magnesium'], ARRAY['k'], NULL, '2823-3');
 
 -- ============================================
--- VIEWS FOR COMMON QUERIES
--- ============================================
-
--- Latest observation per biomarker for a user
-CREATE VIEW latest_observations AS
-SELECT DISTINCT ON (user_id, biomarker_id)
-    o.*,
-    bd.name as biomarker_name,
-    bd.category,
-    bd.optimal_range_low,
-    bd.optimal_range_high
-FROM observations o
-JOIN biomarker_definitions bd ON o.biomarker_id = bd.id
-WHERE o.deleted_at IS NULL
-ORDER BY user_id, biomarker_id, effective_date DESC, created_at DESC;
-
--- Health score by category
-CREATE VIEW health_scores AS
-SELECT 
-    o.user_id,
-    bd.category,
-    AVG(CASE 
-        WHEN o.status = 'optimal' THEN 100
-        WHEN o.status = 'normal' THEN 75
-        WHEN o.status = 'attention' THEN 45
-        WHEN o.status = 'critical' THEN 20
+-- LATEST OBSERVATIONS (Incrementally maintained)
+-- ============================================
+
+-- Latest observation per biomarker for a user. Kept current by the observation
+-- write path; the covering primary key serves per-user reads as index-only scans.
+CREATE TABLE latest_observations (
+    user_id UUID NOT NULL REFERENCES users(id) ON DELETE CASCADE,
+    biomarker_id VARCHAR(50) NOT NULL REFERENCES biomarker_definitions(id),
+    observation_id UUID NOT NULL,
+    value DECIMAL(10,4) NOT NULL,
+    unit VARCHAR(30) NOT NULL,
+    status VARCHAR(20),
+    effective_date DATE NOT NULL,
+    observed_at TIMESTAMP WITH TIME ZONE, -- created_at of the source observation
+    updated_at TIMESTAMP WITH TIME ZONE DEFAULT NOW(),
+    PRIMARY KEY (user_id, biomarker_id) INCLUDE (value, status, effective_date)
+);
+
+-- Makes "latest row for (user, biomarker)" a single index seek; also the
+-- keyset order for observation listings filtered by biomarker
+CREATE INDEX idx_observations_user_biomarker_latest
+    ON observations(user_id, biomarker_id, effective_date DESC, created_at DESC, id DESC)
+    WHERE deleted_at IS NULL;
+
+-- Recompute the latest row for one (user, biomarker)
+CREATE OR REPLACE FUNCTION refresh_latest_observation(p_user_id UUID, p_biomarker_id VARCHAR)
+RETURNS VOID AS $$
+DECLARE
+    latest RECORD;
+BEGIN
+    SELECT id, value, unit, status, effective_date, created_at INTO latest
+    FROM observations
+    WHERE user_id = p_user_id AND biomarker_id = p_biomarker_id AND deleted_at IS NULL
+    ORDER BY effective_date DESC, created_at DESC
+    LIMIT 1;
+    
+    IF NOT FOUND THEN
+        DELETE FROM latest_observations WHERE user_id = p_user_id AND biomarker_id = p_biomarker_id;
+    ELSE
+        INSERT INTO latest_observations (user_id, biomarker_id, observation_id, value, unit, status, effective_date, observed_at, updated_at)
+        VALUES (p_user_id, p_biomarker_id, latest.id, latest.value, latest.unit, latest.status, latest.effective_date, latest.created_at, NOW())
+        ON CONFLICT (user_id, biomarker_id) DO UPDATE SET
+            observation_id = EXCLUDED.observation_id,
+            value = EXCLUDED.value,
+            unit = EXCLUDED.unit,
+            status = EXCLUDED.status,
+            effective_date = EXCLUDED.effective_date,
+            observed_at = EXCLUDED.observed_at,
+            updated_at = NOW();
+    END IF;
+END;
+$$ LANGUAGE plpgsql;
+
+-- ============================================
+-- HEALTH SCORES (Incrementally maintained)
+-- ============================================
+
+-- Health score by category, kept current by the observation write path so
+-- dashboard reads cost one primary-key lookup instead of a table-wide scan
+CREATE TABLE health_scores (
+    user_id UUID NOT NULL REFERENCES users(id) ON DELETE CASCADE,
+    category VARCHAR(50) NOT NULL,
+    score NUMERIC NOT NULL,
+    marker_count INTEGER NOT NULL,
+    updated_at TIMESTAMP WITH TIME ZONE DEFAULT NOW(),
+    PRIMARY KEY (user_id, category)
+);
+
+-- Points awarded for an observation status
+CREATE OR REPLACE FUNCTION observation_status_score(p_status VARCHAR)
+RETURNS INTEGER AS $$
+    SELECT CASE
+        WHEN p_status = 'optimal' THEN 100
+        WHEN p_status = 'normal' THEN 75
+        WHEN p_status = 'attention' THEN 45
+        WHEN p_status = 'critical' THEN 20
         ELSE 50
-    END) as score,
-    COUNT(*) as marker_count
-FROM observations o
-JOIN biomarker_definitions bd ON o.biomarker_id = bd.id
-WHERE o.deleted_at IS NULL
-  AND o.id IN (
-      SELECT id FROM latest_observations 
-      WHERE user_id = o.user_id AND biomarker_id = o.biomarker_id
-  )
-GROUP BY o.user_id, bd.category;
+    END;
+$$ LANGUAGE sql IMMUTABLE;
+
+-- Recompute one (user, category) score from latest_observations
+CREATE OR REPLACE FUNCTION refresh_health_score(p_user_id UUID, p_category VARCHAR)
+RETURNS VOID AS $$
+DECLARE
+    new_score NUMERIC;
+    new_count INTEGER;
+BEGIN
+    SELECT AVG(observation_status_score(lo.status)), COUNT(*)
+    INTO new_score, new_count
+    FROM latest_observations lo
+    JOIN biomarker_definitions bd ON lo.biomarker_id = bd.id
+    WHERE lo.user_id = p_user_id AND bd.category = p_category;
+    
+    IF new_count = 0 THEN
+        DELETE FROM health_scores WHERE user_id = p_user_id AND category = p_category;
+    ELSE
+        INSERT INTO health_scores (user_id, category, score, marker_count, updated_at)
+        VALUES (p_user_id, p_category, new_score, new_count, NOW())
+        ON CONFLICT (user_id, category) DO UPDATE SET
+            score = EXCLUDED.score,
+            marker_count = EXCLUDED.marker_count,
+            updated_at = NOW();
+    END IF;
+END;
+$$ LANGUAGE plpgsql;
+
+-- ============================================
+-- DERIVED TABLE MAINTENANCE
+-- ============================================
+
+-- Refresh latest_observations and health_scores for the (user, biomarker)
+-- pairs touched by one statement
+CREATE OR REPLACE FUNCTION refresh_observation_derived(p_user_ids UUID[], p_biomarker_ids VARCHAR[])
+RETURNS VOID AS $$
+DECLARE
+    pair RECORD;
+    locked_user UUID;
+BEGIN
+    -- Serialize refreshes per user so concurrent writers cannot store stale rows
+    FOR locked_user IN SELECT DISTINCT u FROM unnest(p_user_ids) AS u ORDER BY u LOOP
+        PERFORM pg_advisory_xact_lock(hashtext('observation_derived:' || locked_user::text));
+    END LOOP;
+    
+    FOR pair IN
+        SELECT DISTINCT p.user_id, p.biomarker_id
+        FROM unnest(p_user_ids, p_biomarker_ids) AS p(user_id, biomarker_id)
+    LOOP
+        PERFORM refresh_latest_observation(pair.user_id, pair.biomarker_id);
+    END LOOP;
+    
+    FOR pair IN
+        SELECT DISTINCT p.user_id, bd.category
+        FROM unnest(p_user_ids, p_biomarker_ids) AS p(user_id, biomarker_id)
+        JOIN biomarker_definitions bd ON p.biomarker_id = bd.id
+    LOOP
+        PERFORM refresh_health_score(pair.user_id, pair.category);
+    END LOOP;
+    
+    -- Cached AI answers were derived from the old values
+    DELETE FROM ai_response_cache WHERE user_id = ANY(p_user_ids);
+END;
+$$ LANGUAGE plpgsql;
+
+-- Statement-level trigger: collect affected pairs from the transition tables
+CREATE OR REPLACE FUNCTION refresh_observation_derived_for_changes()
+RETURNS TRIGGER AS $$
+DECLARE
+    user_ids UUID[];
+    biomarker_ids VARCHAR[];
+BEGIN
+    IF TG_OP = 'INSERT' THEN
+        SELECT array_agg(n.user_id), array_agg(n.biomarker_id)
+        INTO user_ids, biomarker_ids
+        FROM new_rows n;
+    ELSIF TG_OP = 'UPDATE' THEN
+        -- Only rows whose derived inputs changed (notes/lab edits are skipped)
+        SELECT array_agg(changed.user_id), array_agg(changed.biomarker_id)
+        INTO user_ids, biomarker_ids
+        FROM new_rows n
+        JOIN old_rows o ON n.id = o.id
+        CROSS JOIN LATERAL (
+            VALUES (n.user_id, n.biomarker_id), (o.user_id, o.biomarker_id)
+        ) AS changed(user_id, biomarker_id)
+        WHERE n.value IS DISTINCT FROM o.value
+           OR n.unit IS DISTINCT FROM o.unit
+           OR n.status IS DISTINCT FROM o.status
+           OR n.effective_date IS DISTINCT FROM o.effective_date
+           OR n.deleted_at IS DISTINCT FROM o.deleted_at
+           OR n.biomarker_id IS DISTINCT FROM o.biomarker_id
+           OR n.user_id IS DISTINCT FROM o.user_id;
+    ELSE
+        SELECT array_agg(o.user_id), array_agg(o.biomarker_id)
+        INTO user_ids, biomarker_ids
+        FROM old_rows o;
+    END IF;
+    
+    IF user_ids IS NOT NULL THEN
+        PERFORM refresh_observation_derived(user_ids, biomarker_ids);
+    END IF;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE TRIGGER trg_observations_derived_insert
+    AFTER INSERT ON observations
+    REFERENCING NEW TABLE AS new_rows
+    FOR EACH STATEMENT
+    EXECUTE FUNCTION refresh_observation_derived_for_changes();
+
+CREATE TRIGGER trg_observations_derived_update
+    AFTER UPDATE ON observations
+    REFERENCING OLD TABLE AS old_rows NEW TABLE AS new_rows
+    FOR EACH STATEMENT
+    EXECUTE FUNCTION refresh_observation_derived_for_changes();
+
+CREATE TRIGGER trg_observations_derived_delete
+    AFTER DELETE ON observations
+    REFERENCING OLD TABLE AS old_rows
+    FOR EACH STATEMENT
+    EXECUTE FUNCTION refresh_observation_derived_for_changes();
+
+-- ============================================
+-- PATTERN ALERT SWEEPS
+-- ============================================
+
+-- Single row: how far the background sweep has re-evaluated pattern_alerts.
+-- The sweep holds a row lock on it, so only one process sweeps at a time.
+CREATE TABLE pattern_sweep_state (
+    id BOOLEAN PRIMARY KEY DEFAULT TRUE CHECK (id),
+    watermark TIMESTAMP WITH TIME ZONE, -- user_data_versions.updated_at swept up to; NULL = never swept
+    rules_hash VARCHAR(40), -- rules the last sweep used; a change re-evaluates every user
+    swept_at TIMESTAMP WITH TIME ZONE
+);
+
+INSERT INTO pattern_sweep_state DEFAULT VALUES;
+
+-- ============================================
+-- USER DATA VERSIONS
+-- ============================================
+
+-- Per-user counter bumped by every write to the data exports are built from;
+-- cached export artifacts (PDFs) are keyed by it.
+CREATE TABLE user_data_versions (
+    user_id UUID PRIMARY KEY REFERENCES users(id) ON DELETE CASCADE,
+    version BIGINT NOT NULL DEFAULT 0,
+    updated_at TIMESTAMP WITH TIME ZONE DEFAULT NOW()
+);
+
+-- Users changed since a point in time (pattern alert sweeps)
+CREATE INDEX idx_user_data_versions_updated ON user_data_versions(updated_at);
+
+CREATE OR REPLACE FUNCTION bump_user_data_versions(p_user_ids UUID[])
+RETURNS VOID AS $$
+    INSERT INTO user_data_versions (user_id, version, updated_at)
+    SELECT DISTINCT u.id, 1, NOW()
+    FROM users u
+    WHERE u.id = ANY(p_user_ids) -- skips users deleted in the same statement (cascades)
+    ON CONFLICT (user_id) DO UPDATE
+    SET version = user_data_versions.version + 1, updated_at = NOW();
+$$ LANGUAGE sql;
+
+-- Statement-level trigger: one bump per affected user, however many rows changed
+CREATE OR REPLACE FUNCTION bump_user_data_versions_for_changes()
+RETURNS TRIGGER AS $$
+DECLARE
+    user_ids UUID[];
+BEGIN
+    IF TG_OP = 'INSERT' THEN
+        SELECT array_agg(n.user_id) INTO user_ids FROM new_rows n;
+    ELSIF TG_OP = 'UPDATE' THEN
+        SELECT array_agg(changed.user_id) INTO user_ids
+        FROM (SELECT user_id FROM new_rows UNION SELECT user_id FROM old_rows) changed;
+    ELSE
+        SELECT array_agg(o.user_id) INTO user_ids FROM old_rows o;
+    END IF;
+    
+    IF user_ids IS NOT NULL THEN
+        PERFORM bump_user_data_versions(user_ids);
+    END IF;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE TRIGGER trg_observations_data_version_insert
+    AFTER INSERT ON observations
+    REFERENCING NEW TABLE AS new_rows
+    FOR EACH STATEMENT
+    EXECUTE FUNCTION bump_user_data_versions_for_changes();
+
+CREATE TRIGGER trg_observations_data_version_update
+    AFTER UPDATE ON observations
+    REFERENCING OLD TABLE AS old_rows NEW TABLE AS new_rows
+    FOR EACH STATEMENT
+    EXECUTE FUNCTION bump_user_data_versions_for_changes();
+
+CREATE TRIGGER trg_observations_data_version_delete
+    AFTER DELETE ON observations
+    REFERENCING OLD TABLE AS old_rows
+    FOR EACH STATEMENT
+    EXECUTE FUNCTION bump_user_data_versions_for_changes();
+
+CREATE TRIGGER trg_medications_data_version_insert
+    AFTER INSERT ON medications
+    REFERENCING NEW TABLE AS new_rows
+    FOR EACH STATEMENT
+    EXECUTE FUNCTION bump_user_data_versions_for_changes();
+
+CREATE TRIGGER trg_medications_data_version_update
+    AFTER UPDATE ON medications
+    REFERENCING OLD TABLE AS old_rows NEW TABLE AS new_rows
+    FOR EACH STATEMENT
+    EXECUTE FUNCTION bump_user_data_versions_for_changes();
+
+CREATE TRIGGER trg_medications_data_version_delete
+    AFTER DELETE ON medications
+    REFERENCING OLD TABLE AS old_rows
+    FOR EACH STATEMENT
+    EXECUTE FUNCTION bump_user_data_versions_for_changes();
+
+CREATE TRIGGER trg_conditions_data_version_insert
+    AFTER INSERT ON conditions
+    REFERENCING NEW TABLE AS new_rows
+    FOR EACH STATEMENT
+    EXECUTE FUNCTION bump_user_data_versions_for_changes();
+
+CREATE TRIGGER trg_conditions_data_version_update
+    AFTER UPDATE ON conditions
+    REFERENCING OLD TABLE AS old_rows NEW TABLE AS new_rows
+    FOR EACH STATEMENT
+    EXECUTE FUNCTION bump_user_data_versions_for_changes();
+
+CREATE TRIGGER trg_conditions_data_version_delete
+    AFTER DELETE ON conditions
+    REFERENCING OLD TABLE AS old_rows
+    FOR EACH STATEMENT
+    EXECUTE FUNCTION bump_user_data_versions_for_changes();
+
+CREATE TRIGGER trg_allergies_data_version_insert
+    AFTER INSERT ON allergies
+    REFERENCING NEW TABLE AS new_rows
+    FOR EACH STATEMENT
+    EXECUTE FUNCTION bump_user_data_versions_for_changes();
+
+CREATE TRIGGER trg_allergies_data_version_update
+    AFTER UPDATE ON allergies
+    REFERENCING OLD TABLE AS old_rows NEW TABLE AS new_rows
+    FOR EACH STATEMENT
+    EXECUTE FUNCTION bump_user_data_versions_for_changes();
+
+CREATE TRIGGER trg_allergies_data_version_delete
+    AFTER DELETE ON allergies
+    REFERENCING OLD TABLE AS old_rows
+    FOR EACH STATEMENT
+    EXECUTE FUNCTION bump_user_data_versions_for_changes();
+
+-- ============================================
+-- EXPORT JOBS
+-- ============================================
+
+-- Queue for heavy exports. Workers claim rows with FOR UPDATE SKIP LOCKED and
+-- touch heartbeat_at while running; rows with a stale heartbeat are requeued.
+CREATE TABLE export_jobs (
+    id UUID PRIMARY KEY DEFAULT uuid_generate_v4(),
+    user_id UUID NOT NULL REFERENCES users(id) ON DELETE CASCADE,
+    
+    kind VARCHAR(50) NOT NULL, -- visit-summary, lab-report, fhir-bulk
+    params JSONB NOT NULL DEFAULT '{}',
+    status VARCHAR(20) NOT NULL DEFAULT 'queued', -- queued, running, succeeded, failed
+    progress SMALLINT NOT NULL DEFAULT 0, -- percent
+    stage VARCHAR(100),
+    
+    attempts INTEGER NOT NULL DEFAULT 0,
+    max_attempts INTEGER NOT NULL DEFAULT 3,
+    error TEXT,
+    run_after TIMESTAMP WITH TIME ZONE NOT NULL DEFAULT NOW(),
+    worker VARCHAR(100),
+    heartbeat_at TIMESTAMP WITH TIME ZONE,
+    
+    -- Result file on the worker host
+    result_path TEXT,
+    result_filename VARCHAR(255),
+    result_media_type VARCHAR(100),
+    result_size BIGINT,
+    
+    created_at TIMESTAMP WITH TIME ZONE DEFAULT NOW(),
+    started_at TIMESTAMP WITH TIME ZONE,
+    finished_at TIMESTAMP WITH TIME ZONE,
+    expires_at TIMESTAMP WITH TIME ZONE
+);
+
+CREATE INDEX idx_export_jobs_queued ON export_jobs(run_after) WHERE status = 'queued';
+CREATE INDEX idx_export_jobs_running ON export_jobs(heartbeat_at) WHERE status = 'running';
+CREATE INDEX idx_export_jobs_user ON export_jobs(user_id, created_at DESC);
+CREATE INDEX idx_export_jobs_expires ON export_jobs(expires_at) WHERE expires_at IS NOT NULL;
+
+-- Export workers LISTEN on this channel instead of polling tightly
+CREATE OR REPLACE FUNCTION notify_export_job_queued()
+RETURNS TRIGGER AS $$
+BEGIN
+    PERFORM pg_notify('export_jobs', TG_OP);
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE TRIGGER trg_export_jobs_notify
+    AFTER INSERT ON export_jobs
+    FOR EACH STATEMENT EXECUTE FUNCTION notify_export_job_queued();
+
+-- ============================================
+-- CONSISTENCY CHECKS & REBUILDS
+-- ============================================
+
+-- Latest rows derived from scratch (source of truth for the checker)
+CREATE OR REPLACE FUNCTION compute_latest_observations()
+RETURNS TABLE (
+    user_id UUID, biomarker_id VARCHAR, observation_id UUID, value DECIMAL, unit VARCHAR,
+    status VARCHAR, effective_date DATE, observed_at TIMESTAMP WITH TIME ZONE
+) AS $$
+    SELECT DISTINCT ON (o.user_id, o.biomarker_id)
+        o.user_id, o.biomarker_id, o.id, o.value, o.unit, o.status, o.effective_date, o.created_at
+    FROM observations o
+    WHERE o.deleted_at IS NULL
+    ORDER BY o.user_id, o.biomarker_id, o.effective_date DESC, o.created_at DESC;
+$$ LANGUAGE sql STABLE;
+
+-- Rows where latest_observations disagrees with a from-scratch computation
+CREATE OR REPLACE FUNCTION check_latest_observations()
+RETURNS TABLE (user_id UUID, biomarker_id VARCHAR, stored_observation_id UUID, expected_observation_id UUID) AS $$
+    SELECT COALESCE(lo.user_id, e.user_id), COALESCE(lo.biomarker_id, e.biomarker_id),
+           lo.observation_id, e.observation_id
+    FROM latest_observations lo
+    FULL OUTER JOIN compute_latest_observations() e
+        ON lo.user_id = e.user_id AND lo.biomarker_id = e.biomarker_id
+    WHERE lo.observation_id IS DISTINCT FROM e.observation_id
+       OR lo.value IS DISTINCT FROM e.value
+       OR lo.status IS DISTINCT FROM e.status
+       OR lo.effective_date IS DISTINCT FROM e.effective_date;
+$$ LANGUAGE sql STABLE;
+
+-- Replace latest_observations with a from-scratch computation; returns row count
+CREATE OR REPLACE FUNCTION rebuild_latest_observations()
+RETURNS INTEGER AS $$
+DECLARE
+    row_count INTEGER;
+BEGIN
+    LOCK TABLE latest_observations IN EXCLUSIVE MODE;
+    DELETE FROM latest_observations;
+    INSERT INTO latest_observations (user_id, biomarker_id, observation_id, value, unit, status, effective_date, observed_at, updated_at)
+    SELECT c.user_id, c.biomarker_id, c.observation_id, c.value, c.unit, c.status, c.effective_date, c.observed_at, NOW()
+    FROM compute_latest_observations() c;
+    GET DIAGNOSTICS row_count = ROW_COUNT;
+    RETURN row_count;
+END;
+$$ LANGUAGE plpgsql;
+
+-- Scores derived from scratch (source of truth for the checker)
+CREATE OR REPLACE FUNCTION compute_health_scores()
+RETURNS TABLE (user_id UUID, category VARCHAR, score NUMERIC, marker_count INTEGER) AS $$
+    SELECT latest.user_id, bd.category,
+           AVG(observation_status_score(latest.status)), COUNT(*)::INTEGER
+    FROM compute_latest_observations() latest
+    JOIN biomarker_definitions bd ON latest.biomarker_id = bd.id
+    GROUP BY latest.user_id, bd.category;
+$$ LANGUAGE sql STABLE;
+
+-- Rows where the stored table disagrees with a from-scratch computation
+CREATE OR REPLACE FUNCTION check_health_scores()
+RETURNS TABLE (
+    user_id UUID, category VARCHAR,
+    stored_score NUMERIC, stored_count INTEGER,
+    expected_score NUMERIC, expected_count INTEGER
+) AS $$
+    SELECT COALESCE(hs.user_id, e.user_id), COALESCE(hs.category, e.category),
+           hs.score, hs.marker_count, e.score, e.marker_count
+    FROM health_scores hs
+    FULL OUTER JOIN compute_health_scores() e
+        ON hs.user_id = e.user_id AND hs.category = e.category
+    WHERE hs.score IS DISTINCT FROM e.score
+       OR hs.marker_count IS DISTINCT FROM e.marker_count;
+$$ LANGUAGE sql STABLE;
+
+-- Replace the whole table with a from-scratch computation; returns row count
+CREATE OR REPLACE FUNCTION rebuild_health_scores()
+RETURNS INTEGER AS $$
+DECLARE
+    row_count INTEGER;
+BEGIN
+    LOCK TABLE health_scores IN EXCLUSIVE MODE;
+    DELETE FROM health_scores;
+    INSERT INTO health_scores (user_id, category, score, marker_count, updated_at)
+    SELECT c.user_id, c.category, c.score, c.marker_count, NOW() FROM compute_health_scores() c;
+    GET DIAGNOSTICS row_count = ROW_COUNT;
+    RETURN row_count;
+END;
+$$ LANGUAGE plpgsql;
 
 -- ============================================
 -- FAMILY HEALTH GRAPH TABLES